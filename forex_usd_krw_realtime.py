@@ -1,31 +1,17 @@
-import requests
 import time
 from datetime import datetime
+from upbit_forex import ForexRateCache
 
-previous_rate = None
+# 数据源每天只发布一次: 按TTL复用缓存, 过期后发送条件请求(ETag/Last-Modified)
+forex = ForexRateCache()
 
 
 def get_exchange_rate():
-    global previous_rate
-    url = "https://api.frankfurter.app/latest?from=USD&to=KRW"
     # url = "https://ecos.bok.or.kr/api/StatisticSearch/YOUR_API_KEY/json/kr/1/1/036Y001/DD/USD"
-    
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        current_rate = data.get('rates', {}).get('KRW')
-
-        # 计算变化率
-        change = None
-        if previous_rate and current_rate:
-            change = (current_rate - previous_rate) / previous_rate * 100
+    current_rate = forex.get_rate()
 
-        previous_rate = current_rate
-        return current_rate, change
-    except requests.exceptions.RequestException as e:
-        print(f"获取汇率数据时出错: {e}")
-        return None, None
+    # 计算相对上一次发布的变化率
+    return current_rate, forex.change()
 
 
 def display_exchange_rate(rate, change):
@@ -36,10 +22,12 @@ def display_exchange_rate(rate, change):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"\n[KRW-USD 汇率] {timestamp}")
     print(f"当前汇率: 1 USD = {rate:,.1f} KRW")
+    if forex.published:
+        print(f"发布日期: {forex.published} (缓存{forex.age():.0f}秒前确认, 共请求{forex.requests}次)")
 
     if change is not None:
         change_status = "↑" if change >= 0 else "↓"
-        print(f"较上次变化: {change_status}{abs(change):.2f}%")
+        print(f"较上次发布变化: {change_status}{abs(change):.2f}%")
 
 
 def main():
@@ -53,6 +41,8 @@ def main():
             time.sleep(5)
     except KeyboardInterrupt:
         print("\n程序已停止")
+    finally:
+        forex.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+import os
+import sys
+import time
+
+# 监控脚本都在仓库根目录下, 以顶层模块导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def wait_until(predicate, timeout=5.0, interval=0.01):
+    """轮询直到predicate()为真, 返回最终结果"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return predicate()
+        time.sleep(interval)
+    return True
@@ -0,0 +1,21 @@
+import numpy as np
+
+from upbit_candles import CandleAggregator
+from upbit_snapshot import MarketIndex
+
+
+def test_queries_cover_markets_registered_elsewhere():
+    """共用的index由其他组件登记了新交易对后, 查询不应越界"""
+    index = MarketIndex()
+    candles = CandleAggregator(index, intervals=(60,), capacity=4)
+    candles.update("KRW-AAA", 60_000, 100.0, 1_000.0)
+    candles.update("KRW-AAA", 120_000, 110.0, 2_000.0)
+    for i in range(10):
+        index.get(f"KRW-N{i}")
+
+    for values in (candles.change(60), candles.change(60, periods=0), candles.vwap(60),
+                   candles.ema(60), candles.volatility(60)):
+        assert len(values) == len(index)
+        assert np.isnan(values[-1])
+    assert candles.change(60)[0] == np.float64(110.0) / 100.0 - 1
+    assert candles.candles("KRW-N9", 60) == []
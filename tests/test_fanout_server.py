@@ -0,0 +1,52 @@
+import json
+import threading
+
+import pytest
+
+from conftest import wait_until
+from upbit_fanout_server import FanoutServer, FanoutState
+
+websocket = pytest.importorskip("websocket")
+
+
+def ticker(price, timestamp):
+    return {'market': "KRW-BTC", 'trade_price': price, 'timestamp': timestamp}
+
+
+def test_history_keeps_first_values():
+    state = FanoutState()
+    state.update([ticker(100.0, 1)], 1000)
+    state.update([ticker(101.0, 2)], 1000)
+    assert state.history[0][1]["KRW-BTC"]['trade_price'] == 100.0
+    assert state.current["KRW-BTC"]['trade_price'] == 101.0
+
+
+def test_websocket_clients_share_one_thread():
+    state = FanoutState()
+    state.update([ticker(100.0, 1)], 1000)
+    server = FanoutServer(state, port=0).start()
+    clients = []
+    try:
+        url = server.url.replace("http", "ws") + "/ws?since=1"
+        threads = threading.active_count()
+        clients = [websocket.create_connection(url, timeout=5) for _ in range(20)]
+        assert wait_until(lambda: server.ws_clients == 20)
+        assert wait_until(lambda: threading.active_count() == threads)  # 升级后的连接线程均已退出
+
+        state.update([ticker(101.0, 2)], 1000)
+        for client in clients:
+            message = json.loads(client.recv())
+            assert message['seq'] == 2
+            assert message['changes']["KRW-BTC"]['trade_price'] == 101.0
+
+        # 重新同步: 从版本0开始的合并增量
+        clients[0].send(json.dumps({'since': 0}))
+        assert json.loads(clients[0].recv())['since'] == 0
+
+        for client in clients:
+            client.close()
+        assert wait_until(lambda: server.ws_clients == 0)
+    finally:
+        for client in clients:
+            client.close()
+        server.stop()
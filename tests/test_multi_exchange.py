@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from upbit_multi_exchange import FakeExchange, MultiExchangeMonitor
+
+BASES = ["AAA", "BBB", "CCC"]
+
+
+class FailingExchange(FakeExchange):
+    async def fetch_tickers(self, symbols=None):
+        self.calls += 1
+        raise ConnectionError("模拟的网络错误")
+
+
+def make_exchanges(failing=None):
+    """upbit/bithumb按KRW计价, binance按USDT计价且统一高出2%; bithumb没有CCC"""
+    specs = {'upbit': ('KRW', BASES), 'bithumb': ('KRW', BASES[:2]), 'binance': ('USDT', BASES)}
+    exchanges = {}
+    for name, (quote, bases) in specs.items():
+        cls = FailingExchange if name == failing else FakeExchange
+        exchanges[name] = cls(name, quote, bases, usdt_krw=1400.0, latency=0, noise=0)
+    binance = exchanges['binance']
+    binance.base_prices = {base: price * 1.02 for base, price in binance.base_prices.items()}
+    return exchanges
+
+
+def run_one_cycle(exchanges):
+    """运行一轮监控, 返回 (monitor, 对齐后的价格矩阵, 显示的价差)"""
+    monitor = MultiExchangeMonitor(exchanges, update_interval=0, diff_render=False)
+    captured = {}
+    align = monitor.align
+
+    def capture_align(tickers):
+        captured['prices'] = align(tickers)
+        return captured['prices']
+
+    monitor.align = capture_align
+    monitor.display = lambda spreads: captured.setdefault('spreads', spreads)
+    monitor.run(cycles=1)
+    return monitor, captured['prices'], captured['spreads']
+
+
+def test_one_cycle_aligns_prices_and_spreads():
+    exchanges = make_exchanges()
+    monitor, prices, spreads = run_one_cycle(exchanges)
+
+    base = exchanges['upbit'].base_prices
+    expected = np.array([[base[b], base[b] if b != "CCC" else np.nan, base[b] * 1.02] for b in BASES])
+    assert monitor.bases == BASES
+    assert monitor.venues == ['upbit', 'bithumb', 'binance']
+    np.testing.assert_allclose(prices, expected, rtol=1e-12)
+    assert monitor.usdt_rates == {'upbit': pytest.approx(1400.0), 'bithumb': pytest.approx(1400.0), 'binance': 1.0}
+
+    assert sorted(item['base'] for item in spreads) == BASES
+    for item in spreads:
+        assert item['low_venue'] == 'upbit'
+        assert item['high_venue'] == 'binance'
+        assert item['low'] == pytest.approx(base[item['base']])
+        assert item['spread'] == pytest.approx(0.02)
+    assert monitor.errors == {}
+
+
+def test_failing_exchange_does_not_block_others():
+    exchanges = make_exchanges(failing='bithumb')
+    monitor, prices, spreads = run_one_cycle(exchanges)
+
+    assert isinstance(monitor.errors['bithumb'], ConnectionError)
+    assert exchanges['bithumb'].calls == 1
+    # 失败的交易所整列缺失, 其余交易所照常对齐并计算价差
+    assert np.isnan(prices[:, 1]).all()
+    assert not np.isnan(prices[:, [0, 2]]).any()
+    assert [item['spread'] for item in spreads] == pytest.approx([0.02] * len(BASES))
@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import wait_until
+from upbit_ticker_stream import UpbitTickerStream
+from upbit_ws_server import ReplayWebSocketServer, sample_ticker_frames
+
+MARKETS = ["KRW-USDT", "KRW-BTC", "KRW-ETH"]
+
+
+@pytest.fixture
+def make_stream():
+    """在本地替身服务器上启动行情流, 测试结束后关闭两端"""
+    started = []
+
+    def make(frames, markets=MARKETS, **server_options):
+        server = ReplayWebSocketServer(frames, **server_options).start()
+        stream = UpbitTickerStream(markets, url=server.url, reconnect_delay=0.05, recv_timeout=0.2).start()
+        started.append((server, stream))
+        return server, stream
+
+    yield make
+    for server, stream in started:
+        stream.stop()
+        server.stop()
+
+
+def test_initial_fill(make_stream):
+    frames = sample_ticker_frames(MARKETS, rounds=3)
+    server, stream = make_stream(frames)
+
+    assert stream.wait_ready(timeout=5)
+    assert wait_until(lambda: len(stream.fetch_tickers(MARKETS)) == len(MARKETS))
+    last = {f['code']: f['trade_price'] for f in frames}
+    assert wait_until(lambda: all(stream.get_ticker(m)['trade_price'] == last[m] for m in MARKETS))
+    assert [t['market'] for t in stream.fetch_tickers(MARKETS)] == MARKETS
+    assert server.subscriptions[0] == sorted(MARKETS)
+    assert stream.reconnects == 0
+
+
+def test_reconnect_after_drop(make_stream):
+    frames = sample_ticker_frames(MARKETS, rounds=3)
+    server, stream = make_stream(frames, drop_after=2, drops=1)
+
+    # 第一个连接只收到2帧就被断开, 重连后应收到全部交易对的最新行情
+    assert wait_until(lambda: server.connections >= 2)
+    last = {f['code']: f['trade_price'] for f in frames}
+    assert wait_until(lambda: all((stream.get_ticker(m) or {}).get('trade_price') == last[m] for m in MARKETS))
+    assert stream.reconnects >= 1
+    # 重连后重新发送同一订阅
+    assert server.subscriptions[:2] == [sorted(MARKETS), sorted(MARKETS)]
+
+
+def test_resubscribe_after_set_markets(make_stream):
+    server, stream = make_stream(sample_ticker_frames(MARKETS, rounds=1))
+    assert wait_until(lambda: len(stream.fetch_tickers(MARKETS)) == len(MARKETS))
+
+    stream.set_markets(["KRW-USDT", "KRW-XRP"])
+
+    # 不再订阅的交易对立即从行情表移除, 新列表在同一连接上重新订阅
+    assert stream.get_ticker("KRW-BTC") is None
+    assert stream.get_ticker("KRW-USDT") is not None
+    assert wait_until(lambda: sorted(["KRW-USDT", "KRW-XRP"]) in server.subscriptions)
+    assert server.connections == 1
@@ -0,0 +1,305 @@
+import json
+import math
+import queue
+import threading
+import time
+
+import numpy as np
+import requests
+# 告警规则引擎: 规则按类型编译为参数数组, 每个快照对全部交易对×全部规则做一次向量化判断, 去抖后发送到可插拔的输出
+
+
+class PriceChangeRule:
+    """window秒内价格变化幅度超过threshold(小数, 0.05 = 5%)"""
+
+    kind = "price_change"
+
+    def __init__(self, name, window=60, threshold=0.05, direction="both", cooldown=300):
+        if direction not in ("both", "up", "down"):
+            raise ValueError(f"不支持的方向: {direction}")
+        self.name = name
+        self.window = window
+        self.threshold = threshold
+        self.direction = direction
+        self.cooldown = cooldown  # 同一交易对两次告警的最小间隔(秒)
+
+
+class VolumeSurgeRule:
+    """单个快照间隔内的成交额超过前lookback个间隔平均值的multiple倍"""
+
+    kind = "volume_surge"
+
+    def __init__(self, name, multiple=3.0, lookback=20, min_average=0.0, cooldown=300):
+        self.name = name
+        self.multiple = multiple
+        self.lookback = lookback
+        self.min_average = min_average  # 平均成交额低于该值(KRW)时不判断, 过滤冷门交易对
+        self.cooldown = cooldown
+
+
+class PremiumBandRule:
+    """USDT溢价超出[low, high]区间(小数)"""
+
+    kind = "premium_band"
+
+    def __init__(self, name, low=-0.01, high=0.03, cooldown=300):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.cooldown = cooldown
+
+
+def default_rules():
+    return [
+        PriceChangeRule("1分钟涨跌5%", window=60, threshold=0.05),
+        PriceChangeRule("5分钟涨跌10%", window=300, threshold=0.10),
+        VolumeSurgeRule("成交额放大5倍", multiple=5, lookback=30, min_average=1e6),
+        PremiumBandRule("USDT溢价异常", low=-0.01, high=0.05),
+    ]
+
+
+class StdoutSink:
+    def send(self, alerts):
+        for alert in alerts:
+            print(f"🚨 [{alert['rule']}] {alert['market']}: {alert['message']}")
+
+
+class FileSink:
+    """追加为JSON lines"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, alerts):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """POST到webhook地址, 在后台线程发送, 不阻塞快照处理"""
+
+    def __init__(self, url, timeout=5, max_pending=1000):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.dropped = 0  # 队列满时丢弃的批次数
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._send_loop, name="alert-webhook", daemon=True)
+        self._thread.start()
+
+    def send(self, alerts):
+        try:
+            self._queue.put_nowait(alerts)
+        except queue.Full:
+            self.dropped += 1
+
+    def _send_loop(self):
+        while True:
+            alerts = self._queue.get()
+            if alerts is None:
+                return
+            try:
+                self.session.post(self.url, json={'alerts': alerts}, timeout=self.timeout).raise_for_status()
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️ 发送告警失败: {e}")
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=self.timeout)
+        self.session.close()
+
+
+class MemorySink:
+    """保存在内存中(替代真实webhook的桩, 便于检查输出)"""
+
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alerts):
+        self.alerts.extend(alerts)
+
+
+def build_alert_engine(path=None, webhook=None, rules=None, interval=1.0):
+    """按命令行参数创建使用默认规则的告警引擎, 未指定输出时返回None; interval为快照间隔(秒)"""
+    sinks = []
+    if path:
+        sinks.append(FileSink(path))
+    if webhook:
+        sinks.append(WebhookSink(webhook))
+    return AlertEngine(rules or default_rules(), sinks, interval=interval) if sinks else None
+
+
+class AlertEngine:
+    def __init__(self, rules, sinks=None, history=None, interval=1.0):
+        self.sinks = list(sinks or [StdoutSink()])
+        self.price_rules = [r for r in rules if r.kind == PriceChangeRule.kind]
+        self.volume_rules = [r for r in rules if r.kind == VolumeSurgeRule.kind]
+        self.premium_rules = [r for r in rules if r.kind == PremiumBandRule.kind]
+
+        # 编译: 同类规则的参数堆叠为数组, 判断时一次处理 规则数×交易对数 的矩阵
+        self._p_window = np.array([r.window for r in self.price_rules], dtype=float)
+        self._p_threshold = np.array([r.threshold for r in self.price_rules], dtype=float)[:, None]
+        self._p_sign = np.array([{'both': 0, 'up': 1, 'down': -1}[r.direction] for r in self.price_rules])[:, None]
+        self._v_multiple = np.array([r.multiple for r in self.volume_rules], dtype=float)[:, None]
+        self._v_lookback = np.array([r.lookback for r in self.volume_rules], dtype=int)
+        self._v_min_average = np.array([r.min_average for r in self.volume_rules], dtype=float)[:, None]
+        self._m_low = np.array([r.low for r in self.premium_rules], dtype=float)
+        self._m_high = np.array([r.high for r in self.premium_rules], dtype=float)
+
+        # 历史快照环形缓冲: 深度须覆盖最长的成交额回看与最长的价格窗口(按快照间隔interval折算, 留10%余量),
+        # 价格窗口按时间戳查找
+        windows = [math.ceil(r.window / interval * 1.1) + 2 for r in self.price_rules]
+        self.depth = history or max([int(r.lookback) + 2 for r in self.volume_rules] + windows + [120])
+        self.max_window = max((r.window for r in self.price_rules), default=0)
+        self._warned = False
+        self._ts = np.full(self.depth, -np.inf)
+        self._price = np.full((self.depth, 0), np.nan)
+        self._volume = np.full((self.depth, 0), np.nan)
+        self._delta = np.zeros((self.depth, 0))
+        self._head = 0  # 下一个写入位置
+        self._filled = 0
+
+        # 去抖状态: 条件持续成立期间只告警一次, 且两次告警间隔不小于cooldown
+        self._state = {}
+        for kind, rules in ((PriceChangeRule.kind, self.price_rules), (VolumeSurgeRule.kind, self.volume_rules),
+                            (PremiumBandRule.kind, self.premium_rules)):
+            width = 1 if kind == PremiumBandRule.kind else 0  # 溢价规则只有一个判断对象
+            self._state[kind] = {
+                'cooldown': np.array([r.cooldown for r in rules], dtype=float)[:, None],
+                'active': np.zeros((len(rules), width), dtype=bool),
+                'last': np.full((len(rules), width), -np.inf),
+            }
+        self.evaluations = 0
+        self.fired = 0
+
+    def _ensure_width(self, width):
+        current = self._price.shape[1]
+        if width <= current:
+            return
+        extra = width - current
+        self._price = np.hstack([self._price, np.full((self.depth, extra), np.nan)])
+        self._volume = np.hstack([self._volume, np.full((self.depth, extra), np.nan)])
+        self._delta = np.hstack([self._delta, np.zeros((self.depth, extra))])
+        for kind, state in self._state.items():
+            if kind == PremiumBandRule.kind:
+                continue
+            rules = len(state['cooldown'])
+            state['active'] = np.hstack([state['active'], np.zeros((rules, extra), dtype=bool)])
+            state['last'] = np.hstack([state['last'], np.full((rules, extra), -np.inf)])
+
+    def _ordered(self):
+        """环形缓冲中已写入的位置, 按时间从旧到新"""
+        return (self._head - self._filled + np.arange(self._filled)) % self.depth
+
+    def _debounce(self, kind, condition, now):
+        state = self._state[kind]
+        fire = condition & ~state['active'] & (now - state['last'] >= state['cooldown'])
+        state['active'] = condition
+        state['last'] = np.where(fire, now, state['last'])
+        return fire
+
+    def evaluate(self, snapshot, now=None, premium=None):
+        """对一个MarketSnapshot求值, 返回本次触发的告警(并发送到各输出)"""
+        now = time.time() if now is None else now
+        width = len(snapshot.index)
+        self._ensure_width(width)
+
+        price = np.where(snapshot.valid[:width], snapshot.price[:width], np.nan)
+        volume = np.where(snapshot.valid[:width], snapshot.volume[:width], np.nan)
+        prev = self._volume[(self._head - 1) % self.depth, :width] if self._filled else np.full(width, np.nan)
+        # 24h累计成交额的增量即本间隔的成交额; 24h窗口滚动导致的负值按0处理
+        delta = np.nan_to_num(np.clip(volume - prev, 0, None))
+
+        slot = self._head
+        self._ts[slot] = now
+        self._price[slot, :width] = price
+        self._price[slot, width:] = np.nan
+        self._volume[slot, :width] = volume
+        self._delta[slot, :width] = delta
+        self._head = (self._head + 1) % self.depth
+        self._filled = min(self._filled + 1, self.depth)
+
+        if self._filled == self.depth and not self._warned and now - self._ts[self._head] < self.max_window:
+            # 实际快照比构造时的interval更密: 最长的价格窗口找不到基准快照, 对应规则不会触发
+            print(f"⚠️ 告警历史只覆盖{now - self._ts[self._head]:.0f}秒, 短于最长价格窗口{self.max_window:g}秒, "
+                  f"请按实际快照间隔设置interval或history")
+            self._warned = True
+
+        alerts = []
+        markets = snapshot.index.markets
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.price_rules:
+                alerts += self._eval_price(price, now, markets)
+            if self.volume_rules and self._filled > 1:
+                alerts += self._eval_volume(delta, now, markets)
+        if self.premium_rules and premium is not None:
+            alerts += self._eval_premium(premium, now)
+
+        self.evaluations += 1
+        if alerts:
+            self.fired += len(alerts)
+            for sink in self.sinks:
+                try:
+                    sink.send(alerts)
+                except Exception as e:
+                    print(f"⚠️ 告警输出失败: {e}")
+        return alerts
+
+    def _eval_price(self, price, now, markets):
+        order = self._ordered()
+        ts = self._ts[order]
+        # 每条规则找到 now-window 时刻之前最近的一个快照
+        pos = np.searchsorted(ts, now - self._p_window, side='right') - 1
+        has_base = pos >= 0
+        base = self._price[order[np.maximum(pos, 0)], :len(price)]  # (规则数, 交易对数)
+        change = price[None, :] / base - 1
+        change[~has_base] = np.nan
+        signed = np.where(self._p_sign == 0, np.abs(change), change * self._p_sign)
+        condition = np.nan_to_num(signed, nan=-np.inf) >= self._p_threshold
+        fire = self._debounce(PriceChangeRule.kind, condition, now)
+        return [{
+            'rule': self.price_rules[k].name,
+            'kind': PriceChangeRule.kind,
+            'market': markets[i],
+            'value': float(change[k, i]),
+            'threshold': self.price_rules[k].threshold,
+            'ts': now,
+            'message': f"{self.price_rules[k].window:g}秒内变化 {change[k, i] * 100:+.2f}%",
+        } for k, i in zip(*np.nonzero(fire))]
+
+    def _eval_volume(self, delta, now, markets):
+        order = self._ordered()
+        history = self._delta[order[:-1], :len(delta)]  # 不含当前快照
+        cumulative = np.vstack([np.zeros((1, len(delta))), np.cumsum(history, axis=0)])
+        n = np.minimum(self._v_lookback, len(history))
+        average = (cumulative[-1] - cumulative[len(history) - n]) / n[:, None]  # (规则数, 交易对数)
+        ratio = delta[None, :] / average
+        condition = (average >= self._v_min_average) & (average > 0) & (ratio >= self._v_multiple)
+        fire = self._debounce(VolumeSurgeRule.kind, condition, now)
+        return [{
+            'rule': self.volume_rules[k].name,
+            'kind': VolumeSurgeRule.kind,
+            'market': markets[i],
+            'value': float(ratio[k, i]),
+            'threshold': self.volume_rules[k].multiple,
+            'ts': now,
+            'message': f"本间隔成交额为近{int(n[k])}个间隔平均的 {ratio[k, i]:.1f} 倍",
+        } for k, i in zip(*np.nonzero(fire))]
+
+    def _eval_premium(self, premium, now):
+        condition = ((premium < self._m_low) | (premium > self._m_high))[:, None]
+        fire = self._debounce(PremiumBandRule.kind, condition, now)[:, 0]
+        return [{
+            'rule': self.premium_rules[k].name,
+            'kind': PremiumBandRule.kind,
+            'market': "KRW-USDT",
+            'value': premium,
+            'threshold': [self.premium_rules[k].low, self.premium_rules[k].high],
+            'ts': now,
+            'message': f"USDT溢价 {premium * 100:+.2f}% 超出区间",
+        } for k in np.flatnonzero(fire)]
+
+    def on_snapshot(self, engine, premium=None):
+        """MonitorEngine回调"""
+        self.evaluate(engine.snapshot, premium=premium.premium if premium else None)
@@ -1,33 +1,56 @@
-import requests
 import time
 from datetime import datetime
+from upbit_listing_watcher import ListingWatcher
+from upbit_market_catalog import UpbitMarketCatalog
+from upbit_resilient_fetcher import ResilientTickerFetcher
 # upbit上币顺序展示
 
 class UpbitKRWtoUSDTConverter:
-    def __init__(self, update_interval=5):
+    def __init__(self, update_interval=5, max_workers=5, listing_rate=2.0):
         self.update_interval = update_interval
         self.usdt_krw_price = None
+        # 单批失败(如刚上币的交易对返回4xx)只影响该批, 失败的交易对沿用上次数据
+        self.fetcher = ResilientTickerFetcher(max_workers=max_workers)
+        self.catalog = UpbitMarketCatalog(self.fetcher.fetch_markets)
+        # 每秒轮询listing_rate次交易对目录, 新上币在下一次请求内发现
+        self.listing_watcher = ListingWatcher(self.catalog, self.fetcher, request_rate=listing_rate)
+        self.krw_markets = []
 
     def get_all_krw_markets(self):
-        """获取所有KRW交易对"""
-        url = "https://api.upbit.com/v1/market/all"
+        """获取所有KRW交易对(优先读取磁盘缓存, 后台按TTL刷新)"""
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            markets = response.json()
-            return [market['market'] for market in markets if market['market'].startswith('KRW-')]
+            return self.catalog.get_markets()
         except Exception as e:
             print(f"获取交易对列表失败: {e}")
             return []
 
+    def on_markets_changed(self, added, removed, markets):
+        """交易对目录变更: 按上币顺序更新展示列表"""
+        self.krw_markets = [m for m in markets if m != "KRW-USDT"]
+        self.fetcher.forget(removed)
+
+    def on_new_listing(self, market, window):
+        """新上币: 立即单独获取一次行情, 不等下一轮刷新"""
+        start = time.monotonic()
+        try:
+            # 在监测线程中调用: 直接请求单批, 不经过主循环也在使用的分批缓存与过期/熔断状态
+            data = self.fetcher.fetch_batch([market])
+        except Exception as e:
+            print(f"⚠️ 获取新上币行情失败: {e}")
+            data = None
+        detect = f"检测时延≤{window:.2f}秒" if window is not None else "启动时补齐"
+        quote = f"首笔行情{(time.monotonic() - start) * 1000:.0f}ms"
+        if data:
+            price = data[0].get('trade_price')
+            quote += f" | {price:,.1f} KRW" if price else ""
+            if price and self.usdt_krw_price:
+                quote += f" ≈ {price / self.usdt_krw_price:,.4f} USDT"
+        print(f"🆕 新上币 {market} | {detect} | {quote}")
+
     def get_usdt_krw_price(self):
         """获取USDT-KRW价格"""
-        url = "https://api.upbit.com/v1/ticker"
-        params = {"markets": "KRW-USDT"}
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self.fetcher.fetch_tickers(["KRW-USDT"])
             if data and isinstance(data, list):
                 return data[0].get('trade_price')
             return None
@@ -36,13 +59,9 @@ class UpbitKRWtoUSDTConverter:
             return None
 
     def get_market_prices(self, markets):
-        """批量获取多个交易对价格"""
-        url = "https://api.upbit.com/v1/ticker"
-        params = {"markets": ",".join(markets)}
+        """批量获取多个交易对价格(分批并发请求, 按交易对顺序返回)"""
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self.fetcher.fetch_tickers(markets)
         except Exception as e:
             print(f"获取市场价格失败: {e}")
             return []
@@ -58,12 +77,25 @@ class UpbitKRWtoUSDTConverter:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"\n[Upbit KRW交易对USDT计价] {timestamp}")
         print(f"基准汇率: 1 USDT = {self.usdt_krw_price:,.1f} KRW")
+        if self.fetcher.last_cycle_time is not None:
+            budget = self.fetcher.rate_limiter.remaining('ticker')
+            print(f"本轮获取耗时: {self.fetcher.last_cycle_time:.3f}秒 | "
+                  f"ticker剩余额度: {budget['sec'] if budget['sec'] is not None else '-'}次/秒")
+        watcher = self.listing_watcher
+        if watcher.last_poll_time is not None:
+            latest = watcher.listings[-1]['market'] if watcher.listings else "-"
+            print(f"上币监测: 每秒{watcher.request_rate:g}次 | 目录请求耗时: {watcher.last_poll_time:.3f}秒 | "
+                  f"最近新上币: {latest}")
+        if self.fetcher.stale:
+            print(f"⚠️ {len(self.fetcher.stale)}个交易对本轮获取失败, 显示上次数据(标记~) | "
+                  f"熔断中: {len(self.fetcher.open_markets())}个")
         print("-" * 60)
         print(f"{'交易对':<10}{'KRW价格':>15}{'USDT价格':>15}{'24h交易量(USDT)':>20}")
         print("-" * 60)
 
+        stale = self.fetcher.stale
         for item in data:
-            market = item['market'].replace("KRW-", "")
+            market = ("~" if item['market'] in stale else "") + item['market'].replace("KRW-", "")
             krw_price = item.get('trade_price', 0)
             usdt_price = self.convert_to_usdt(krw_price)
             volume_krw = item.get('acc_trade_price_24h', 0)
@@ -81,7 +113,10 @@ class UpbitKRWtoUSDTConverter:
             return
 
         # 移除USDT本身，避免重复
-        krw_markets = [m for m in krw_markets if m != "KRW-USDT"]
+        self.krw_markets = [m for m in krw_markets if m != "KRW-USDT"]
+        self.catalog.add_listener(self.on_markets_changed)
+        self.listing_watcher.add_listener(self.on_new_listing)
+        self.listing_watcher.start()
 
         try:
             while True:
@@ -89,13 +124,8 @@ class UpbitKRWtoUSDTConverter:
                 self.usdt_krw_price = self.get_usdt_krw_price()
 
                 if self.usdt_krw_price:
-                    # 分批获取所有KRW交易对价格（避免一次性请求太多）
-                    batch_size = 10  # Upbit API单次请求限制
-                    all_data = []
-                    for i in range(0, len(krw_markets), batch_size):
-                        batch = krw_markets[i:i + batch_size]
-                        batch_data = self.get_market_prices(batch)
-                        all_data.extend(batch_data)
+                    # 分批并发获取所有KRW交易对价格（Upbit API单次最多10个）
+                    all_data = self.get_market_prices(self.krw_markets)
 
                     if all_data:
                         self.display_results(all_data)
@@ -103,8 +133,18 @@ class UpbitKRWtoUSDTConverter:
                 time.sleep(self.update_interval)
         except KeyboardInterrupt:
             print("\n监控已停止")
+        finally:
+            self.listing_watcher.stop()
+            self.fetcher.close()
+
+
+def run_standalone(args):
+    """独立运行本脚本自身的监控(自己的获取层与交易对目录)"""
+    UpbitKRWtoUSDTConverter(update_interval=args.interval).run()
 
 
 if __name__ == "__main__":
-    monitor = UpbitKRWtoUSDTConverter(update_interval=5)
-    monitor.run()
\ No newline at end of file
+    # 安装依赖: pip install requests numpy websocket-client
+    # 默认作为多视图引擎的上币顺序视图运行, 与其他监控脚本共用一份采集(共享快照); --standalone运行本脚本自身的监控
+    from upbit_engine import run_view
+    run_view("listing", 5, "Upbit KRW交易对按上币顺序展示(USDT计价)", listing_rate=2.0, standalone=run_standalone)
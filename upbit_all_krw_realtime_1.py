@@ -1,39 +1,79 @@
-import requests
 import time
 from datetime import datetime
 from texttable import Texttable  # 用于创建美观的表格输出
+from upbit_leaderboard import Leaderboard
+from upbit_market_catalog import UpbitMarketCatalog
+from upbit_metrics import PROCESS_TIME, RENDER_TIME, observe_cycle, observe_staleness, start_metrics_server
+from upbit_resilient_fetcher import ResilientTickerFetcher
+from upbit_terminal_renderer import DiffRenderer
+from upbit_tick_recorder import TickRecorder
+from upbit_ticker_stream import UpbitTickerStream
 # upbit交易量前100 每60s更新
 
 class UpbitKRWtoUSDTMonitor:
-    def __init__(self):
+    def __init__(self, use_stream=True, stream_url="wss://api.upbit.com/websocket/v1", diff_render=True,
+                 record_dir=None, replay=None, metrics_port=None, output=None):
         self.usdt_krw_price = None
         self.update_interval = 60  # 10秒更新一次
         self.max_display = 100  # 最多显示10个主要交易对
+        self.use_stream = use_stream  # 使用WebSocket推送代替REST轮询
+        self.stream_url = stream_url
+        self.ticker_stream = None
+        self.replay = replay  # 离线回放源(ReplaySource), 设置后不访问网络
+        self.metrics_port = metrics_port  # 设置后在本地端口输出Prometheus指标
+        self.metrics_server = None
+        self.output = output  # 无界面输出(HeadlessWriter), 设置后不再绘制表格
+        self.diff_render = diff_render  # 差分渲染代替清屏+整表重绘
+        self.renderer = None
+        self.recorder = TickRecorder(record_dir) if record_dir else None  # 记录每条行情供事后回看
+        self.columns = ["交易对", "KRW价格", "USDT价格", "24h涨跌幅", "24h交易量(USDT)"]
+        self.col_widths = [10, 15, 15, 15, 15]
+        self.col_aligns = ["l", "r", "r", "r", "r"]
+        self.krw_markets = []
+        self.leaderboard = Leaderboard(size=self.max_display)  # 按24h交易额增量维护的排行榜
+        self.fetcher = ResilientTickerFetcher(timeout=60)  # 单批失败时其余批次照常显示, 失败的交易对沿用旧数据
+        self.catalog = UpbitMarketCatalog(self.fetcher.fetch_markets, exclude=("KRW-USDT",))
 
     def get_all_krw_markets(self):
-        """获取所有KRW交易对"""
-        url = "https://api.upbit.com/v1/market/all"
+        """获取所有KRW交易对(优先读取磁盘缓存, 后台按TTL刷新)"""
+        if self.replay:
+            return [m for m in self.replay.markets if m != "KRW-USDT"]
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            return [m['market'] for m in response.json() if
-                    m['market'].startswith('KRW-') and m['market'] != 'KRW-USDT']
+            return self.catalog.get_markets()
         except Exception as e:
             print(f"⚠️ 获取交易对列表失败: {e}")
             return []
 
+    def on_markets_changed(self, added, removed, markets):
+        """交易对目录变更: 更新轮询列表并重新订阅行情流"""
+        self.krw_markets = markets
+        self.fetcher.forget(removed)
+        for market in removed:
+            self.leaderboard.remove(market)
+        if self.ticker_stream:
+            self.ticker_stream.set_markets(["KRW-USDT"] + markets)
+
+    def start_stream(self, markets):
+        """启动WebSocket行情流, 一次订阅全部KRW交易对及KRW-USDT"""
+        self.ticker_stream = UpbitTickerStream(["KRW-USDT"] + markets, url=self.stream_url)
+        if self.recorder:
+            # 按推送速率逐条记录
+            self.ticker_stream.add_listener(self.recorder.append_ticker)
+        self.ticker_stream.start()
+        if not self.ticker_stream.wait_ready(timeout=10):
+            print("⚠️ 行情流暂未收到数据, 将继续等待推送")
+
     def fetch_prices(self, markets):
         """批量获取价格数据"""
-        url = "https://api.upbit.com/v1/ticker"
+        if self.replay:
+            return self.replay.fetch_tickers(markets) or None
+        if self.ticker_stream:
+            # 直接读取推送维护的最新行情表, 不再发起HTTP请求
+            return self.ticker_stream.fetch_tickers(markets) or None
+
         try:
-            # 分批获取避免请求过大
-            results = []
-            for i in range(0, len(markets), 10):  # Upbit API每次最多查询10个
-                params = {"markets": ",".join(markets[i:i + 10])}
-                response = requests.get(url, params=params, timeout=60)
-                response.raise_for_status()
-                results.extend(response.json())
-            return results
+            # 分批(每次最多10个)并发获取, 复用连接池
+            return self.fetcher.fetch_tickers(markets)
         except Exception as e:
             print(f"⚠️ 获取价格数据失败: {e}")
             return None
@@ -42,46 +82,87 @@ class UpbitKRWtoUSDTMonitor:
         """清空终端屏幕"""
         print("\033c", end="")  # 跨平台的清屏方法
 
-    def display_market_data(self, data):
-        """显示市场数据"""
-        self.clear_screen()
-
-        # 获取当前时间
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # 创建表格
-        table = Texttable()
-        table.set_deco(Texttable.HEADER)
-        table.set_cols_align(["l", "r", "r", "r", "r"])
-        table.set_cols_width([10, 15, 15, 15, 15])
-
-        # 表头
-        table.header(["交易对", "KRW价格", "USDT价格", "24h涨跌幅", "24h交易量(USDT)"])
-
-        # 按交易量排序并选取前N个
-        sorted_data = sorted(data, key=lambda x: x.get('acc_trade_price_24h', 0), reverse=True)
-        top_markets = sorted_data[:self.max_display]
-
+    @staticmethod
+    def rank_marker(event):
+        """名次变化标记: 新进前N为*, 上升/下降显示变化的名次"""
+        if not event:
+            return ""
+        if event['type'] == 'entered':
+            return " *"
+        delta = event['old_rank'] - event['new_rank']
+        return f" ↑{delta}" if delta > 0 else f" ↓{-delta}"
+
+    def build_rows(self, data):
+        """按交易量取前N个并格式化为表格行"""
+        # 增量更新排行榜(只有交易额变化的交易对需要重新定位), 并取前N个
+        first_round = len(self.leaderboard) == 0
+        events = self.leaderboard.update_many((item['market'], item.get('acc_trade_price_24h', 0)) for item in data)
+        moves = {} if first_round else {e['market']: e for e in events}
+        by_market = {item['market']: item for item in data}
+        top_markets = [by_market[m] for m, _ in self.leaderboard.top() if m in by_market]
+
+        rows = []
         for item in top_markets:
-            market = item['market'].replace("KRW-", "")
+            market = item['market'].replace("KRW-", "") + self.rank_marker(moves.get(item['market']))
+            if item['market'] in self.fetcher.stale:
+                market = "~" + market
             krw_price = item.get('trade_price', 0)
             usdt_price = krw_price / self.usdt_krw_price if self.usdt_krw_price else 0
             change = (item.get('signed_change_rate', 0) * 100)
             change_str = f"{change:+.2f}%"
             volume_usdt = item.get('acc_trade_price_24h', 0) / self.usdt_krw_price if self.usdt_krw_price else 0
 
-            table.add_row([
+            rows.append([
                 market,
                 f"{krw_price:,.0f}",
                 f"{usdt_price:,.4f}",
                 change_str,
                 f"{volume_usdt:,.1f}"
             ])
+        return rows
+
+    def header_lines(self):
+        """表格上方的信息行"""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        lines = [
+            f"🔄 Upbit KRW交易对USDT计价监控 | 更新时间: {now}",
+            f"💱 基准汇率: 1 USDT = {self.usdt_krw_price:,.1f} KRW",
+            f"📊 显示交易量前{self.max_display}的交易对 (每{self.update_interval}秒更新)",
+        ]
+        if self.fetcher.last_cycle_time is not None:
+            budget = self.fetcher.rate_limiter.remaining('ticker')
+            lines.append(f"⏱️ 本轮行情获取耗时: {self.fetcher.last_cycle_time:.3f}秒 | "
+                         f"ticker剩余额度: {budget['sec'] if budget['sec'] is not None else '-'}次/秒")
+        if self.fetcher.stale:
+            lines.append(f"⚠️ {len(self.fetcher.stale)}个交易对本轮获取失败, 显示上次数据(标记~, 最旧"
+                         f"{max(self.fetcher.stale.values()):.0f}秒前) | 熔断中: {len(self.fetcher.open_markets())}个")
+        return lines
+
+    def display_market_data(self, data, rows=None):
+        """显示市场数据(rows为已格式化的表格行, 缺省时由data生成)"""
+        if rows is None:
+            rows = self.build_rows(data)
+
+        if self.renderer:
+            # 差分渲染: 只提交新帧, 由渲染线程重写变化的单元格
+            self.renderer.submit(self.header_lines() + [self.columns, self.renderer.rule()] + rows + ["🛑 按 Ctrl+C 停止监控"])
+            return
+
+        self.clear_screen()
+
+        # 创建表格
+        table = Texttable()
+        table.set_deco(Texttable.HEADER)
+        table.set_cols_align(self.col_aligns)
+        table.set_cols_width(self.col_widths)
+
+        # 表头
+        table.header(self.columns)
+        table.add_rows(rows, header=False)
 
         # 显示信息
-        print(f"🔄 Upbit KRW交易对USDT计价监控 | 更新时间: {now}")
-        print(f"💱 基准汇率: 1 USDT = {self.usdt_krw_price:,.1f} KRW")
-        print(f"📊 显示交易量前{self.max_display}的交易对 (每{self.update_interval}秒更新)")
+        for line in self.header_lines():
+            print(line)
         print(table.draw())
         print("🛑 按 Ctrl+C 停止监控")
 
@@ -89,28 +170,52 @@ class UpbitKRWtoUSDTMonitor:
         print("🚀 启动Upbit KRW交易对USDT计价监控...")
 
         # 首次获取所有KRW交易对
-        krw_markets = self.get_all_krw_markets()
-        if not krw_markets:
+        self.krw_markets = self.get_all_krw_markets()
+        if not self.krw_markets:
             print("无法获取任何KRW交易对，请检查网络连接")
             return
 
+        if not self.replay:
+            self.catalog.add_listener(self.on_markets_changed)
+            self.catalog.start()
+            if self.use_stream:
+                self.start_stream(self.krw_markets)
+        if self.metrics_port:
+            self.metrics_server = start_metrics_server(self.metrics_port)
+
+        if self.diff_render and not self.output:
+            self.renderer = DiffRenderer(self.col_widths, self.col_aligns).start()
+
         try:
             while True:
                 start_time = time.time()
 
-                # 1. 获取USDT-KRW汇率
-                usdt_data = self.fetch_prices(["KRW-USDT"])
-                if usdt_data and len(usdt_data) > 0:
-                    self.usdt_krw_price = usdt_data[0].get('trade_price')
-
-                # 2. 获取其他KRW交易对数据
-                if self.usdt_krw_price:
-                    market_data = self.fetch_prices(krw_markets)
+                # 1. 一次获取USDT-KRW汇率与全部KRW交易对数据(结果按交易对顺序, USDT在首位)
+                all_data = self.fetch_prices(["KRW-USDT"] + self.krw_markets)
+                if self.replay and self.replay.exhausted:
+                    break
+                market_data = all_data
+                if all_data:
+                    observe_staleness("top100", all_data)
+                    if self.recorder and not self.ticker_stream:
+                        self.recorder.append_tickers(all_data)
+                    if all_data[0]['market'] == "KRW-USDT":
+                        self.usdt_krw_price = all_data[0].get('trade_price')
+                        market_data = all_data[1:]
+
+                # 2. 处理并显示其他KRW交易对数据
+                if self.output:
                     if market_data:
-                        self.display_market_data(market_data)
+                        self.output.write_snapshot(market_data, self.usdt_krw_price)
+                elif self.usdt_krw_price and market_data:
+                    with PROCESS_TIME.time("top100"):
+                        rows = self.build_rows(market_data)
+                    with RENDER_TIME.time("top100"):
+                        self.display_market_data(market_data, rows)
 
                 # 计算剩余等待时间
                 elapsed = time.time() - start_time
+                observe_cycle("top100", elapsed, self.update_interval)
                 sleep_time = max(0, self.update_interval - elapsed)
                 time.sleep(sleep_time)
 
@@ -118,9 +223,31 @@ class UpbitKRWtoUSDTMonitor:
             print("\n🛑 监控已停止")
         except Exception as e:
             print(f"❌ 发生错误: {e}")
+        finally:
+            if self.renderer:
+                self.renderer.stop()
+            self.catalog.stop()
+            if self.ticker_stream:
+                self.ticker_stream.stop()
+            self.fetcher.close()
+            if self.recorder:
+                self.recorder.close()
+            if self.metrics_server:
+                self.metrics_server.stop()
+            if self.output:
+                self.output.close()
+
+
+def run_standalone(args):
+    """独立运行本脚本自身的监控(自己的行情流、记录器与指标端口)"""
+    monitor = UpbitKRWtoUSDTMonitor(use_stream=not args.rest, diff_render=not args.no_diff,
+                                    record_dir=args.record, metrics_port=args.metrics_port)
+    monitor.update_interval = args.interval
+    monitor.run()
 
 
 if __name__ == "__main__":
-    # 安装必要的库: pip install requests texttable
-    monitor = UpbitKRWtoUSDTMonitor()
-    monitor.run()
\ No newline at end of file
+    # 安装必要的库: pip install requests numpy websocket-client
+    # 默认作为多视图引擎的交易量前100视图运行, 与其他监控脚本共用一份采集(共享快照); --standalone运行本脚本自身的监控
+    from upbit_engine import run_view
+    run_view("top100", 60, "Upbit KRW交易对交易量前100(USDT计价)", standalone=run_standalone, record=True)
@@ -0,0 +1,374 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from upbit_rate_limiter import DEFAULT_RATES, UpbitRateLimiter
+from upbit_resilient_fetcher import ResilientTickerFetcher
+from upbit_ticker_record import DECODER_NAME, decode_tickers
+# 基准测试: 本地模拟Upbit行情接口(可配置延迟与交易对数量), 测量 fetch → process → display 各阶段耗时与吞吐, 结果写为JSON
+
+
+def synthetic_markets(count):
+    """KRW-USDT + count个合成KRW交易对"""
+    return ["KRW-USDT"] + [f"KRW-T{i:05d}" for i in range(count)]
+
+
+def synthetic_ticker(market, rng, now):
+    """与/v1/ticker字段一致的合成行情(约26个字段)"""
+    price = 1400.0 if market == "KRW-USDT" else round(rng.uniform(1, 1e8), 2)
+    prev = round(price * rng.uniform(0.7, 1.3), 2)
+    change = price - prev
+    return {
+        "market": market,
+        "trade_date": "20240101", "trade_time": "000000",
+        "trade_date_kst": "20240101", "trade_time_kst": "090000",
+        "trade_timestamp": now,
+        "opening_price": prev, "high_price": max(price, prev) * 1.01, "low_price": min(price, prev) * 0.99,
+        "trade_price": price, "prev_closing_price": prev,
+        "change": "RISE" if change > 0 else "FALL" if change < 0 else "EVEN",
+        "change_price": abs(change), "change_rate": abs(change) / prev,
+        "signed_change_price": change, "signed_change_rate": change / prev,
+        "trade_volume": rng.uniform(0, 100),
+        "acc_trade_price": rng.uniform(1e6, 1e11), "acc_trade_price_24h": rng.uniform(1e6, 1e12),
+        "acc_trade_volume": rng.uniform(1, 1e6), "acc_trade_volume_24h": rng.uniform(1, 1e7),
+        "highest_52_week_price": price * 2, "highest_52_week_date": "2023-12-01",
+        "lowest_52_week_price": price / 2, "lowest_52_week_date": "2023-06-01",
+        "timestamp": now,
+    }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持长连接, 与真实接口一致
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        stub = self.server
+        stub.requests += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if url.path == "/v1/market/all":
+            body = stub.market_list
+        elif url.path == "/v1/ticker":
+            codes = parse_qs(url.query).get("markets", [""])[0].split(",")
+            body = b"[" + b",".join(stub.ticker_json[m] for m in codes if m in stub.ticker_json) + b"]"
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Remaining-Req", f"group={'market' if url.path == '/v1/market/all' else 'ticker'}; min=1800; sec=29")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubUpbitAPI(ThreadingHTTPServer):
+    """本地模拟 /v1/market/all 与 /v1/ticker, 响应预先编码, 避免桩本身成为瓶颈"""
+
+    daemon_threads = True
+
+    def __init__(self, markets, latency=0.05, host="127.0.0.1", seed=0):
+        super().__init__((host, 0), _StubHandler)
+        self.latency = latency  # 每个请求的模拟网络延迟(秒)
+        self.requests = 0
+        self.markets = list(markets)
+
+        rng = random.Random(seed)
+        now = int(time.time() * 1000)
+        self.market_list = json.dumps([
+            {"market": m, "korean_name": m, "english_name": m} for m in self.markets
+        ]).encode()
+        self.ticker_json = {}
+        for m in self.markets:
+            self.ticker_json[m] = json.dumps(synthetic_ticker(m, rng, now)).encode()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="upbit-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def measure(func, rounds, warmup=1, prepare=None):
+    """重复调用func, 返回每轮耗时(秒)与最后一次结果; prepare在计时之外调用"""
+    result = None
+    timings = []
+    for i in range(warmup + rounds):
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed)
+    return timings, result
+
+
+def summarize(stage, market_count, timings, items=None, **extra):
+    """汇总为一条结果记录(毫秒), items为每轮处理的交易对数量"""
+    ordered = sorted(timings)
+    mean = statistics.fmean(ordered)
+    record = {
+        'stage': stage,
+        'markets': market_count,
+        'rounds': len(ordered),
+        'mean_ms': mean * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'min_ms': ordered[0] * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'cycles_per_sec': 1 / mean if mean else None,
+        'markets_per_sec': (items or market_count) / mean if mean else None,
+    }
+    record.update(extra)
+    return record
+
+
+def jitter_volumes(data, rng):
+    """轮次之间扰动交易额, 使排序与排行榜每轮都有实际变化"""
+    for item in data:
+        item['acc_trade_price_24h'] *= rng.uniform(0.9, 1.1)
+
+
+def make_rate_limiter(upbit_limits):
+    """默认不限速以测量自身开销; upbit_limits=True时使用Upbit默认每秒10次"""
+    if upbit_limits:
+        return UpbitRateLimiter()
+    return UpbitRateLimiter(rates={group: 1e9 for group in DEFAULT_RATES})
+
+
+def bench_rest(stub, count, rounds, max_workers, upbit_limits):
+    """REST路径: 交易对目录、fetch_prices, 以及top15/top100的处理与Texttable显示"""
+    from upbit_all_krw_realtime_1 import UpbitKRWtoUSDTMonitor as Top100Monitor
+    from upbit_all_krw_realtime_2 import UpbitKRWtoUSDTMonitor as Top15Monitor
+
+    results = []
+    rng = random.Random(1)
+    top15 = Top15Monitor(use_stream=False, diff_render=False)
+    top100 = Top100Monitor(use_stream=False, diff_render=False)
+    top15.fetcher.close()
+    # 与监控实际使用的获取层一致(build_rows/header_lines读取其过期与熔断状态)
+    top15.fetcher = ResilientTickerFetcher(base_url=stub.url, max_workers=max_workers, timeout=60,
+                                           rate_limiter=make_rate_limiter(upbit_limits))
+    try:
+        timings, markets = measure(lambda: top15.fetcher.fetch_markets("KRW"), rounds)
+        results.append(summarize("rest.fetch_markets", count, timings))
+
+        top15.krw_markets = [m for m in markets if m != "KRW-USDT"]
+        requests_before = stub.requests
+        timings, data = measure(lambda: top15.fetch_prices(["KRW-USDT"] + top15.krw_markets), rounds)
+        per_round = (stub.requests - requests_before) / (rounds + 1)
+        results.append(summarize("rest.fetch_prices", count, timings, requests_per_cycle=per_round,
+                                 max_workers=max_workers))
+        if not data:
+            print(f"⚠️ {count}个交易对: fetch_prices未返回数据, 跳过处理与显示阶段")
+            return results
+
+        usdt = data[0]['trade_price']
+        market_data = data[1:]
+        top15.usdt_krw_price = usdt
+        top100.usdt_krw_price = usdt
+
+        timings, processed = measure(lambda: top15.process_market_data(market_data), rounds,
+                                     prepare=lambda: jitter_volumes(market_data, rng))
+        results.append(summarize("top15.process_market_data", count, timings))
+
+        sink = io.StringIO()
+        with contextlib.redirect_stdout(sink):
+            timings, _ = measure(lambda: top15.display_data(processed), rounds)
+        results.append(summarize("top15.display_texttable", count, timings, items=len(processed)))
+
+        timings, _ = measure(lambda: top100.build_rows(market_data), rounds,
+                             prepare=lambda: jitter_volumes(market_data, rng))
+        results.append(summarize("top100.build_rows", count, timings))
+
+        with contextlib.redirect_stdout(sink):
+            timings, _ = measure(lambda: top100.display_market_data(market_data), rounds,
+                                 prepare=lambda: jitter_volumes(market_data, rng))
+        results.append(summarize("top100.display_texttable", count, timings))
+    finally:
+        top15.fetcher.close()
+        top100.fetcher.close()
+    return results
+
+
+def _use_fields(tickers):
+    """模拟监控对每条行情的字段访问"""
+    for t in tickers:
+        t['market'], t.get('trade_price'), t.get('acc_trade_price_24h'), t.get('signed_change_rate')
+
+
+def _retained_bytes(func):
+    """解析结果常驻内存的字节数"""
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_decode(count, rounds, batch_size=10):
+    """行情解析: response.json()得到dict vs 紧凑Ticker记录, 按每批10个交易对的真实响应大小"""
+    rng = random.Random(2)
+    now = int(time.time() * 1000)
+    markets = synthetic_markets(count)
+    bodies = [json.dumps([synthetic_ticker(m, rng, now) for m in markets[i:i + batch_size]]).encode()
+              for i in range(0, len(markets), batch_size)]
+
+    decoders = {
+        'decode.json_dict': lambda body: json.loads(body),
+        f'decode.{DECODER_NAME}': decode_tickers,
+    }
+    results = []
+    for stage, decode in decoders.items():
+        def run():
+            decoded = [decode(body) for body in bodies]
+            for tickers in decoded:
+                _use_fields(tickers)
+            return decoded
+
+        timings, _ = measure(run, rounds)
+        retained = _retained_bytes(lambda: [decode(body) for body in bodies])
+        results.append(summarize(stage, count, timings, retained_bytes=retained,
+                                 bytes_per_market=retained / len(markets)))
+    return results
+
+
+def bench_ccxt(stub, count, rounds, upbit_limits):
+    """CCXT路径: 把交易所主机指向桩服务, 测量load_markets/fetch_tickers/处理/显示"""
+    try:
+        import ccxt
+        from upbit_krw_realtime_vol import UpbitKRWMarketMonitor
+    except ImportError as e:
+        print(f"⚠️ 跳过CCXT基准: {e}")
+        return []
+
+    exchange = ccxt.upbit({'enableRateLimit': upbit_limits, 'timeout': 60000})
+    exchange.urls['api'] = {'public': stub.url, 'private': stub.url}
+    monitor = UpbitKRWMarketMonitor(diff_render=False, exchange=exchange)
+    results = []
+    try:
+        timings, _ = measure(lambda: exchange.load_markets(reload=True), rounds)
+        results.append(summarize("ccxt.load_markets", count, timings))
+
+        monitor.krw_markets = [s for s in exchange.symbols if s != 'USDT/KRW']
+        symbols = ['USDT/KRW'] + monitor.krw_markets
+        requests_before = stub.requests
+        timings, tickers = measure(lambda: monitor.fetch_tickers(symbols), rounds)
+        per_round = (stub.requests - requests_before) / (rounds + 1)
+        results.append(summarize("ccxt.fetch_tickers", count, timings, requests_per_cycle=per_round))
+        if not tickers:
+            print(f"⚠️ {count}个交易对: CCXT fetch_tickers未返回数据, 跳过处理与显示阶段")
+            return results
+
+        monitor.usdt_krw_rate = tickers['USDT/KRW']['last']
+        timings, processed = measure(lambda: monitor.process_market_data(tickers), rounds)
+        results.append(summarize("ccxt.process_market_data", count, timings))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings, _ = measure(lambda: monitor.display_market_data(processed), rounds)
+        results.append(summarize("ccxt.display_texttable", count, timings, items=len(processed)))
+    finally:
+        exchange.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """与基线结果比较, 返回 mean_ms 变慢超过threshold(比例)的阶段"""
+    base = {(r['stage'], r['markets']): r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        old = base.get((r['stage'], r['markets']))
+        if old and old['mean_ms'] and r['mean_ms'] > old['mean_ms'] * (1 + threshold):
+            regressions.append({
+                'stage': r['stage'],
+                'markets': r['markets'],
+                'baseline_ms': old['mean_ms'],
+                'current_ms': r['mean_ms'],
+                'ratio': r['mean_ms'] / old['mean_ms'],
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upbit监控各阶段基准测试(本地模拟接口)")
+    parser.add_argument("--markets", default="150,1000,10000", help="合成交易对数量, 逗号分隔")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟接口每个请求的延迟(秒)")
+    parser.add_argument("--rounds", type=int, default=5, help="每个阶段的计时轮数")
+    parser.add_argument("--max-workers", type=int, default=5, help="REST并发请求数")
+    parser.add_argument("--upbit-limits", action="store_true", help="按Upbit默认限速(每秒10次)发送请求")
+    parser.add_argument("--skip-ccxt", action="store_true", help="不测试CCXT路径")
+    parser.add_argument("--output", default="upbit_benchmark.json", help="JSON结果文件")
+    parser.add_argument("--baseline", help="与之比较的历史JSON结果")
+    parser.add_argument("--threshold", type=float, default=0.2, help="mean_ms变慢超过该比例视为回归")
+    args = parser.parse_args()
+
+    results = []
+    for count in [int(n) for n in args.markets.split(",")]:
+        stub = StubUpbitAPI(synthetic_markets(count), latency=args.latency).start()
+        try:
+            print(f"⏱️ {count}个交易对, 模拟延迟{args.latency * 1000:.0f}ms ...")
+            results += bench_decode(count, args.rounds)
+            results += bench_rest(stub, count, args.rounds, args.max_workers, args.upbit_limits)
+            if not args.skip_ccxt:
+                results += bench_ccxt(stub, count, args.rounds, args.upbit_limits)
+        finally:
+            stub.stop()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency': args.latency,
+            'rounds': args.rounds,
+            'max_workers': args.max_workers,
+            'upbit_limits': args.upbit_limits,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"{'阶段':<28}{'交易对':>8}{'平均(ms)':>12}{'p95(ms)':>12}{'交易对/秒':>14}")
+    for r in results:
+        print(f"{r['stage']:<30}{r['markets']:>8}{r['mean_ms']:>12.2f}{r['p95_ms']:>12.2f}{r['markets_per_sec']:>14,.0f}")
+    print(f"📝 结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for r in regressions:
+            print(f"❌ 回归: {r['stage']} ({r['markets']}个交易对) {r['baseline_ms']:.2f}ms → {r['current_ms']:.2f}ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    # 安装依赖: pip install requests texttable numpy (可选: ccxt)
+    main()
@@ -0,0 +1,286 @@
+import math
+
+import numpy as np
+from upbit_engine import VIEWS, MonitorEngine, MonitorView, _fmt, _short
+from upbit_snapshot import MarketIndex
+# 增量K线: 由逐条ticker构建各交易对的1m/5m/1h OHLCV, 在固定大小的环形缓冲中以O(1)维护VWAP、EMA与波动率
+
+DEFAULT_INTERVALS = (60, 300, 3600)  # 秒
+
+
+class _CandleSeries:
+    """单一周期的K线环形缓冲: 每个交易对一行, 每行depth根K线"""
+
+    def __init__(self, interval, depth, capacity, ema_span):
+        self.interval_ms = interval * 1000
+        self.depth = depth
+        self.alpha = 2.0 / (ema_span + 1)
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        depth = self.depth
+        self.start = np.full(capacity, -1, dtype=np.int64)  # 当前K线的起始时间(毫秒)
+        self.head = np.zeros(capacity, dtype=np.intp)  # 当前K线所在槽位
+        self.begin = np.zeros((capacity, depth), dtype=np.int64)  # 各槽位K线的起始时间
+        self.count = np.zeros(capacity, dtype=np.intp)  # 缓冲中的K线数(含当前)
+        self.open = np.full((capacity, depth), np.nan)
+        self.high = np.full((capacity, depth), np.nan)
+        self.low = np.full((capacity, depth), np.nan)
+        self.close = np.full((capacity, depth), np.nan)
+        self.value = np.zeros((capacity, depth))  # 成交额(KRW)
+        self.volume = np.zeros((capacity, depth))  # 成交量(币)
+        self.ret = np.full((capacity, depth), np.nan)  # 该K线收盘相对上一根收盘的对数收益
+        self.ema = np.full(capacity, np.nan)  # 收盘价EMA(K线收盘时更新)
+        self.last_close = np.full(capacity, np.nan)
+        # 窗口内的累计量, K线进入/移出缓冲时加减, 不重新扫描
+        self.sum_value = np.zeros(capacity)
+        self.sum_volume = np.zeros(capacity)
+        self.ret_sum = np.zeros(capacity)
+        self.ret_sq = np.zeros(capacity)
+        self.ret_n = np.zeros(capacity, dtype=np.intp)
+
+    def grow(self, capacity):
+        old = self.__dict__.copy()
+        size = len(old['start'])
+        self._alloc(capacity)
+        for name, array in old.items():
+            if isinstance(array, np.ndarray):
+                getattr(self, name)[:size] = array
+
+    def _advance(self, m, bucket):
+        """收盘当前K线并开启新K线"""
+        h = self.head[m]
+        if self.count[m]:
+            close = self.close[m, h]
+            last = self.last_close[m]
+            if last > 0 and close > 0:
+                r = math.log(close / last)
+                self.ret[m, h] = r
+                self.ret_sum[m] += r
+                self.ret_sq[m] += r * r
+                self.ret_n[m] += 1
+            self.last_close[m] = close
+            ema = self.ema[m]
+            self.ema[m] = close if ema != ema else ema + self.alpha * (close - ema)
+
+            h = (h + 1) % self.depth
+            if self.count[m] == self.depth:
+                # 缓冲已满: 移出最旧的K线
+                self.sum_value[m] -= self.value[m, h]
+                self.sum_volume[m] -= self.volume[m, h]
+                r = self.ret[m, h]
+                if r == r:
+                    self.ret_sum[m] -= r
+                    self.ret_sq[m] -= r * r
+                    self.ret_n[m] -= 1
+            else:
+                self.count[m] += 1
+        else:
+            self.count[m] = 1
+        self.head[m] = h
+        self.start[m] = bucket
+        self.begin[m, h] = bucket
+        self.value[m, h] = 0.0
+        self.volume[m, h] = 0.0
+        self.ret[m, h] = np.nan
+        return h
+
+    def update(self, m, timestamp, price, traded_value, traded_volume):
+        bucket = timestamp - timestamp % self.interval_ms
+        if bucket > self.start[m]:
+            h = self._advance(m, bucket)
+            self.open[m, h] = self.high[m, h] = self.low[m, h] = price
+        else:
+            h = self.head[m]
+            if price > self.high[m, h]:
+                self.high[m, h] = price
+            if price < self.low[m, h]:
+                self.low[m, h] = price
+        self.close[m, h] = price
+        self.value[m, h] += traded_value
+        self.volume[m, h] += traded_volume
+        self.sum_value[m] += traded_value
+        self.sum_volume[m] += traded_volume
+
+
+class CandleAggregator:
+    def __init__(self, index=None, intervals=DEFAULT_INTERVALS, depth=120, ema_span=20, capacity=256):
+        self.index = index if index is not None else MarketIndex()  # 与MarketSnapshot共用下标时, 指标数组可直接对齐快照
+        self.intervals = tuple(intervals)
+        self.depth = depth  # 每个周期保留的K线根数, 内存占用固定
+        capacity = max(capacity, len(self.index))
+        self.series = {interval: _CandleSeries(interval, depth, capacity, ema_span) for interval in self.intervals}
+        self._acc_value = np.full(capacity, np.nan)  # 上次看到的24h累计成交额
+        self._acc_volume = np.full(capacity, np.nan)
+        self._last_ts = np.zeros(capacity, dtype=np.int64)
+        self.updates = 0
+
+    def _ensure_capacity(self, size):
+        capacity = len(self._acc_value)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for series in self.series.values():
+            series.grow(capacity)
+        old = len(self._acc_value)
+        for name, fill in (('_acc_value', np.nan), ('_acc_volume', np.nan), ('_last_ts', 0)):
+            array = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+
+    def update(self, market, timestamp, price, acc_trade_price_24h=None, acc_trade_volume_24h=None):
+        """应用一条行情(O(1)): 成交额/量取24h累计值的增量"""
+        if price is None or not timestamp:
+            return
+        m = self.index.get(market)
+        self._ensure_capacity(len(self.index))
+        if timestamp <= self._last_ts[m]:
+            return  # 乱序或重复推送(成交额/量按累计值取增量, 跳过不会漏计)
+        self._last_ts[m] = timestamp
+
+        traded_value = traded_volume = 0.0
+        if acc_trade_price_24h is not None:
+            last = self._acc_value[m]
+            if last == last:
+                traded_value = max(0.0, acc_trade_price_24h - last)  # 24h窗口滚动可能使累计值下降
+            self._acc_value[m] = acc_trade_price_24h
+        if acc_trade_volume_24h is not None:
+            last = self._acc_volume[m]
+            if last == last:
+                traded_volume = max(0.0, acc_trade_volume_24h - last)
+            self._acc_volume[m] = acc_trade_volume_24h
+        elif traded_value:
+            traded_volume = traded_value / price
+
+        for series in self.series.values():
+            series.update(m, timestamp, price, traded_value, traded_volume)
+        self.updates += 1
+
+    def update_ticker(self, ticker):
+        """应用一条Upbit格式的行情(可直接注册为行情流的回调)"""
+        self.update(ticker['market'], ticker.get('timestamp'), ticker.get('trade_price'),
+                    ticker.get('acc_trade_price_24h'), ticker.get('acc_trade_volume_24h'))
+
+    def on_snapshot(self, engine):
+        """MonitorEngine回调: 时间戳未变的行情直接跳过"""
+        for ticker in list(engine.tickers.values()):
+            self.update_ticker(ticker)
+
+    # ---- 以下查询按交易对下标返回与index对齐的数组, 可直接用于排序 ----
+
+    def _size(self):
+        # 共用的index可能已由快照或其他组件登记了新交易对, 先扩容使各数组覆盖全部下标
+        size = len(self.index)
+        self._ensure_capacity(size)
+        return size
+
+    def change(self, interval, periods=1):
+        """最新价相对periods根K线前收盘价的涨跌幅; periods=0为相对当前K线开盘价"""
+        s = self.series[interval]
+        n = self._size()
+        rows = np.arange(n)
+        head = s.head[:n]
+        latest = s.close[rows, head]
+        if periods == 0:
+            base = s.open[rows, head]
+        else:
+            base = s.close[rows, (head - periods) % self.depth]
+            base = np.where(s.count[:n] > periods, base, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return latest / base - 1
+
+    def vwap(self, interval):
+        """缓冲窗口内的成交量加权均价"""
+        s = self.series[interval]
+        n = self._size()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(s.sum_volume[:n] > 0, s.sum_value[:n] / s.sum_volume[:n], np.nan)
+
+    def ema(self, interval):
+        return self.series[interval].ema[:self._size()].copy()
+
+    def volatility(self, interval):
+        """缓冲窗口内每根K线对数收益的标准差"""
+        s = self.series[interval]
+        n = self._size()
+        count = s.ret_n[:n]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = s.ret_sum[:n] / count
+            var = s.ret_sq[:n] / count - mean * mean
+        return np.where(count >= 2, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+    def candles(self, market, interval):
+        """单个交易对的K线(从旧到新)"""
+        m = self.index.find(market)
+        if m is None:
+            return []
+        self._ensure_capacity(len(self.index))
+        s = self.series[interval]
+        count = int(s.count[m])
+        slots = (s.head[m] - count + 1 + np.arange(count)) % self.depth
+        return [{
+            'start': int(s.begin[m, h]),
+            'open': float(s.open[m, h]),
+            'high': float(s.high[m, h]),
+            'low': float(s.low[m, h]),
+            'close': float(s.close[m, h]),
+            'value': float(s.value[m, h]),
+            'volume': float(s.volume[m, h]),
+        } for h in slots]
+
+
+def _pct(value):
+    return 'N/A' if value is None or value != value else f"{value * 100:+.2f}%"
+
+
+def change_view(candles, interval=300, limit=20):
+    """按interval秒K线涨跌幅降序(与上一根K线收盘价相比), 同时显示VWAP、EMA与波动率"""
+    label = f"{interval // 60}分钟" if interval < 3600 else f"{interval // 3600}小时"
+
+    columns = {}  # 每帧在排序时计算一次, 各行直接取值
+
+    def sort(engine):
+        columns['change'] = candles.change(interval)
+        columns['vwap'] = candles.vwap(interval)
+        columns['ema'] = candles.ema(interval)
+        columns['vol'] = candles.volatility(interval)
+        return columns['change']
+
+    def row(item, ticker):
+        m = candles.index.find(item['market'])
+        change, vwap, ema, vol = (columns[k][m] for k in ('change', 'vwap', 'ema', 'vol'))
+        return [_short(item), _fmt(item['krw_price'], ',.0f'), _pct(change),
+                'N/A' if vwap != vwap else f"{vwap:,.1f}", 'N/A' if ema != ema else f"{ema:,.1f}", _pct(vol)]
+
+    return MonitorView(
+        f"chg{interval}", f"📈 {label}涨跌幅排行",
+        ["交易对", "KRW价格", f"{label}涨跌", "VWAP", "EMA", "波动率"], [10, 15, 10, 15, 15, 10],
+        row, sort=sort, limit=limit,
+    )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Upbit增量K线与涨跌幅排行")
+    parser.add_argument("--period", type=int, default=300, choices=DEFAULT_INTERVALS, help="排行使用的K线周期(秒)")
+    parser.add_argument("--limit", type=int, default=20, help="显示前N个交易对")
+    parser.add_argument("--views", default="", help=f"同时显示的其他视图, 可选: {','.join(VIEWS)}")
+    parser.add_argument("--interval", type=float, default=1, help="采集与刷新间隔(秒)")
+    parser.add_argument("--rest", action="store_true", help="使用REST轮询代替WebSocket推送")
+    args = parser.parse_args()
+
+    engine = MonitorEngine(update_interval=args.interval, use_stream=not args.rest)
+    candles = CandleAggregator(engine.snapshot.index)  # 共用快照下标
+    engine.add_listener(candles.on_snapshot)
+    engine.add_view(change_view(candles, args.period, args.limit))
+    for name in filter(None, args.views.split(",")):
+        engine.add_view(VIEWS[name.strip()]())
+    engine.run()
+
+
+if __name__ == "__main__":
+    # 安装必要的库: pip install requests numpy websocket-client
+    main()
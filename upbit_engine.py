@@ -0,0 +1,438 @@
+import time
+from datetime import datetime
+
+import numpy as np
+from upbit_alerts import build_alert_engine
+from upbit_listing_watcher import ListingWatcher
+from upbit_market_catalog import UpbitMarketCatalog
+from upbit_metrics import PROCESS_TIME, RENDER_TIME, observe_cycle, observe_staleness, start_metrics_server
+from upbit_poll_scheduler import AdaptivePollScheduler
+from upbit_resilient_fetcher import ResilientTickerFetcher
+from upbit_shared_snapshot import DEFAULT_NAME, SharedSnapshotPublisher, attach_live
+from upbit_snapshot import MarketSnapshot
+from upbit_terminal_renderer import DiffRenderer, fit
+from upbit_ticker_stream import UpbitTickerStream
+from upbit_volume_surge import VolumeSurgeDetector
+# 单次采集、多视图引擎: 行情只获取(或订阅)一次写入共享快照, 各监控脚本的展示方式作为视图订阅快照, 增加视图不增加上游请求
+
+
+def _fmt(value, spec):
+    """格式化数值, 缺失时显示N/A"""
+    return 'N/A' if value is None else format(value, spec)
+
+
+class MonitorView:
+    """视图: 对共享快照的筛选/排序/格式化规则, 自身不发起任何请求
+
+    title可为字符串或 title(engine) 回调;
+    sort为 "listing"(上币顺序)、"volume"(24h交易额降序),
+    或 sort(engine) 回调, 返回与快照下标对齐的数组(降序, NaN排除);
+    include(market)筛选交易对; row(item, ticker)返回一行单元格,
+    item为 MarketSnapshot.to_rows 的结果, ticker为原始行情
+    """
+
+    def __init__(self, name, title, columns, widths, row, aligns=None, sort="listing", limit=None, include=None):
+        self.name = name
+        self.title = title
+        self.columns = columns
+        self.widths = widths
+        self.aligns = aligns or ['l'] + ['r'] * (len(columns) - 1)
+        self.row = row
+        self.sort = sort
+        self.limit = limit
+        self.include = include or (lambda market: market != "KRW-USDT")
+        self.shown = []  # 最近一帧按顺序显示的交易对
+
+    def select(self, engine, volumes):
+        """返回选中交易对在快照中的下标(已排序、已截断)"""
+        snapshot = engine.snapshot
+        if callable(self.sort):
+            values = self.sort(engine)
+            order = np.argsort(-np.nan_to_num(values, nan=-np.inf), kind='stable')
+            indices = [i for i in order if values[i] == values[i] and snapshot.valid[i]
+                       and self.include(snapshot.index.markets[i])]
+        elif self.sort == "volume":
+            # 先取足够多的候选再筛选, 避免被排除的交易对占用名额
+            extra = sum(1 for m in engine.markets if not self.include(m))
+            limit = len(snapshot.index) if self.limit is None else self.limit + extra
+            indices = [i for i in snapshot.top_n(volumes, limit) if self.include(snapshot.index.markets[i])]
+        else:
+            found = (snapshot.index.find(m) for m in engine.markets if self.include(m))
+            indices = [i for i in found if i is not None and snapshot.valid[i]]
+        return indices[:self.limit] if self.limit is not None else indices
+
+    def rows(self, engine, prices, volumes):
+        items = engine.snapshot.to_rows(self.select(engine, volumes), prices, volumes)
+        self.shown = [item['market'] for item in items]
+        return [[str(c) for c in self.row(item, engine.tickers.get(item['market'], {}))] for item in items]
+
+    def format_row(self, cells):
+        return "  ".join(fit(c, w, a) for c, w, a in zip(cells, self.widths, self.aligns))
+
+    def render_lines(self, engine, prices, volumes):
+        """渲染为文本行"""
+        rule = "=" * (sum(self.widths) + 2 * (len(self.widths) - 1))
+        title = self.title(engine) if callable(self.title) else self.title
+        lines = [title, self.format_row(self.columns), rule]
+        lines += [self.format_row(cells) for cells in self.rows(engine, prices, volumes)]
+        return lines
+
+
+def _short(item):
+    return item['market'].replace("KRW-", "")
+
+
+def listing_view():
+    """upbit_all_krw_realtime.py: 按上币顺序展示全部交易对"""
+    return MonitorView(
+        "listing", "📋 上币顺序", ["交易对", "KRW价格", "USDT价格", "24h交易量(USDT)"], [10, 15, 15, 20],
+        lambda item, t: [_short(item), _fmt(item['krw_price'], ',.1f'), _fmt(item['usdt_price'], ',.4f'),
+                         _fmt(item['volume_usdt'], ',.2f')],
+    )
+
+
+def top_volume_view(limit=100, name="top100"):
+    """upbit_all_krw_realtime_1.py / _2.py: 按24h交易额(USDT)取前N个"""
+    return MonitorView(
+        name, f"📊 交易量前{limit}", ["交易对", "KRW价格", "USDT价格", "24h涨跌", "24h交易量(USDT)"],
+        [10, 15, 15, 10, 18],
+        lambda item, t: [_short(item), _fmt(item['krw_price'], ',.0f'), _fmt(item['usdt_price'], ',.4f'),
+                         _fmt(item['change'], '+.2f') + ('%' if item['change'] is not None else ''),
+                         _fmt(item['volume_usdt'], ',.1f')],
+        sort="volume", limit=limit,
+    )
+
+
+def surge_view(limit=100, name="vol"):
+    """upbit_krw_realtime_vol.py: 按近期成交额突增(z值)取前N个, 样本不足时按24h交易额"""
+    state = {'detector': None, 'zscore': None}
+
+    def sort(engine):
+        detector = state['detector']
+        if detector is None:
+            detector = state['detector'] = VolumeSurgeDetector(engine.snapshot.index)  # 与快照共用下标
+        zscore = state['zscore'] = detector.update(engine.snapshot).copy()
+        if not detector.ready:
+            return engine.snapshot.volume[:len(zscore)]
+        return np.where(np.isfinite(zscore), zscore, -np.inf)  # 未评分的交易对排在最后
+
+    def title(engine):
+        detector = state['detector']
+        if detector is not None and detector.ready:
+            return f"🔥 成交额突增前{limit}(z值)"
+        return f"🔥 成交额突增前{limit} (基准积累中, 暂按24h交易量)"
+
+    def row(item, ticker):
+        i = state['detector'].index.find(item['market'])
+        z = state['zscore'][i] if i is not None and i < len(state['zscore']) else float('nan')
+        return [_short(item), _fmt(item['krw_price'], ',.0f'), _fmt(item['usdt_price'], ',.4f'),
+                _fmt(item['change'], '+.2f') + ('%' if item['change'] is not None else ''),
+                _fmt(item['volume_usdt'], ',.1f'), f"{z:+.1f}" if z == z else 'N/A']
+
+    return MonitorView(
+        name, title, ["交易对", "KRW价格", "USDT价格", "24h涨跌", "24h交易量(USDT)", "成交额Z值"],
+        [10, 15, 15, 10, 18, 10], row, sort=sort, limit=limit,
+    )
+
+
+def usdt_view():
+    """upbit_usdt_krw_realtime.py: USDT-KRW行情"""
+    return MonitorView(
+        "usdt", "💱 USDT-KRW", ["交易对", "当前价格", "24h涨跌", "24h最高", "24h最低", "24h交易量"],
+        [10, 12, 10, 12, 12, 18],
+        lambda item, t: [_short(item), _fmt(item['krw_price'], ',.1f'),
+                         _fmt(item['change'], '+.1f') + ('%' if item['change'] is not None else ''),
+                         _fmt(t.get('high_price'), ',.1f'), _fmt(t.get('low_price'), ',.1f'),
+                         _fmt(t.get('acc_trade_volume_24h'), ',.1f')],
+        include=lambda market: market == "KRW-USDT",
+    )
+
+
+# 视图名 -> 构造函数 (vol即CCXT版本的成交额突增视图, 数据来自同一份快照)
+VIEWS = {
+    'listing': listing_view,
+    'top100': lambda: top_volume_view(100, "top100"),
+    'top15': lambda: top_volume_view(15, "top15"),
+    'vol': surge_view,
+    'usdt': usdt_view,
+}
+
+
+class MonitorEngine:
+    def __init__(self, update_interval=5, use_stream=True, stream_url="wss://api.upbit.com/websocket/v1",
+                 diff_render=True, fetcher=None, replay=None, metrics_port=None, scheduler=None, listing_rate=None):
+        self.update_interval = update_interval
+        self.use_stream = use_stream  # 使用WebSocket推送代替REST轮询
+        self.stream_url = stream_url
+        self.diff_render = diff_render
+        self.replay = replay  # 离线回放源(ReplaySource)
+        self.metrics_port = metrics_port  # 设置后在本地端口输出Prometheus指标
+        self.metrics_server = None
+        self.scheduler = scheduler  # 自适应轮询(AdaptivePollScheduler), 仅REST模式: 每轮只刷新到期的交易对
+        self.fetcher = fetcher or ResilientTickerFetcher(timeout=5)  # 单批失败只影响该批
+        self.catalog = UpbitMarketCatalog(self.fetcher.fetch_markets)  # 包含KRW-USDT, 由视图自行筛选
+        self.listing_rate = listing_rate  # 设置后每秒轮询目录listing_rate次, 新上币立即加入采集
+        self.listing_watcher = None
+        self.snapshot = MarketSnapshot()  # 所有视图共享的列式快照
+        self.markets = []  # 上币顺序
+        self.tickers = {}  # market -> 最新原始行情
+        self.usdt_krw_price = None
+        self.views = []
+        self.ticker_stream = None
+        self.renderer = None
+        self.cycles = 0
+        self._listeners = []
+
+    def add_view(self, view):
+        self.views.append(view)
+        return view
+
+    def add_listener(self, callback):
+        """注册快照更新回调: callback(engine), 每轮采集后调用"""
+        self._listeners.append(callback)
+
+    def on_markets_changed(self, added, removed, markets):
+        """交易对目录变更: 更新采集列表并重新订阅行情流"""
+        self.markets = markets
+        if hasattr(self.fetcher, 'forget'):
+            self.fetcher.forget(removed)
+        for market in removed:
+            self.tickers.pop(market, None)
+            i = self.snapshot.index.find(market)
+            if i is not None:
+                self.snapshot.valid[i] = False  # 自适应轮询不整体重置快照, 需逐个清除
+        if self.scheduler:
+            self.scheduler.set_markets(markets)
+        if self.ticker_stream:
+            self.ticker_stream.set_markets(markets)
+
+    def fetch(self):
+        """采集一轮全部交易对行情(所有视图共用这一次请求)"""
+        if self.replay:
+            self.markets = list(self.replay.markets)  # 共享快照的发布端可能已更新交易对列表
+            return self.replay.fetch_tickers(self.markets)
+        if self.ticker_stream:
+            return self.ticker_stream.fetch_tickers(self.markets)
+        try:
+            if self.scheduler:
+                batches = self.scheduler.plan()
+                if not batches:
+                    return []
+                data = self.fetcher.fetch_tickers([m for batch in batches for m in batch])
+                self.scheduler.observe(data)
+                return data
+            return self.fetcher.fetch_tickers(self.markets)
+        except Exception as e:
+            print(f"⚠️ 获取行情数据失败: {e}")
+            return []
+
+    def ingest(self):
+        """采集并写入共享快照, 返回本轮行情数量"""
+        data = self.fetch()
+        if not data:
+            return 0
+        observe_staleness("engine", data)
+        with PROCESS_TIME.time("engine"):
+            self.snapshot.update_upbit(data, reset=self.scheduler is None)  # 自适应轮询每轮只有部分交易对
+            for ticker in data:
+                self.tickers[ticker['market']] = ticker
+        usdt = self.tickers.get("KRW-USDT")
+        if usdt and usdt.get('trade_price'):
+            self.usdt_krw_price = usdt['trade_price']
+        self.cycles += 1
+        for callback in self._listeners:
+            callback(self)
+        return len(data)
+
+    def header_lines(self):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rate = f"{self.usdt_krw_price:,.1f} KRW" if self.usdt_krw_price else "未获取"
+        if self.scheduler:
+            interval = self.scheduler.interval[self.scheduler.active]
+            polling = (f"自适应轮询{interval.min():.1f}~{interval.max():.1f}秒 "
+                       f"(预算{self.scheduler.request_rate:.1f}次/秒)" if len(interval) else "自适应轮询")
+        elif hasattr(self.replay, 'age'):
+            polling = f"读取共享快照(发布于{self.replay.age:.1f}秒前)"
+        else:
+            polling = f"每{self.update_interval}秒采集一次"
+        lines = [
+            f"🔄 Upbit多视图监控 | 更新时间: {now}",
+            f"💱 基准汇率: 1 USDT = {rate} | {len(self.markets)}个交易对 | {len(self.views)}个视图 | {polling}",
+        ]
+        if self.listing_watcher and self.listing_watcher.listings:
+            latest = self.listing_watcher.listings[-1]
+            window = f"检测时延≤{latest['window']:.2f}秒" if latest['window'] is not None else "启动时补齐"
+            lines.append(f"🆕 最近新上币: {latest['market']} ({window})")
+        return lines
+
+    def frame(self):
+        """所有视图拼接成一帧文本"""
+        prices, volumes = self.snapshot.convert(self.usdt_krw_price)
+        lines = self.header_lines()
+        for view in self.views:
+            lines.append("")
+            lines += view.render_lines(self, prices, volumes)
+        lines.append("🛑 按 Ctrl+C 停止监控")
+        return lines
+
+    def display(self):
+        with RENDER_TIME.time("engine"):
+            lines = self.frame()
+            if self.scheduler:
+                # 显示名次影响轮询频率
+                self.scheduler.set_ranks(*(view.shown for view in self.views))
+            if self.renderer:
+                self.renderer.submit(lines)
+                return
+            print("\033c", end="")
+            print("\n".join(lines))
+
+    def run(self):
+        print("🚀 启动Upbit多视图监控...")
+        if self.replay:
+            self.markets = list(self.replay.markets)
+        else:
+            try:
+                self.markets = self.catalog.get_markets()
+            except Exception as e:
+                print(f"⚠️ 获取交易对列表失败: {e}")
+                return
+            self.catalog.add_listener(self.on_markets_changed)
+            if self.listing_rate:
+                # 高频轮询代替目录的TTL刷新
+                self.listing_watcher = ListingWatcher(self.catalog, self.fetcher, self.listing_rate).start()
+            else:
+                self.catalog.start()
+            if self.scheduler and not self.use_stream:
+                self.scheduler.set_markets(self.markets)
+                self.scheduler.pin("KRW-USDT")  # 汇率每轮都需要
+            else:
+                self.scheduler = None
+            if self.use_stream:
+                self.ticker_stream = UpbitTickerStream(self.markets, url=self.stream_url).start()
+                if not self.ticker_stream.wait_ready(timeout=10):
+                    print("⚠️ 行情流暂未收到数据, 将继续等待推送")
+
+        if self.metrics_port:
+            self.metrics_server = start_metrics_server(self.metrics_port)
+        if self.diff_render:
+            self.renderer = DiffRenderer([]).start()  # 帧由整行文本组成, 不需要列宽
+        tick = self.scheduler.min_interval if self.scheduler else self.update_interval
+
+        try:
+            while True:
+                start_time = time.time()
+                self.ingest()
+                if self.replay and self.replay.exhausted:
+                    break
+                if self.usdt_krw_price and self.views:  # 没有视图时只采集(如仅作为共享快照的发布端)
+                    self.display()
+
+                elapsed = time.time() - start_time
+                observe_cycle("engine", elapsed, tick)
+                time.sleep(max(0, tick - elapsed))
+        except KeyboardInterrupt:
+            print("\n🛑 监控已停止")
+        except Exception as e:
+            print(f"❌ 发生错误: {e}")
+        finally:
+            if self.renderer:
+                self.renderer.stop()
+            self.catalog.stop()
+            if self.listing_watcher:
+                self.listing_watcher.stop()
+            if self.ticker_stream:
+                self.ticker_stream.stop()
+            self.fetcher.close()
+            if self.metrics_server:
+                self.metrics_server.stop()
+
+
+def run_view(name, update_interval, description, listing_rate=None, standalone=None, record=False):
+    """单视图脚本的入口: 本机已有发布中的共享快照时只读取它, 否则自己采集并发布, 供之后启动的脚本共用
+
+    同时运行多个监控脚本, 上游也只有一份采集; 发布进程退出后, 读取它的脚本之一接管采集并继续发布。
+    standalone(args)运行脚本自身的独立监控(--standalone), record为True时独立监控支持--record
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--interval", type=float, default=update_interval, help="刷新间隔(秒)")
+    parser.add_argument("--rest", action="store_true", help="自己采集时使用REST轮询代替WebSocket推送")
+    parser.add_argument("--no-diff", action="store_true", help="清屏重绘代替差分渲染")
+    parser.add_argument("--metrics-port", type=int, help="在本地端口输出Prometheus指标(/metrics)")
+    parser.add_argument("--shared", default=DEFAULT_NAME, help="共享快照名称")
+    if standalone:
+        parser.add_argument("--standalone", action="store_true",
+                            help="运行脚本自身的独立监控(自己的获取层与交易对目录), 不读取也不发布共享快照")
+        if record:
+            parser.add_argument("--record", help="(独立监控)把每条行情记录到该目录")
+    args = parser.parse_args()
+    if standalone and args.standalone:
+        standalone(args)
+        return
+
+    while True:
+        reader = attach_live(args.shared)
+        publisher = None
+        interval = args.interval
+        if reader is None:
+            try:
+                publisher = SharedSnapshotPublisher(args.shared)  # 先标记存活, 随后启动的脚本改为读取
+            except FileExistsError:
+                time.sleep(0.5)  # 另一个进程刚成为发布端, 等它写入头部后改为读取
+                continue
+            # 发布端按较短间隔采集, 读取共享快照的脚本看到的数据不会比各自的刷新间隔更旧
+            interval = min(interval, 5.0 if args.rest else 1.0)
+        engine = MonitorEngine(update_interval=interval, use_stream=not args.rest, diff_render=not args.no_diff,
+                               replay=reader, metrics_port=args.metrics_port,
+                               listing_rate=None if reader else listing_rate)
+        engine.add_view(VIEWS[name]())
+        if publisher:
+            engine.add_listener(publisher.on_snapshot)
+            print(f"📡 本进程负责采集, 并发布共享快照: {args.shared}")
+        else:
+            print(f"📡 读取共享快照: {args.shared} (不访问上游接口)")
+        try:
+            engine.run()
+        finally:
+            if publisher:
+                publisher.close()
+            if reader:
+                reader.close()
+        if not (reader and reader.exhausted):
+            break
+        print("⚠️ 共享快照的发布进程已退出, 本进程接管采集")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Upbit单次采集、多视图监控")
+    parser.add_argument("--views", default="top15,usdt", help=f"逗号分隔, 可选: {','.join(VIEWS)}")
+    parser.add_argument("--interval", type=float, default=5, help="采集与刷新间隔(秒)")
+    parser.add_argument("--rest", action="store_true", help="使用REST轮询代替WebSocket推送")
+    parser.add_argument("--no-diff", action="store_true", help="清屏重绘代替差分渲染")
+    parser.add_argument("--metrics-port", type=int, help="在本地端口输出Prometheus指标(/metrics)")
+    parser.add_argument("--alerts", help="按默认规则告警, 追加写入该JSON lines文件")
+    parser.add_argument("--webhook", help="告警同时POST到该地址")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="REST模式下按活跃度自适应轮询(总请求量不超过按--interval固定轮询)")
+    args = parser.parse_args()
+
+    scheduler = AdaptivePollScheduler(base_interval=args.interval) if args.adaptive else None
+    engine = MonitorEngine(update_interval=args.interval, use_stream=not args.rest, diff_render=not args.no_diff,
+                           metrics_port=args.metrics_port, scheduler=scheduler)
+    for name in args.views.split(","):
+        engine.add_view(VIEWS[name.strip()]())
+    # 自适应轮询时引擎按min_interval产生快照
+    alerts = build_alert_engine(args.alerts, args.webhook,
+                                interval=scheduler.min_interval if scheduler else args.interval)
+    if alerts:
+        engine.add_listener(alerts.on_snapshot)
+    engine.run()
+
+
+if __name__ == "__main__":
+    # 安装必要的库: pip install requests numpy websocket-client
+    main()
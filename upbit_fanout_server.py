@@ -0,0 +1,414 @@
+import json
+import selectors
+import socket
+import socketserver
+import threading
+from collections import deque
+from urllib.parse import parse_qs, urlparse
+
+from upbit_ws_server import OP_CLOSE, OP_PING, OP_PONG, OP_TEXT, encode_frame, parse_frame, read_http_request, \
+    websocket_accept
+# 本地扇出服务: 上游只采集一份行情, 在内存中按序号维护字段级增量, 以HTTP(ETag)和WebSocket(只推送变化字段)供本机任意多个客户端读取
+
+# 对外提供的字段; usdt_price / volume_usdt 按同一轮的USDT/KRW换算
+FIELDS = ('trade_price', 'usdt_price', 'signed_change_rate', 'acc_trade_price_24h', 'volume_usdt', 'timestamp')
+
+
+class FanoutState:
+    """最新快照与最近history个版本的增量; 同一版本的响应只编码一次, 所有客户端共享"""
+
+    def __init__(self, history=600):
+        self.seq = 0  # 每次有字段变化时递增
+        self.usdt_krw = None
+        self.current = {}  # market -> {field: value}
+        self.history = deque(maxlen=history)  # (seq, {market: {变化的字段}}, [下架的交易对])
+        self.changed = threading.Condition()
+        self._cache = {}  # 当前版本下已编码的响应
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """注册版本变化回调: callback(seq), 在update的调用线程中执行"""
+        self._listeners.append(callback)
+
+    @staticmethod
+    def _values(ticker, usdt_krw):
+        price = ticker.get('trade_price')
+        volume = ticker.get('acc_trade_price_24h')
+        return {
+            'trade_price': price,
+            'usdt_price': price / usdt_krw if price is not None and usdt_krw else None,
+            'signed_change_rate': ticker.get('signed_change_rate'),
+            'acc_trade_price_24h': volume,
+            'volume_usdt': volume / usdt_krw if volume is not None and usdt_krw else None,
+            'timestamp': ticker.get('timestamp'),
+        }
+
+    def update(self, tickers, usdt_krw=None, removed=()):
+        """合并一轮行情, 有变化时生成新版本并唤醒推送线程, 返回当前序号"""
+        with self._lock:
+            changes = {}
+            for ticker in tickers:
+                market = ticker['market']
+                values = self._values(ticker, usdt_krw)
+                current = self.current.get(market)
+                if current is None:
+                    # current会被后续的增量原地修改, 历史中保存独立的副本
+                    self.current[market] = values
+                    changes[market] = dict(values)
+                    continue
+                diff = {k: v for k, v in values.items() if current[k] != v}
+                if diff:
+                    current.update(diff)
+                    changes[market] = diff
+            removed = [m for m in removed if self.current.pop(m, None) is not None]
+            self.usdt_krw = usdt_krw or self.usdt_krw
+            if not changes and not removed:
+                return self.seq
+            self.seq += 1
+            self.history.append((self.seq, changes, removed))
+            self._cache = {}
+            seq = self.seq
+        with self.changed:
+            self.changed.notify_all()
+        for callback in self._listeners:
+            callback(seq)
+        return seq
+
+    def on_snapshot(self, engine):
+        """MonitorEngine回调; 引擎已移除的下架交易对在这里一并下发"""
+        tickers = engine.tickers
+        with self._lock:
+            removed = [m for m in self.current if m not in tickers]
+        self.update(list(tickers.values()), engine.usdt_krw_price, removed)
+
+    def _cached(self, key, build):
+        with self._lock:
+            body = self._cache.get(key)
+            if body is None:
+                body = self._cache[key] = json.dumps(build(), separators=(',', ':')).encode()
+            return self.seq, body
+
+    def snapshot_body(self):
+        """完整快照 (seq, 编码后的JSON)"""
+        return self._cached('snapshot', lambda: {
+            'type': 'snapshot', 'seq': self.seq, 'usdt_krw': self.usdt_krw, 'tickers': self.current,
+        })
+
+    def ticker_body(self, markets=None):
+        """与 /v1/ticker 相同的列表格式"""
+        def build():
+            selected = markets if markets is not None else list(self.current)
+            return [dict(self.current[m], market=m) for m in selected if m in self.current]
+
+        return self._cached(('ticker', tuple(markets) if markets is not None else None), build)
+
+    def delta_body(self, since):
+        """since之后的合并增量; since早于保留的历史时返回完整快照"""
+        with self._lock:
+            oldest = self.history[0][0] if self.history else self.seq + 1
+        if since < oldest - 1 or since > self.seq:
+            return self.snapshot_body()
+
+        def build():
+            changes, removed = {}, []
+            for seq, diff, gone in self.history:
+                if seq <= since:
+                    continue
+                for market, fields in diff.items():
+                    changes.setdefault(market, {}).update(fields)
+                for market in gone:
+                    changes.pop(market, None)
+                    removed.append(market)
+            return {'type': 'delta', 'seq': self.seq, 'since': since, 'usdt_krw': self.usdt_krw,
+                    'changes': changes, 'removed': removed}
+
+        return self._cached(('delta', since), build)
+
+    def wait(self, seq, timeout=None):
+        """等待序号超过seq, 返回最新序号"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.seq > seq, timeout)
+        return self.seq
+
+
+class _FanoutHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        # HTTP keep-alive: 同一连接上依次处理请求, 遇到WebSocket升级后转为推送
+        while True:
+            request = read_http_request(self.rfile)
+            if request is None:
+                return
+            method, path, headers = request
+            url = urlparse(path)
+            query = parse_qs(url.query)
+            if headers.get('upgrade', '').lower() == 'websocket':
+                if websocket_accept(self.wfile, headers):
+                    # 升级后的连接交给推送线程, 本连接线程随即退出
+                    self.connection.setblocking(False)
+                    pending = self.rfile.peek(65536)  # 已读入缓冲但尚未处理的客户端帧
+                    self.server.detach(self.connection)
+                    self.server.hub.add(self.connection, int(query.get('since', ['0'])[0]), pending)
+                return
+            if not self.respond(method, url.path, query, headers):
+                return
+
+    def respond(self, method, path, query, headers):
+        state = self.server.state
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if method != 'GET':
+            self.send(405, b'{"error":"method not allowed"}')
+            return False
+        if path not in ('/v1/ticker', '/snapshot', '/delta'):
+            self.send(404, b'{"error":"not found"}')
+            return keep_alive
+
+        self.server.count('http_requests', 1)
+        # 同一URL的内容只由版本号决定, 未变化时不生成响应体
+        if headers.get('if-none-match') == f'"{state.seq}"':
+            self.send(304, b'', f'"{state.seq}"')
+            return keep_alive
+        if path == '/v1/ticker':
+            markets = query.get('markets', [None])[0]
+            seq, body = state.ticker_body(markets.split(',') if markets else None)
+        elif path == '/snapshot':
+            seq, body = state.snapshot_body()
+        else:
+            seq, body = state.delta_body(int(query.get('since', ['0'])[0]))
+        self.send(200, body, f'"{seq}"')
+        return keep_alive
+
+    def send(self, status, body, etag=None):
+        reason = {200: 'OK', 304: 'Not Modified', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        lines = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json", f"Content-Length: {len(body)}",
+                 "Cache-Control: no-cache"]
+        if etag:
+            lines.append(f"ETag: {etag}")
+        self.wfile.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        self.wfile.flush()
+
+
+class _WebSocketClient:
+    def __init__(self, sock, seq, pending=b''):
+        self.sock = sock
+        self.seq = seq  # 已推送到的版本
+        self.inbox = bytearray(pending)  # 尚未组成完整帧的接收数据
+        self.outbox = bytearray()  # 尚未写出的帧
+        self.events = selectors.EVENT_READ
+
+
+class WebSocketHub:
+    """全部WebSocket客户端由一个线程以selector多路复用, 连接数不再对应线程数
+
+    每个客户端只在上一帧写完后才编码下一帧, 且下一帧是自其已推送版本以来的合并增量:
+    慢客户端不会阻塞其他客户端, 待发送数据也不会随落后的版本数增长
+    """
+
+    def __init__(self, server, heartbeat=1.0):
+        self.server = server
+        self.state = server.state
+        self.heartbeat = heartbeat  # 检查停止标志的间隔(秒)
+        self.selector = selectors.DefaultSelector()
+        self._clients = {}  # socket -> _WebSocketClient
+        self._added = deque()  # 连接线程交接过来的客户端
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self.selector.register(self._wake_recv, selectors.EVENT_READ)
+        self._seq = self.state.seq
+        self._stopped = False
+        self._thread = None
+        self.state.add_listener(lambda seq: self.wake())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fanout-ws", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self.wake()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def wake(self):
+        try:
+            self._wake_send.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # 缓冲已满说明推送线程尚未处理上一次唤醒
+
+    def add(self, sock, since, pending=b''):
+        """接管已完成升级的非阻塞连接, 从since之后的版本开始推送"""
+        self.server.count('ws_clients', 1)
+        self._added.append(_WebSocketClient(sock, since, pending))
+        self.wake()
+
+    def _run(self):
+        try:
+            while not self._stopped:
+                for key, events in self.selector.select(self.heartbeat):
+                    if key.fileobj is self._wake_recv:
+                        try:
+                            while self._wake_recv.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                        continue
+                    client = key.data
+                    if events & selectors.EVENT_READ:
+                        self._read(client)
+                    if events & selectors.EVENT_WRITE and client.sock in self._clients:
+                        self._flush(client)
+                while self._added:
+                    client = self._added.popleft()
+                    self._clients[client.sock] = client
+                    self.selector.register(client.sock, client.events, client)
+                    self._read(client, receive=False)  # 处理升级时已读入的帧
+                    self._flush(client)
+                if self.state.seq != self._seq:
+                    self._seq = self.state.seq
+                    for client in list(self._clients.values()):
+                        self._flush(client)
+        finally:
+            for client in list(self._clients.values()):
+                self._drop(client)
+            self.selector.close()
+            self._wake_recv.close()
+            self._wake_send.close()
+
+    def _read(self, client, receive=True):
+        """读取并处理客户端帧: ping回复pong, {"since": N} 重新同步, close或出错时断开"""
+        try:
+            if receive:
+                data = client.sock.recv(65536)
+                if not data:
+                    self._drop(client)
+                    return
+                client.inbox += data
+            while True:
+                frame = parse_frame(client.inbox)
+                if frame is None:
+                    break
+                opcode, payload, size = frame
+                del client.inbox[:size]
+                if opcode == OP_CLOSE:
+                    self._drop(client)
+                    return
+                if opcode == OP_PING:
+                    client.outbox += encode_frame(payload, OP_PONG)
+                elif opcode == OP_TEXT:
+                    client.seq = int(json.loads(payload).get('since', 0))
+        except BlockingIOError:
+            return
+        except (OSError, ValueError):
+            self._drop(client)
+            return
+        self._flush(client)
+
+    def _flush(self, client):
+        """写出待发送的帧; 写完且有新版本时编码since之后的增量继续写"""
+        try:
+            while True:
+                if not client.outbox:
+                    if client.seq == self.state.seq:
+                        break
+                    client.seq, body = self.state.delta_body(client.seq)
+                    client.outbox += encode_frame(body, OP_TEXT)
+                sent = client.sock.send(client.outbox)
+                del client.outbox[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(client)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbox else 0)
+        if events != client.events:
+            client.events = events
+            self.selector.modify(client.sock, events, client)
+
+    def _drop(self, client):
+        if self._clients.pop(client.sock, None) is None:
+            return
+        self.selector.unregister(client.sock)
+        client.sock.close()
+        self.server.count('ws_clients', -1)
+
+
+class FanoutServer(socketserver.ThreadingTCPServer):
+    """同一端口提供HTTP (/v1/ticker, /snapshot, /delta?since=N) 与 WebSocket (/ws?since=N)"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, state, host="127.0.0.1", port=8766, heartbeat=1.0):
+        super().__init__((host, port), _FanoutHandler)
+        self.state = state
+        self.heartbeat = heartbeat  # 推送线程检查停止标志的间隔(秒)
+        self.http_requests = 0
+        self.ws_clients = 0
+        self.stopped = threading.Event()
+        self.hub = WebSocketHub(self, heartbeat)
+        self._detached = set()  # 已交给推送线程的连接, 连接线程退出时不关闭
+        self._lock = threading.Lock()  # 保护计数与_detached (由多个连接线程与推送线程修改)
+        self._thread = None
+
+    def count(self, name, delta):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def detach(self, request):
+        with self._lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request):
+        with self._lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.hub.start()
+        self._thread = threading.Thread(target=self.serve_forever, name="fanout-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        with self.state.changed:
+            self.state.changed.notify_all()
+        self.hub.stop()
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    import argparse
+    from upbit_engine import MonitorEngine
+
+    parser = argparse.ArgumentParser(description="本地行情扇出服务: 一份上游数据供本机多个客户端读取")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--interval", type=float, default=1, help="采集间隔(秒)")
+    parser.add_argument("--rest", action="store_true", help="使用REST轮询代替WebSocket推送")
+    args = parser.parse_args()
+
+    state = FanoutState()
+    server = FanoutServer(state, args.host, args.port).start()
+    engine = MonitorEngine(update_interval=args.interval, use_stream=not args.rest, diff_render=False)
+    engine.add_listener(state.on_snapshot)
+    print(f"📡 扇出服务已启动: {server.url}/v1/ticker | ws://{args.host}:{args.port}/ws")
+    try:
+        engine.run()
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    # 安装必要的库: pip install requests numpy websocket-client
+    main()
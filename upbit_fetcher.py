@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from upbit_metrics import FETCH_CYCLE, HTTP_ERRORS, HTTP_LATENCY, HTTP_THROTTLED, JSON_DECODE
+from upbit_rate_limiter import UpbitRateLimiter, group_for_path
+from upbit_ticker_record import decode_tickers
+# Upbit REST行情获取层: 复用长连接池, 并发请求10个一批的ticker
+
+
+class UpbitTickerFetcher:
+    def __init__(self, base_url="https://api.upbit.com", batch_size=10, max_workers=5, timeout=5,
+                 rate_limiter=None, max_retries=3, typed=True):
+        self.base_url = base_url.rstrip('/')
+        self.batch_size = batch_size  # Upbit API单次最多查询10个交易对
+        self.max_workers = max_workers  # 并发请求数上限
+        self.timeout = timeout
+        self.last_cycle_time = None  # 最近一轮批量获取耗时(秒)
+        self.rate_limiter = rate_limiter or UpbitRateLimiter()
+        self.max_retries = max_retries  # 429时单个请求的重试次数
+        self.typed = typed  # ticker解析为紧凑的Ticker记录(只保留用到的字段), False时返回原始dict
+        self._batch_key = ()
+        self._batches = []
+
+        # keep-alive连接池, 避免每个请求都重新建立TCP+TLS连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upbit-fetch")
+
+    def get(self, path, params=None, decode=None):
+        """发送GET请求并返回解析后的JSON (按接口组限速, 429时退避后只重试本请求)
+
+        decode(content)可替代response.json()直接解析响应体
+        """
+        group = group_for_path(path)
+        for _ in range(self.max_retries + 1):
+            self.rate_limiter.acquire(group)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                HTTP_ERRORS.inc(1, path)
+                raise
+            HTTP_LATENCY.observe(time.perf_counter() - start, path)
+            if self.rate_limiter.update(group, response) is None:
+                break
+            HTTP_THROTTLED.inc(1, group)
+        if not response.ok:
+            HTTP_ERRORS.inc(1, path)
+        response.raise_for_status()
+        with JSON_DECODE.time(path):
+            return decode(response.content) if decode else response.json()
+
+    def fetch_markets(self, quote="KRW"):
+        """获取指定计价货币的全部交易对(保持接口返回的上币顺序)"""
+        prefix = f"{quote}-"
+        return [m['market'] for m in self.get("/v1/market/all") if m['market'].startswith(prefix)]
+
+    def make_batches(self, markets):
+        """按batch_size切分交易对 (交易对列表不变时复用上次的分批结果)"""
+        key = tuple(markets)
+        if key != self._batch_key:
+            self._batch_key = key
+            self._batches = [list(key[i:i + self.batch_size]) for i in range(0, len(key), self.batch_size)]
+        return self._batches
+
+    def fetch_batch(self, batch):
+        """获取单批交易对的ticker"""
+        return self.get("/v1/ticker", params={"markets": ",".join(batch)},
+                        decode=decode_tickers if self.typed else None)
+
+    def fetch_tickers(self, markets):
+        """并发获取全部交易对的ticker, 按传入的交易对顺序合并结果
+
+        任一批次失败时抛出异常, 由调用方决定如何处理
+        """
+        start_time = time.time()
+        if len(markets) <= self.batch_size:
+            batch_results = [self.fetch_batch(markets)]
+        else:
+            batch_results = list(self.executor.map(self.fetch_batch, self.make_batches(markets)))
+
+        by_market = {}
+        for result in batch_results:
+            for item in result:
+                by_market[item['market']] = item
+        self.last_cycle_time = time.time() - start_time
+        FETCH_CYCLE.observe(self.last_cycle_time)
+        return [by_market[m] for m in markets if m in by_market]
+
+    def close(self):
+        """释放线程池与连接池"""
+        self.executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+
+import requests
+# 外汇汇率缓存: 数据源每天只发布一次, 按TTL复用缓存, 过期后用ETag/Last-Modified发送条件请求
+
+FRANKFURTER_URL = "https://api.frankfurter.app/latest?from=USD&to=KRW"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "upbit")
+
+
+def parse_max_age(cache_control):
+    """解析 Cache-Control: max-age=N, 没有时返回None"""
+    for part in (cache_control or "").split(','):
+        key, _, value = part.strip().partition('=')
+        if key.lower() == 'max-age' and value.isdigit():
+            return int(value)
+    return None
+
+
+class ForexRateCache:
+    def __init__(self, url=FRANKFURTER_URL, currency="KRW", ttl=3600, retry_interval=60, timeout=10,
+                 session=None, cache_path=None, persist=True):
+        self.url = url
+        self.currency = currency
+        self.ttl = ttl  # 缓存有效期(秒), 服务端返回max-age时以服务端为准
+        self.retry_interval = retry_interval  # 请求失败后至少间隔多久再试
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.cache_path = cache_path or os.path.join(DEFAULT_CACHE_DIR, f"forex_USD_{currency}.json")
+        self.persist = persist
+
+        self.rate = None  # 1 USD = rate KRW
+        self.previous_rate = None  # 上一次发布的汇率
+        self.published = None  # 数据源的发布日期
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = 0.0  # 最近一次确认汇率有效的时间
+        self.max_age = ttl
+        self.requests = 0  # 实际发出的HTTP请求数
+        self.not_modified = 0  # 其中返回304的次数
+        self._lock = threading.Lock()
+        if persist:
+            self.load_cache()
+
+    def load_cache(self):
+        """读取磁盘缓存, 重启后无需立即请求"""
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.rate = cached.get('rate')
+        self.previous_rate = cached.get('previous_rate')
+        self.published = cached.get('published')
+        self.etag = cached.get('etag')
+        self.last_modified = cached.get('last_modified')
+        self.fetched_at = cached.get('fetched_at', 0.0)
+        self.max_age = cached.get('max_age', self.ttl)
+        return self.rate is not None
+
+    def save_cache(self):
+        """原子写入磁盘缓存"""
+        if not self.persist:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'rate': self.rate,
+                'previous_rate': self.previous_rate,
+                'published': self.published,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'fetched_at': self.fetched_at,
+                'max_age': self.max_age,
+            }, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def is_expired(self):
+        return time.time() - self.fetched_at >= self.max_age
+
+    def refresh(self):
+        """发送条件请求, 返回汇率是否有新发布"""
+        headers = {}
+        if self.rate is not None:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+
+        self.requests += 1
+        response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+        max_age = parse_max_age(response.headers.get('Cache-Control'))
+        self.max_age = max_age if max_age else self.ttl
+        self.fetched_at = time.time()
+
+        if response.status_code == 304:
+            self.not_modified += 1
+            self._save()
+            return False
+
+        response.raise_for_status()
+        data = response.json()
+        rate = data.get('rates', {}).get(self.currency)
+        if rate is None:
+            raise ValueError(f"响应中没有{self.currency}汇率")
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        changed = rate != self.rate or data.get('date') != self.published
+        if changed:
+            self.previous_rate = self.rate
+            self.rate = rate
+            self.published = data.get('date')
+        self._save()
+        return changed
+
+    def _save(self):
+        try:
+            self.save_cache()
+        except OSError as e:
+            print(f"⚠️ 保存汇率缓存失败: {e}")
+
+    def get_rate(self):
+        """返回当前汇率: 缓存有效时不发请求; 请求失败时沿用旧值并在retry_interval后重试"""
+        with self._lock:
+            if self.is_expired():
+                try:
+                    self.refresh()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"⚠️ 获取外汇汇率失败: {e}")
+                    # 避免每次调用都重试: 推迟到retry_interval之后
+                    self.fetched_at = time.time() - self.max_age + self.retry_interval
+            return self.rate
+
+    def change(self):
+        """相对上一次发布的变化率(%)"""
+        if self.rate and self.previous_rate:
+            return (self.rate - self.previous_rate) / self.previous_rate * 100
+        return None
+
+    def age(self):
+        """距最近一次确认的秒数"""
+        return time.time() - self.fetched_at if self.fetched_at else None
+
+    def close(self):
+        self.session.close()
@@ -1,29 +1,64 @@
 import ccxt
+import os
 import time
 from datetime import datetime
 from texttable import Texttable
+from upbit_market_catalog import DEFAULT_CACHE_DIR, UpbitMarketCatalog
+from upbit_metrics import PROCESS_TIME, RENDER_TIME, observe_cycle, observe_staleness, start_metrics_server
+from upbit_snapshot import MarketSnapshot
+from upbit_terminal_renderer import DiffRenderer
+from upbit_volume_surge import VolumeSurgeDetector
 
 
 class UpbitKRWMarketMonitor:
-    def __init__(self):
-        self.exchange = ccxt.upbit({
+    def __init__(self, diff_render=True, exchange=None, metrics_port=None, output=None, rank="surge"):
+        # exchange可注入兼容CCXT接口的对象(如离线回放的ReplayExchange)
+        self.exchange = exchange or ccxt.upbit({
             'enableRateLimit': True,  # 启用速率限制
             'timeout': 15000,  # 15秒超时
         })
         self.update_interval = 60  # 60秒更新一次
         self.max_display = 100  # 最多显示100个交易对
         self.usdt_krw_rate = None  # USDT-KRW汇率
+        self.diff_render = diff_render  # 差分渲染代替清屏+整表重绘
+        self.renderer = None
+        self.metrics_port = metrics_port  # 设置后在本地端口输出Prometheus指标
+        self.metrics_server = None
+        self.output = output  # 无界面输出(HeadlessWriter), 设置后不再绘制表格
+        self.rank = rank  # "surge": 按近期成交额z值排序(样本不足时按24h交易量); "volume": 按24h交易量排序
+        self.columns = ["交易对", "KRW价格", "USDT价格", "24h涨跌", "24h交易量(USDT)", "成交额Z值"]
+        self.col_widths = [10, 15, 15, 10, 18, 10]
+        self.col_aligns = ["l", "r", "r", "r", "r", "r"]
+        self.krw_markets = []
+        self.snapshot = MarketSnapshot()  # 列式行情快照, 按交易对稳定下标存放
+        self.surge = VolumeSurgeDetector(self.snapshot.index)  # 共用快照下标
+        # CCXT返回的交易对不保证上币顺序, 单独缓存, 以免打乱上币顺序监控共用的 markets_KRW.json
+        self.catalog = UpbitMarketCatalog(self.load_market_ids, exclude=("KRW-USDT",), persist=exchange is None,
+                                          cache_path=os.path.join(DEFAULT_CACHE_DIR, "markets_KRW_ccxt.json"))
+
+    def load_market_ids(self, quote):
+        """通过CCXT重新加载交易对, 返回Upbit格式的交易对代码(如KRW-BTC)"""
+        markets = self.exchange.load_markets(reload=True)
+        return [m['id'] for m in markets.values() if m['quote'] == quote]
+
+    @staticmethod
+    def to_symbol(market_id):
+        """KRW-BTC -> BTC/KRW"""
+        quote, base = market_id.split('-', 1)
+        return f"{base}/{quote}"
 
     def get_all_krw_markets(self):
-        """获取所有KRW交易对"""
+        """获取所有KRW交易对(优先读取磁盘缓存, 后台按TTL刷新)"""
         try:
-            self.exchange.load_markets()
-            return [symbol for symbol in self.exchange.symbols
-                    if symbol.endswith('/KRW') and symbol != 'USDT/KRW']
+            return [self.to_symbol(m) for m in self.catalog.get_markets()]
         except Exception as e:
             print(f"⚠️ 获取交易对列表失败: {e}")
             return []
 
+    def on_markets_changed(self, added, removed, markets):
+        """交易对目录变更: 更新待获取的交易对"""
+        self.krw_markets = [self.to_symbol(m) for m in markets]
+
     def fetch_tickers(self, symbols):
         """批量获取行情数据"""
         try:
@@ -33,96 +68,121 @@ class UpbitKRWMarketMonitor:
             print(f"⚠️ 获取行情数据失败: {e}")
             return None
 
-    def get_usdt_krw_rate(self):
-        """获取USDT-KRW汇率"""
-        try:
-            ticker = self.exchange.fetch_ticker('USDT/KRW')
-            return ticker['last']
-        except Exception as e:
-            print(f"⚠️ 获取USDT汇率失败: {e}")
-            return None
-
     def clear_screen(self):
         """清空终端屏幕"""
         print("\033c", end="")
 
     def process_market_data(self, tickers):
-        """处理市场数据"""
-        processed = []
-        for symbol, ticker in tickers.items():
-            if symbol == 'USDT/KRW':
-                continue
-
-            krw_price = ticker.get('last')
-            volume_krw = ticker.get('quoteVolume', 0)  # KRW计价交易量
-            change = ticker.get('percentage', 0)  # 百分比变化
-
-            processed.append({
-                'market': symbol.replace('/KRW', ''),
-                'krw_price': krw_price,
-                'usdt_price': krw_price / self.usdt_krw_rate if self.usdt_krw_rate else 0,
-                'volume_usdt': volume_krw / self.usdt_krw_rate if self.usdt_krw_rate else 0,
-                'change': change
-            })
-
-        # 按24h交易量(USDT)降序排序
-        return sorted(processed, key=lambda x: x['volume_usdt'], reverse=True)
+        """处理市场数据(列式批量换算, 只对前N个排序)"""
+        tickers = {symbol: ticker for symbol, ticker in tickers.items() if symbol != 'USDT/KRW'}
+        self.snapshot.update_ccxt(tickers)
+        zscores = self.surge.update(self.snapshot)
+        usdt_prices, volumes_usdt = self.snapshot.convert(self.usdt_krw_rate)
+
+        # 按近期成交额z值(或24h交易量)降序取前N个
+        keys = zscores if self.rank == "surge" and self.surge.ready else volumes_usdt
+        top = self.snapshot.top_n(keys, self.max_display)
+        rows = self.snapshot.to_rows(top, usdt_prices, volumes_usdt,
+                                     label=lambda s: s.replace('/KRW', ''), missing=0)
+        for i, item in zip(top, rows):
+            item['zscore'] = zscores[i]
+        return rows
+
+    def build_rows(self, processed_data):
+        """格式化为表格行"""
+        return [[
+            item['market'],
+            f"{item['krw_price']:,.0f}" if item['krw_price'] else 'N/A',
+            f"{item['usdt_price']:,.4f}" if item['usdt_price'] else 'N/A',
+            f"{item['change']:+.2f}%",
+            f"{item['volume_usdt']:,.1f}" if item['volume_usdt'] else 'N/A',
+            f"{item['zscore']:+.1f}" if item['zscore'] == item['zscore'] else 'N/A'
+        ] for item in processed_data[:self.max_display]]
+
+    def header_lines(self):
+        """表格上方的信息行"""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if self.rank == "surge":
+            order = "按成交额突增(z值)排序" if self.surge.ready else f"成交额基准积累中({self.surge.min_samples}个间隔), 暂按24h交易量排序"
+        else:
+            order = "按24h交易量排序"
+        return [
+            f"📊 Upbit KRW交易对实时监控 (CCXT) | 更新时间: {now}",
+            f"💱 基准汇率: 1 USDT = {self.usdt_krw_rate:,.1f} KRW" if self.usdt_krw_rate else "💱 基准汇率: 未获取",
+            f"🔄 每{self.update_interval}秒更新 | 显示前{self.max_display}个交易对 | {order}",
+        ]
 
     def display_market_data(self, processed_data):
         """显示市场数据"""
+        rows = self.build_rows(processed_data)
+
+        if self.renderer:
+            # 差分渲染: 只提交新帧, 由渲染线程重写变化的单元格
+            self.renderer.submit(self.header_lines() + [self.columns, self.renderer.rule()] + rows + ["🛑 按 Ctrl+C 停止监控"])
+            return
+
         self.clear_screen()
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # 创建表格
         table = Texttable()
         table.set_deco(Texttable.HEADER)
-        table.set_cols_align(["l", "r", "r", "r", "r"])
-        table.set_cols_width([10, 15, 15, 10, 18])
+        table.set_cols_align(self.col_aligns)
+        table.set_cols_width(self.col_widths)
+        table.set_cols_dtype(['t'] * len(self.columns))  # 已格式化的字符串, 不再按数值重排
 
         # 表头
-        table.header(["交易对", "KRW价格", "USDT价格", "24h涨跌", "24h交易量(USDT)"])
+        table.header(self.columns)
 
         # 添加数据行
-        for item in processed_data[:self.max_display]:
-            table.add_row([
-                item['market'],
-                f"{item['krw_price']:,.0f}" if item['krw_price'] else 'N/A',
-                f"{item['usdt_price']:,.4f}" if item['usdt_price'] else 'N/A',
-                f"{item['change']:+.2f}%",
-                f"{item['volume_usdt']:,.1f}" if item['volume_usdt'] else 'N/A'
-            ])
+        table.add_rows(rows, header=False)
 
         # 显示信息
-        print(f"📊 Upbit KRW交易对实时监控 (CCXT) | 更新时间: {now}")
-        print(f"💱 基准汇率: 1 USDT = {self.usdt_krw_rate:,.1f} KRW" if self.usdt_krw_rate else "💱 基准汇率: 未获取")
-        print(f"🔄 每{self.update_interval}秒更新 | 显示前{self.max_display}个交易对")
+        for line in self.header_lines():
+            print(line)
         print(table.draw())
         print("🛑 按 Ctrl+C 停止监控")
 
     def run(self):
         print("🚀 启动Upbit KRW交易对实时监控(使用CCXT)...")
 
-        krw_markets = self.get_all_krw_markets()
-        if not krw_markets:
+        self.krw_markets = self.get_all_krw_markets()
+        if not self.krw_markets:
             print("无法获取KRW交易对列表")
             return
 
+        self.catalog.add_listener(self.on_markets_changed)
+        self.catalog.start()
+        if self.metrics_port:
+            self.metrics_server = start_metrics_server(self.metrics_port)
+        if self.diff_render and not self.output:
+            self.renderer = DiffRenderer(self.col_widths, self.col_aligns).start()
+
         try:
             while True:
                 start_time = time.time()
 
-                # 1. 获取USDT-KRW汇率
-                self.usdt_krw_rate = self.get_usdt_krw_rate()
-
-                # 2. 获取所有KRW交易对数据
-                tickers = self.fetch_tickers(krw_markets)
+                # 1. 同一次批量请求获取USDT-KRW汇率与所有KRW交易对数据
+                tickers = self.fetch_tickers(['USDT/KRW'] + self.krw_markets)
+                if getattr(self.exchange, 'exhausted', False):
+                    break
 
                 if tickers:
-                    processed_data = self.process_market_data(tickers)
-                    self.display_market_data(processed_data)
+                    observe_staleness("vol", tickers.values())
+                    usdt = tickers.get('USDT/KRW')
+                    if usdt and usdt.get('last'):
+                        self.usdt_krw_rate = usdt['last']
+                    if self.output:
+                        self.output.write_ccxt({s: t for s, t in tickers.items() if s != 'USDT/KRW'},
+                                               self.usdt_krw_rate)
+                    else:
+                        with PROCESS_TIME.time("vol"):
+                            processed_data = self.process_market_data(tickers)
+                        with RENDER_TIME.time("vol"):
+                            self.display_market_data(processed_data)
 
                 # 精确控制更新间隔
                 elapsed = time.time() - start_time
+                observe_cycle("vol", elapsed, self.update_interval)
                 sleep_time = max(0, self.update_interval - elapsed)
                 time.sleep(sleep_time)
 
@@ -131,10 +191,25 @@ class UpbitKRWMarketMonitor:
         except Exception as e:
             print(f"❌ 发生错误: {e}")
         finally:
+            if self.renderer:
+                self.renderer.stop()
+            self.catalog.stop()
             self.exchange.close()
+            if self.metrics_server:
+                self.metrics_server.stop()
+            if self.output:
+                self.output.close()
+
+
+def run_standalone(args):
+    """独立运行本脚本自身的CCXT版监控"""
+    monitor = UpbitKRWMarketMonitor(diff_render=not args.no_diff, metrics_port=args.metrics_port)
+    monitor.update_interval = args.interval
+    monitor.run()
 
 
 if __name__ == "__main__":
-    # 安装依赖: pip install ccxt texttable
-    monitor = UpbitKRWMarketMonitor()
-    monitor.run()
\ No newline at end of file
+    # 安装依赖: pip install ccxt texttable requests numpy websocket-client
+    # 默认作为多视图引擎的成交额突增视图运行, 与其他监控脚本共用一份采集(共享快照); --standalone运行本脚本自身的CCXT版监控
+    from upbit_engine import run_view
+    run_view("vol", 60, "Upbit KRW交易对成交额突增监控(USDT计价)", standalone=run_standalone)
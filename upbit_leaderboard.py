@@ -0,0 +1,99 @@
+import bisect
+
+try:
+    from sortedcontainers import SortedList  # 可选: pip install sortedcontainers, 单次更新O(log n)
+except ImportError:
+    SortedList = None
+# 增量排行榜: 按得分(如24h USDT交易额)维护有序表, 单个交易对更新只需二分定位, 并输出前N名的名次变化
+
+
+class Leaderboard:
+    def __init__(self, size=100):
+        self.size = size  # 关注的前N名
+        # 升序排列的 (-score, market), 即得分从高到低; 未安装sortedcontainers时退回普通列表(插入/删除需搬移元素)
+        self._keys = SortedList() if SortedList is not None else []
+        self._scores = {}  # market -> score
+        self._top = []  # 上次diff时的前N名
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """注册名次变化回调: callback(events)"""
+        self._listeners.append(callback)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, market, score):
+        """更新单个交易对得分, 得分未变化时直接返回False"""
+        old = self._scores.get(market)
+        if old == score:
+            return False
+        if old is not None:
+            self._discard((-old, market))
+        self._scores[market] = score
+        if SortedList is not None:
+            self._keys.add((-score, market))
+        else:
+            bisect.insort(self._keys, (-score, market))
+        return True
+
+    def _discard(self, key):
+        pos = self._keys.bisect_left(key) if SortedList is not None else bisect.bisect_left(self._keys, key)
+        del self._keys[pos]
+
+    def remove(self, market):
+        """移除交易对(如下架)"""
+        old = self._scores.pop(market, None)
+        if old is None:
+            return False
+        self._discard((-old, market))
+        return True
+
+    def update_many(self, items):
+        """批量更新 [(market, score), ...], 返回前N名的名次变化事件"""
+        changed = False
+        for market, score in items:
+            if score is None or score != score:  # 跳过缺失值与NaN
+                continue
+            changed |= self.update(market, score)
+        return self.diff() if changed else []
+
+    def score(self, market):
+        return self._scores.get(market)
+
+    def rank(self, market):
+        """返回名次(从0开始), 不存在返回None"""
+        score = self._scores.get(market)
+        if score is None:
+            return None
+        if SortedList is not None:
+            return self._keys.bisect_left((-score, market))
+        return bisect.bisect_left(self._keys, (-score, market))
+
+    def top(self, n=None):
+        """返回前n名 [(market, score), ...]"""
+        n = self.size if n is None else n
+        return [(market, -neg) for neg, market in self._keys[:n]]
+
+    def diff(self):
+        """与上次diff相比的前N名变化: entered / left / moved"""
+        current = [market for _, market in self._keys[:self.size]]
+        old_rank = {market: i for i, market in enumerate(self._top)}
+        new_rank = {market: i for i, market in enumerate(current)}
+
+        events = []
+        for i, market in enumerate(current):
+            prev = old_rank.get(market)
+            if prev is None:
+                events.append({'type': 'entered', 'market': market, 'old_rank': None, 'new_rank': i})
+            elif prev != i:
+                events.append({'type': 'moved', 'market': market, 'old_rank': prev, 'new_rank': i})
+        for market, prev in old_rank.items():
+            if market not in new_rank:
+                events.append({'type': 'left', 'market': market, 'old_rank': prev, 'new_rank': None})
+
+        self._top = current
+        if events:
+            for callback in self._listeners:
+                callback(events)
+        return events
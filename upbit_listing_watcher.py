@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+from collections import deque
+# 新上币监测: 以market接口组的一部分额度高频轮询交易对目录, 响应未变时只做字节比较, 变化时才解析并通知目录的监听者
+
+
+class ListingWatcher:
+    def __init__(self, catalog, fetcher, request_rate=2.0, history=100):
+        self.catalog = catalog  # UpbitMarketCatalog: 检测到变化后由它更新目录、写缓存并通知监听者
+        self.fetcher = fetcher
+        self.request_rate = request_rate  # 每秒轮询次数, 与其他监控共享market组每秒10次的额度
+        self.listings = deque(maxlen=history)  # 最近的上币事件 {'market', 'detected_at', 'window'}
+        self.polls = 0
+        self.last_poll_time = None  # 最近一次目录请求耗时(秒)
+        self._listeners = []
+        self._raw = None  # 上一次的响应体, 未变化时跳过解析
+        self._last_poll = None  # 上一次请求的发出时间
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def add_listener(self, callback):
+        """注册上币回调: callback(market, window), window为检测时延上限(秒), 启动时补齐的交易对为None"""
+        self._listeners.append(callback)
+
+    def poll(self):
+        """请求一次目录, 返回新增的交易对"""
+        sent = time.monotonic()
+        raw = self.fetcher.get("/v1/market/all", decode=bytes)
+        self.polls += 1
+        received = time.monotonic()
+        self.last_poll_time = received - sent
+        # 上币前的最后一次请求到本次响应之间的任意时刻都可能是上币时间
+        window = received - self._last_poll if self._last_poll is not None else None
+        self._last_poll = sent
+        if raw == self._raw:
+            return []
+        self._raw = raw
+
+        prefix = f"{self.catalog.quote}-"
+        all_markets = [m['market'] for m in json.loads(raw) if m['market'].startswith(prefix)]
+        added, removed = self.catalog.apply(all_markets)
+        if removed:
+            print(f"📢 交易对下架: {removed}")
+        detected_at = time.time()
+        for market in added:
+            self.listings.append({'market': market, 'detected_at': detected_at, 'window': window})
+            for callback in self._listeners:
+                callback(market, window)
+        return added
+
+    def start(self):
+        """启动后台轮询线程"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._poll_loop, name="upbit-listing-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _poll_loop(self):
+        interval = 1.0 / self.request_rate
+        while not self._stopped.is_set():
+            start = time.monotonic()
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️ 轮询交易对目录失败: {e}")
+            self._stopped.wait(max(0.0, interval - (time.monotonic() - start)))
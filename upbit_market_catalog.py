@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+# 交易对目录缓存: 持久化到磁盘, 按TTL后台刷新, 并通知新增/下架的交易对
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "upbit")
+
+
+class UpbitMarketCatalog:
+    def __init__(self, fetch_markets, quote="KRW", ttl=300, exclude=(), cache_path=None, persist=True):
+        self.fetch_markets = fetch_markets  # 回调: fetch_markets(quote) -> 按上币顺序的交易对列表
+        self.quote = quote
+        self.ttl = ttl  # 目录过期时间(秒)
+        self.exclude = set(exclude)
+        self.cache_path = cache_path or os.path.join(DEFAULT_CACHE_DIR, f"markets_{quote}.json")
+        self.persist = persist  # False时不读写磁盘缓存(如离线回放)
+
+        self.markets = []  # 按上币顺序(已排除exclude)
+        self._all_markets = []  # 接口返回的完整列表, 原样写入缓存供其他监控共享
+        self.updated_at = 0.0  # 最近一次成功刷新的时间戳
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def add_listener(self, callback):
+        """注册变更回调: callback(added, removed, markets)"""
+        self._listeners.append(callback)
+
+    def load_cache(self):
+        """从磁盘读取上次保存的目录, 成功返回True"""
+        if not self.persist:
+            return False
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        all_markets = cached.get('markets', [])
+        markets = [m for m in all_markets if m not in self.exclude]
+        if not markets:
+            return False
+        with self._lock:
+            self._all_markets = all_markets
+            self.markets = markets
+            self.updated_at = cached.get('updated_at', 0.0)
+        return True
+
+    def save_cache(self):
+        """原子写入磁盘缓存"""
+        if not self.persist:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'quote': self.quote, 'updated_at': self.updated_at, 'markets': self._all_markets}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def is_expired(self):
+        return time.time() - self.updated_at >= self.ttl
+
+    def refresh(self):
+        """从接口刷新目录, 返回 (added, removed)"""
+        return self.apply(self.fetch_markets(self.quote))
+
+    def apply(self, all_markets):
+        """用接口返回的完整列表(按上币顺序)更新目录并通知变更, 返回 (added, removed)"""
+        fresh = [m for m in all_markets if m not in self.exclude]
+        with self._lock:
+            old = set(self.markets)
+            new = set(fresh)
+            added = [m for m in fresh if m not in old]
+            removed = [m for m in self.markets if m not in new]
+            self._all_markets = all_markets
+            self.markets = fresh
+            self.updated_at = time.time()
+        try:
+            self.save_cache()
+        except OSError as e:
+            print(f"⚠️ 保存交易对缓存失败: {e}")
+        if added or removed:
+            for callback in self._listeners:
+                callback(added, removed, fresh)
+        return added, removed
+
+    def get_markets(self):
+        """返回当前目录: 优先使用磁盘缓存, 无缓存时同步请求接口"""
+        if not self.markets and not self.load_cache():
+            self.refresh()
+        return list(self.markets)
+
+    def start(self):
+        """启动后台TTL刷新线程"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="upbit-market-catalog", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _refresh_loop(self):
+        while not self._stopped.is_set():
+            if self.is_expired():
+                try:
+                    added, removed = self.refresh()
+                    if added or removed:
+                        print(f"📢 交易对变更: 新增{added} 下架{removed}")
+                except Exception as e:
+                    print(f"⚠️ 刷新交易对目录失败: {e}")
+                    # 失败后不立即重试, 至少等待一个较短的间隔
+                    self._stopped.wait(min(self.ttl, 30))
+                    continue
+            self._stopped.wait(max(0.0, self.updated_at + self.ttl - time.time()))
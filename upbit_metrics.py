@@ -0,0 +1,244 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# 运行指标: 热路径上的直方图/计数器/仪表, 以Prometheus文本格式通过本地HTTP端点输出
+
+# 秒级延迟的默认分桶(1ms ~ 30s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    """标签值转义: 反斜杠、双引号、换行 (文本格式0.0.4)"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_str(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _num(value):
+    return "+Inf" if value == float('inf') else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # 标签值元组 -> 数据
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    @property
+    def family(self):
+        """TYPE/HELP行使用的名称, 须与样本名一致"""
+        return self.name
+
+    def header(self):
+        help = self.help.replace('\\', '\\\\').replace('\n', '\\n')
+        return [f"# HELP {self.family} {help}", f"# TYPE {self.family} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    @property
+    def family(self):
+        return f"{self.name}_total"
+
+    def inc(self, amount=1, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.family}{_label_str(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, *labels):
+        return self._values.get(self._key(labels))
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_num(v)}" for k, v in items if v is not None]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        pos = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                # [各分桶计数(非累计), 总和, 次数]
+                data = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            data[0][pos] += 1
+            data[1] += value
+            data[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """计时上下文: with histogram.time(): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels):
+        data = self._values.get(self._key(labels))
+        return data[2] if data else 0
+
+    def collect(self):
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, ('le', _num(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self):
+        """Prometheus文本格式"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines += metric.header() + metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享的默认注册表
+REGISTRY = MetricsRegistry()
+
+HTTP_LATENCY = REGISTRY.histogram("upbit_http_request_seconds", "单个HTTP请求(每批)的耗时", ("path",))
+JSON_DECODE = REGISTRY.histogram("upbit_json_decode_seconds", "响应JSON解析耗时", ("path",))
+HTTP_ERRORS = REGISTRY.counter("upbit_http_errors", "HTTP请求失败次数", ("path",))
+HTTP_THROTTLED = REGISTRY.counter("upbit_http_throttled", "收到429/418限流响应的次数", ("group",))
+FETCH_CYCLE = REGISTRY.histogram("upbit_fetch_cycle_seconds", "一轮全部交易对行情获取耗时")
+PROCESS_TIME = REGISTRY.histogram("upbit_process_seconds", "行情处理(换算/排序)耗时", ("monitor",))
+RENDER_TIME = REGISTRY.histogram("upbit_render_seconds", "表格渲染输出耗时", ("monitor",))
+CYCLE_TIME = REGISTRY.histogram("upbit_cycle_seconds", "监控主循环单轮耗时", ("monitor",))
+CYCLE_OVERRUN = REGISTRY.counter("upbit_cycle_overrun", "单轮耗时超过update_interval的次数", ("monitor",))
+TICKER_AGE = REGISTRY.gauge("upbit_ticker_age_seconds", "最新一条行情距当前的时间(数据陈旧度)", ("monitor",))
+
+
+def observe_staleness(monitor, tickers, now=None):
+    """根据行情时间戳(毫秒)记录最新行情的陈旧度"""
+    newest = max((t.get('timestamp') or 0 for t in tickers if t), default=0)
+    if newest:
+        TICKER_AGE.set(max(0.0, (now or time.time()) - newest / 1000), monitor)
+
+
+def observe_cycle(monitor, elapsed, update_interval):
+    """记录主循环单轮耗时, 超过更新间隔时计入overrun"""
+    CYCLE_TIME.observe(elapsed, monitor)
+    if update_interval and elapsed > update_interval:
+        CYCLE_OVERRUN.inc(1, monitor)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """本地 /metrics 端点(默认只监听127.0.0.1)"""
+
+    daemon_threads = True
+
+    def __init__(self, port=9108, host="127.0.0.1", registry=None):
+        super().__init__((host, port), _MetricsHandler)
+        self.registry = registry or REGISTRY
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """启动指标端点, 端口被占用等失败时只打印警告"""
+    try:
+        server = MetricsServer(port, host).start()
+    except OSError as e:
+        print(f"⚠️ 启动指标端点失败: {e}")
+        return None
+    print(f"📈 指标端点: {server.url}")
+    return server
@@ -0,0 +1,271 @@
+import asyncio
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+from texttable import Texttable
+from upbit_terminal_renderer import DiffRenderer
+# 多交易所并发行情聚合: 基于CCXT异步接口同时获取各交易所的批量ticker, 按币种对齐换算为USDT并计算跨所价差
+
+# 交易所 -> 计价货币; KRW计价的交易所从同一次批量请求中取USDT/KRW换算
+DEFAULT_VENUES = {
+    'upbit': 'KRW',
+    'bithumb': 'KRW',
+    'binance': 'USDT',
+}
+
+
+def create_exchange(name):
+    """创建CCXT异步交易所实例"""
+    import ccxt.async_support as ccxt_async
+
+    return getattr(ccxt_async, name)({
+        'enableRateLimit': True,
+        'timeout': 15000,
+    })
+
+
+class FakeExchange:
+    """进程内模拟的异步交易所, 接口与CCXT一致(load_markets / fetch_tickers / close), 用于离线运行与测试"""
+
+    def __init__(self, id, quote, bases, usdt_krw=1400.0, latency=0.05, noise=0.01, seed=None):
+        self.id = id
+        self.quote = quote
+        self.latency = latency  # 模拟每次请求的网络延迟(秒)
+        self.noise = noise  # 各交易所价格相对基准价的随机偏离
+        self.usdt_krw = usdt_krw
+        self.rng = random.Random(seed if seed is not None else id)
+        # 基准价只由币种决定, 各模拟交易所围绕同一基准价波动(USDT计价)
+        self.base_prices = {base: 10 ** random.Random(base).uniform(-2, 4) for base in bases}
+        self.markets = {}
+        self.calls = 0
+
+    @property
+    def symbols(self):
+        return list(self.markets)
+
+    async def load_markets(self, reload=False):
+        await asyncio.sleep(self.latency)
+        self.markets = {f"{base}/{self.quote}": {'base': base, 'quote': self.quote} for base in self.base_prices}
+        if self.quote == 'KRW':
+            self.markets['USDT/KRW'] = {'base': 'USDT', 'quote': 'KRW'}
+        return self.markets
+
+    def _price(self, base):
+        if base == 'USDT':
+            return self.usdt_krw * (1 + self.rng.uniform(-self.noise, self.noise))
+        price = self.base_prices[base] * (1 + self.rng.uniform(-self.noise, self.noise))
+        return price * self.usdt_krw if self.quote == 'KRW' else price
+
+    async def fetch_tickers(self, symbols=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        now = int(time.time() * 1000)
+        result = {}
+        for symbol in symbols or self.symbols:
+            market = self.markets.get(symbol)
+            if market:
+                result[symbol] = {'symbol': symbol, 'last': self._price(market['base']), 'timestamp': now}
+        return result
+
+    async def close(self):
+        pass
+
+
+class MultiExchangeMonitor:
+    def __init__(self, exchanges, quotes=None, update_interval=10, max_display=30, diff_render=True):
+        self.exchanges = exchanges  # 交易所名 -> CCXT异步实例(或FakeExchange)
+        self.quotes = {name: (quotes or DEFAULT_VENUES).get(name, 'USDT') for name in exchanges}
+        self.update_interval = update_interval
+        self.max_display = max_display
+        self.diff_render = diff_render
+        self.renderer = None
+        self.venues = list(exchanges)
+        self.bases = []  # 至少两个交易所都有的币种(对齐后的行)
+        self.symbols = {}  # 交易所 -> 本轮请求的交易对列表(含USDT/KRW)
+        self.usdt_rates = {}  # 交易所 -> USDT计价汇率(USDT计价的交易所为1)
+        self.errors = {}  # 交易所 -> 最近一次错误
+        self.columns = ["币种", "最低(USDT)", "最低交易所", "最高(USDT)", "最高交易所", "价差"]
+        self.col_widths = [10, 15, 10, 15, 10, 10]
+        self.col_aligns = ["l", "r", "l", "r", "l", "r"]
+
+    async def load_markets(self):
+        """并发加载各交易所的交易对, 按币种对齐"""
+        results = await asyncio.gather(*(self.exchanges[v].load_markets() for v in self.venues),
+                                       return_exceptions=True)
+        bases_by_venue = {}
+        for venue, result in zip(self.venues, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ {venue} 加载交易对失败: {result}")
+                continue
+            quote = self.quotes[venue]
+            bases_by_venue[venue] = {m['base'] for m in result.values()
+                                     if m.get('quote') == quote and m.get('base') != 'USDT'}
+
+        counts = {}
+        for bases in bases_by_venue.values():
+            for base in bases:
+                counts[base] = counts.get(base, 0) + 1
+        self.bases = sorted(base for base, n in counts.items() if n >= 2)
+        for venue, bases in bases_by_venue.items():
+            quote = self.quotes[venue]
+            symbols = [f"{base}/{quote}" for base in self.bases if base in bases]
+            if quote == 'KRW':
+                symbols.append('USDT/KRW')  # 汇率与行情来自同一次批量请求
+            self.symbols[venue] = symbols
+        return self.bases
+
+    async def fetch_venue(self, venue):
+        return await self.exchanges[venue].fetch_tickers(self.symbols[venue])
+
+    async def fetch_all(self):
+        """所有交易所并发获取, 单个交易所失败不影响其他交易所"""
+        venues = [v for v in self.venues if self.symbols.get(v)]
+        results = await asyncio.gather(*(self.fetch_venue(v) for v in venues), return_exceptions=True)
+        tickers = {}
+        for venue, result in zip(venues, results):
+            if isinstance(result, Exception):
+                self.errors[venue] = result
+                print(f"⚠️ {venue} 获取行情失败: {result}")
+                continue
+            self.errors.pop(venue, None)
+            tickers[venue] = result
+        return tickers
+
+    def align(self, tickers):
+        """对齐为 币种×交易所 的USDT价格矩阵(缺失为NaN)"""
+        index = {base: i for i, base in enumerate(self.bases)}
+        prices = np.full((len(self.bases), len(self.venues)), np.nan)
+        for j, venue in enumerate(self.venues):
+            venue_tickers = tickers.get(venue)
+            if not venue_tickers:
+                continue
+            quote = self.quotes[venue]
+            if quote == 'USDT':
+                rate = 1.0
+            else:
+                usdt = venue_tickers.get(f'USDT/{quote}')
+                rate = usdt.get('last') if usdt else None
+            if not rate:
+                continue
+            self.usdt_rates[venue] = rate
+            for symbol, ticker in venue_tickers.items():
+                i = index.get(symbol.split('/')[0])
+                if i is not None and ticker.get('last'):
+                    prices[i, j] = ticker['last'] / rate
+        return prices
+
+    def spreads(self, prices):
+        """按行计算最低/最高价与价差, 返回按价差降序的前N行"""
+        available = np.sum(~np.isnan(prices), axis=1) >= 2
+        rows = np.flatnonzero(available)
+        if not len(rows):
+            return []
+        sub = prices[rows]
+        low_idx = np.nanargmin(sub, axis=1)
+        high_idx = np.nanargmax(sub, axis=1)
+        low = sub[np.arange(len(rows)), low_idx]
+        high = sub[np.arange(len(rows)), high_idx]
+        spread = (high - low) / low
+        order = np.argsort(-spread, kind='stable')[:self.max_display]
+        return [{
+            'base': self.bases[rows[k]],
+            'low': low[k],
+            'low_venue': self.venues[low_idx[k]],
+            'high': high[k],
+            'high_venue': self.venues[high_idx[k]],
+            'spread': spread[k],
+        } for k in order]
+
+    def build_rows(self, spreads):
+        return [[
+            item['base'],
+            f"{item['low']:,.4f}",
+            item['low_venue'],
+            f"{item['high']:,.4f}",
+            item['high_venue'],
+            f"{item['spread'] * 100:.2f}%",
+        ] for item in spreads]
+
+    def header_lines(self):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rates = " | ".join(f"{v}: 1 USDT = {r:,.1f} {self.quotes[v]}" for v, r in self.usdt_rates.items()
+                           if self.quotes[v] != 'USDT')
+        return [
+            f"🌐 跨交易所价差 ({', '.join(self.venues)}) | 更新时间: {now}",
+            f"💱 {rates or '汇率未获取'}",
+            f"🔄 每{self.update_interval}秒更新 | {len(self.bases)}个共同币种 | 显示价差前{self.max_display}",
+        ]
+
+    def display(self, spreads):
+        rows = self.build_rows(spreads)
+        if self.renderer:
+            self.renderer.submit(self.header_lines() + [self.columns, self.renderer.rule()] + rows + ["🛑 按 Ctrl+C 停止监控"])
+            return
+
+        print("\033c", end="")
+        table = Texttable()
+        table.set_deco(Texttable.HEADER)
+        table.set_cols_align(self.col_aligns)
+        table.set_cols_width(self.col_widths)
+        table.set_cols_dtype(['t'] * len(self.columns))  # 已格式化的字符串, 不再按数值重排
+        table.header(self.columns)
+        table.add_rows(rows, header=False)
+        for line in self.header_lines():
+            print(line)
+        print(table.draw())
+        print("🛑 按 Ctrl+C 停止监控")
+
+    async def run_async(self, cycles=None):
+        print("🚀 启动跨交易所价差监控(CCXT异步)...")
+        try:
+            if not await self.load_markets():
+                print("没有两个以上交易所共同的币种")
+                return
+            if self.diff_render:
+                self.renderer = DiffRenderer(self.col_widths, self.col_aligns).start()
+
+            count = 0
+            while cycles is None or count < cycles:
+                start_time = time.time()
+                tickers = await self.fetch_all()
+                if tickers:
+                    self.display(self.spreads(self.align(tickers)))
+                count += 1
+
+                elapsed = time.time() - start_time
+                await asyncio.sleep(max(0, self.update_interval - elapsed))
+        finally:
+            if self.renderer:
+                self.renderer.stop()
+            await asyncio.gather(*(ex.close() for ex in self.exchanges.values()), return_exceptions=True)
+
+    def run(self, cycles=None):
+        try:
+            asyncio.run(self.run_async(cycles))
+        except KeyboardInterrupt:
+            print("\n🛑 监控已停止")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="多交易所并发行情聚合与价差监控")
+    parser.add_argument("--venues", default=",".join(DEFAULT_VENUES), help="CCXT交易所id, 逗号分隔")
+    parser.add_argument("--interval", type=float, default=10, help="更新间隔(秒)")
+    parser.add_argument("--fake", action="store_true", help="使用进程内模拟交易所(离线)")
+    args = parser.parse_args()
+
+    venues = [v.strip() for v in args.venues.split(",")]
+    if args.fake:
+        bases = [f"C{i}" for i in range(200)]
+        exchanges = {v: FakeExchange(v, DEFAULT_VENUES.get(v, 'USDT'), bases) for v in venues}
+    else:
+        exchanges = {v: create_exchange(v) for v in venues}
+    MultiExchangeMonitor(exchanges, update_interval=args.interval).run()
+
+
+if __name__ == "__main__":
+    # 安装依赖: pip install ccxt texttable numpy
+    main()
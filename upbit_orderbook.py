@@ -0,0 +1,321 @@
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+from texttable import Texttable
+from upbit_fetcher import UpbitTickerFetcher
+from upbit_snapshot import MarketIndex, MarketSnapshot
+from upbit_terminal_renderer import DiffRenderer
+from upbit_ticker_stream import UpbitTickerStream
+# 订单簿深度: 各交易对的买卖盘存为定长价格/数量数组, 逐个交易对原地更新, 按USDT名义金额批量估算吃单的VWAP滑点
+
+DEPTH = 15  # Upbit订单簿默认返回15档
+
+
+class OrderBookSet:
+    """全部交易对的订单簿, 每个交易对占数组中的一行 (档位按价格由优到劣)"""
+
+    def __init__(self, index=None, depth=DEPTH, capacity=256):
+        self.index = index if index is not None else MarketIndex()
+        self.depth = depth
+        self._alloc(max(capacity, len(self.index)))
+        self.lock = threading.Lock()  # 推送线程写入与计算滑点互斥
+        self.updates = 0
+
+    def _alloc(self, capacity):
+        depth = self.depth
+        self.ask_price = np.full((capacity, depth), np.nan)
+        self.ask_size = np.zeros((capacity, depth))
+        self.bid_price = np.full((capacity, depth), np.nan)
+        self.bid_size = np.zeros((capacity, depth))
+        self.timestamp = np.zeros(capacity, dtype=np.int64)
+        self.valid = np.zeros(capacity, dtype=bool)
+
+    def _ensure_capacity(self, size):
+        capacity = len(self.timestamp)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        old = {name: getattr(self, name) for name in
+               ('ask_price', 'ask_size', 'bid_price', 'bid_size', 'timestamp', 'valid')}
+        self._alloc(capacity)
+        for name, array in old.items():
+            getattr(self, name)[:len(array)] = array
+
+    def update(self, market, units, timestamp=0):
+        """用一组档位(Upbit orderbook_units格式)覆盖一个交易对的订单簿, 较旧的推送被忽略"""
+        i = self.index.get(market)
+        self._ensure_capacity(len(self.index))
+        if timestamp and timestamp < self.timestamp[i]:
+            return False
+        n = min(len(units), self.depth)
+        ask_price, ask_size = self.ask_price[i], self.ask_size[i]
+        bid_price, bid_size = self.bid_price[i], self.bid_size[i]
+        for k in range(n):
+            unit = units[k]
+            ask_price[k] = unit['ask_price']
+            ask_size[k] = unit['ask_size']
+            bid_price[k] = unit['bid_price']
+            bid_size[k] = unit['bid_size']
+        if n < self.depth:
+            ask_price[n:] = bid_price[n:] = np.nan
+            ask_size[n:] = bid_size[n:] = 0.0
+        self.timestamp[i] = timestamp
+        self.valid[i] = n > 0
+        self.updates += 1
+        return True
+
+    def update_upbit(self, orderbooks):
+        """写入REST /v1/orderbook 或 WebSocket orderbook 推送"""
+        for book in orderbooks:
+            market = book.get('market') or book.get('code')
+            if market:
+                self.update(market, book.get('orderbook_units') or [], book.get('timestamp') or 0)
+
+    def levels(self, market):
+        """单个交易对的买卖盘 (asks, bids), 每项为 (价格, 数量)"""
+        i = self.index.find(market)
+        if i is None:
+            return [], []
+        asks = [(p, s) for p, s in zip(self.ask_price[i], self.ask_size[i]) if p == p]
+        bids = [(p, s) for p, s in zip(self.bid_price[i], self.bid_size[i]) if p == p]
+        return asks, bids
+
+    def spread(self):
+        """买一卖一价差(相对中间价)"""
+        n = len(self.index)
+        ask, bid = self.ask_price[:n, 0], self.bid_price[:n, 0]
+        with np.errstate(invalid='ignore'):
+            return (ask - bid) / ((ask + bid) / 2)
+
+    def slippage(self, notional_krw, side='buy'):
+        """吃单成交notional_krw(KRW)的滑点, 返回 (vwap, slippage, filled)
+
+        slippage为VWAP相对最优价的不利偏离(小数), filled为可成交比例; 深度不足时vwap与slippage为NaN
+        """
+        n = len(self.index)
+        if side == 'buy':
+            prices, sizes = self.ask_price[:n], self.ask_size[:n]
+        else:
+            prices, sizes = self.bid_price[:n], self.bid_size[:n]
+        prices0 = np.nan_to_num(prices)
+        value = prices0 * sizes
+        cumulative = np.cumsum(value, axis=1)
+        total = cumulative[:, -1]
+        filled = np.minimum(total / notional_krw, 1.0) if notional_krw > 0 else np.ones(n)
+
+        enough = total >= notional_krw
+        last = np.argmax(cumulative >= notional_krw, axis=1)  # 需要吃到的最后一档
+        rows = np.arange(n)
+        before = np.where(last > 0, cumulative[rows, np.maximum(last - 1, 0)], 0.0)
+        quantity_before = np.where(
+            np.arange(self.depth)[None, :] < last[:, None], sizes, 0.0).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            quantity = quantity_before + (notional_krw - before) / prices0[rows, last]
+            vwap = np.where(enough, notional_krw / quantity, np.nan)
+            best = prices[:, 0]
+            slip = vwap / best - 1 if side == 'buy' else 1 - vwap / best
+        return vwap, slip, filled
+
+
+class UpbitOrderbookStream(UpbitTickerStream):
+    """WebSocket orderbook推送: 每条消息覆盖一个交易对的订单簿"""
+
+    def __init__(self, markets, books, url="wss://api.upbit.com/websocket/v1", **kwargs):
+        super().__init__(markets, url=url, **kwargs)
+        self.books = books
+
+    def subscribe_message(self):
+        return json.dumps([
+            {"ticket": str(uuid.uuid4())},
+            {"type": "orderbook", "codes": self.markets},
+            {"format": "DEFAULT"},
+        ])
+
+    def handle_message(self, raw):
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        data = json.loads(raw)
+        if data.get('type') != 'orderbook' or not data.get('code'):
+            return
+        with self.books.lock:
+            self.books.update(data['code'], data.get('orderbook_units') or [], data.get('timestamp') or 0)
+        self.last_update = time.time()
+        self.ready.set()
+        for callback in self._listeners:
+            callback(data)
+
+
+class OrderbookDepthMonitor:
+    def __init__(self, notional_usdt=10000, update_interval=10, max_display=30, use_stream=False,
+                 stream_url="wss://api.upbit.com/websocket/v1", diff_render=True, fetcher=None):
+        self.notional_usdt = notional_usdt  # 估算滑点的下单金额(USDT)
+        self.update_interval = update_interval
+        self.max_display = max_display
+        self.use_stream = use_stream
+        self.stream_url = stream_url
+        self.diff_render = diff_render
+        self.fetcher = fetcher or UpbitTickerFetcher(timeout=5)
+        self.snapshot = MarketSnapshot()
+        self.books = OrderBookSet(self.snapshot.index)  # 共用下标, 订单簿与ticker快照按行对齐
+        self.stream = None
+        self.renderer = None
+        self.markets = []
+        self.usdt_krw_rate = None
+        self.columns = ["交易对", "买一价", "卖一价", "价差", "买入滑点", "卖出滑点", "24h交易量(USDT)"]
+        self.col_widths = [10, 14, 14, 8, 10, 10, 18]
+        self.col_aligns = ["l", "r", "r", "r", "r", "r", "r"]
+
+    def fetch_orderbooks(self):
+        """分批并发获取全部交易对的订单簿"""
+        batches = self.fetcher.make_batches(self.markets)
+        results = self.fetcher.executor.map(
+            lambda batch: self.fetcher.get("/v1/orderbook", params={"markets": ",".join(batch)}), batches)
+        for result in results:
+            self.books.update_upbit(result)
+
+    def refresh(self):
+        """一轮采集: ticker(含USDT/KRW)一次批量请求, 订单簿走REST或推送"""
+        tickers = self.fetcher.fetch_tickers(["KRW-USDT"] + self.markets)
+        for ticker in tickers:
+            if ticker['market'] == "KRW-USDT" and ticker.get('trade_price'):
+                self.usdt_krw_rate = ticker['trade_price']
+        self.snapshot.update_upbit([t for t in tickers if t['market'] != "KRW-USDT"])
+        if not self.stream:
+            self.fetch_orderbooks()
+
+    def compute(self):
+        """按最新USDT/KRW把名义金额换算为KRW, 对全部交易对一次计算滑点"""
+        notional_krw = self.notional_usdt * self.usdt_krw_rate
+        with self.books.lock:
+            _, buy, buy_filled = self.books.slippage(notional_krw, 'buy')
+            _, sell, sell_filled = self.books.slippage(notional_krw, 'sell')
+            spread = self.books.spread()
+            bid = self.books.bid_price[:, 0].copy()
+            ask = self.books.ask_price[:, 0].copy()
+            valid = self.books.valid.copy()
+        _, volumes = self.snapshot.convert(self.usdt_krw_rate)
+        top = self.snapshot.top_n(volumes, self.max_display)
+        return [{
+            'market': self.snapshot.index.markets[i],
+            'bid': bid[i],
+            'ask': ask[i],
+            'spread': spread[i],
+            'buy': buy[i],
+            'buy_filled': buy_filled[i],
+            'sell': sell[i],
+            'sell_filled': sell_filled[i],
+            'volume_usdt': volumes[i],
+        } for i in top if valid[i]]
+
+    @staticmethod
+    def _slip(value, filled):
+        if value == value:
+            return f"{value * 100:.2f}%"
+        return f"深度{filled * 100:.0f}%" if filled == filled else 'N/A'
+
+    def build_rows(self, items):
+        return [[
+            item['market'].replace("KRW-", ""),
+            f"{item['bid']:,.1f}",
+            f"{item['ask']:,.1f}",
+            f"{item['spread'] * 100:.2f}%",
+            self._slip(item['buy'], item['buy_filled']),
+            self._slip(item['sell'], item['sell_filled']),
+            f"{item['volume_usdt']:,.1f}",
+        ] for item in items]
+
+    def header_lines(self):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        notional = f"{self.notional_usdt:,.0f} USDT ≈ {self.notional_usdt * self.usdt_krw_rate:,.0f} KRW"
+        source = "WebSocket推送" if self.stream else "REST轮询"
+        return [
+            f"📚 Upbit订单簿深度 | 更新时间: {now}",
+            f"💱 基准汇率: 1 USDT = {self.usdt_krw_rate:,.1f} KRW | 下单金额: {notional}",
+            f"🔄 每{self.update_interval}秒更新 | 订单簿来自{source} | 显示交易量前{self.max_display}",
+        ]
+
+    def display(self, items):
+        rows = self.build_rows(items)
+        if self.renderer:
+            self.renderer.submit(self.header_lines() + [self.columns, self.renderer.rule()] + rows + ["🛑 按 Ctrl+C 停止监控"])
+            return
+
+        print("\033c", end="")
+        table = Texttable()
+        table.set_deco(Texttable.HEADER)
+        table.set_cols_align(self.col_aligns)
+        table.set_cols_width(self.col_widths)
+        table.set_cols_dtype(['t'] * len(self.columns))  # 已格式化的字符串, 不再按数值重排
+        table.header(self.columns)
+        table.add_rows(rows, header=False)
+        for line in self.header_lines():
+            print(line)
+        print(table.draw())
+        print("🛑 按 Ctrl+C 停止监控")
+
+    def run(self, cycles=None):
+        print("🚀 启动Upbit订单簿深度监控...")
+        try:
+            self.markets = [m for m in self.fetcher.fetch_markets("KRW") if m != "KRW-USDT"]
+        except Exception as e:
+            print(f"⚠️ 获取交易对列表失败: {e}")
+            return
+        # 预先登记全部交易对, 推送线程只按已有下标写入
+        for market in self.markets:
+            self.snapshot.index.get(market)
+        self.books._ensure_capacity(len(self.snapshot.index))
+        if self.use_stream:
+            self.stream = UpbitOrderbookStream(self.markets, self.books, url=self.stream_url).start()
+            if not self.stream.wait_ready(timeout=10):
+                print("⚠️ 订单簿推送暂未收到数据, 将继续等待")
+        if self.diff_render:
+            self.renderer = DiffRenderer(self.col_widths, self.col_aligns).start()
+
+        count = 0
+        try:
+            while cycles is None or count < cycles:
+                start_time = time.time()
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ 获取行情数据失败: {e}")
+                if self.usdt_krw_rate:
+                    self.display(self.compute())
+                count += 1
+
+                elapsed = time.time() - start_time
+                time.sleep(max(0, self.update_interval - elapsed))
+        except KeyboardInterrupt:
+            print("\n🛑 监控已停止")
+        finally:
+            if self.renderer:
+                self.renderer.stop()
+            if self.stream:
+                self.stream.stop()
+            self.fetcher.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Upbit订单簿深度与滑点监控")
+    parser.add_argument("--notional", type=float, default=10000, help="估算滑点的下单金额(USDT)")
+    parser.add_argument("--interval", type=float, default=10, help="更新间隔(秒)")
+    parser.add_argument("--limit", type=int, default=30, help="显示交易量前N个交易对")
+    parser.add_argument("--stream", action="store_true", help="订单簿使用WebSocket推送代替REST轮询")
+    parser.add_argument("--stream-url", default="wss://api.upbit.com/websocket/v1",
+                        help="WebSocket地址(可指向本地替身服务器 upbit_ws_server.py)")
+    args = parser.parse_args()
+
+    OrderbookDepthMonitor(args.notional, args.interval, args.limit, use_stream=args.stream,
+                          stream_url=args.stream_url).run()
+
+
+if __name__ == "__main__":
+    # 安装必要的库: pip install requests numpy websocket-client
+    main()
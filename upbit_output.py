@@ -0,0 +1,155 @@
+import contextlib
+import csv
+import io
+import json
+import socket
+import sys
+import time
+# 无界面输出: 把每轮快照(或只含变化交易对的增量)写为JSON lines/CSV, 目标可为stdout、文件或Unix socket, 不经过任何表格格式化
+
+# 输出字段(数值保持原样, 不做格式化)
+FIELDS = ('market', 'trade_price', 'usdt_price', 'acc_trade_price_24h', 'signed_change_rate', 'timestamp')
+
+
+def open_target(target, buffer_size=64 * 1024):
+    """打开输出目标: "-"为stdout, "unix:/path"为Unix socket, 其余为文件路径(追加)"""
+    if target == "-":
+        return open(sys.stdout.fileno(), 'wb', buffering=buffer_size, closefd=False)
+    if target.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target[5:])
+        stream = sock.makefile('wb', buffering=buffer_size)
+        sock.close()  # makefile持有引用, 关闭stream时才真正关闭连接
+        return stream
+    return open(target, 'ab', buffering=buffer_size)
+
+
+class HeadlessWriter:
+    def __init__(self, target="-", fmt="jsonl", changed_only=False, buffer_size=64 * 1024, flush_interval=1.0):
+        if fmt not in ("jsonl", "csv"):
+            raise ValueError(f"不支持的输出格式: {fmt}")
+        self.target = target
+        self.fmt = fmt
+        self.changed_only = changed_only  # 只输出与上一轮相比有变化的交易对
+        self.flush_interval = flush_interval  # 缓冲写入, 至少每隔flush_interval秒刷新一次
+        self.stream = open_target(target, buffer_size)
+        self.snapshots = 0
+        self.records = 0
+        self._last = {}  # market -> 上次输出的值
+        self._last_flush = time.monotonic()
+        self._text = None
+        self._csv = None
+        if fmt == "csv":
+            self._text = io.TextIOWrapper(self.stream, encoding='utf-8', newline='', write_through=True)
+            self._csv = csv.writer(self._text)
+            if target.startswith("unix:") or target == "-" or self.stream.tell() == 0:
+                self._csv.writerow(('ts',) + FIELDS)
+
+    def _changed(self, rows):
+        last = self._last
+        changed = []
+        for row in rows:
+            values = row[1:]
+            if last.get(row[0]) != values:
+                last[row[0]] = values
+                changed.append(row)
+        return changed
+
+    def write_rows(self, rows, ts=None, usdt_krw=None):
+        """写入一轮行情, rows为FIELDS顺序的元组(usdt_price可为None)"""
+        ts = ts or int(time.time() * 1000)
+        if self.changed_only:
+            rows = self._changed(rows)
+            if not rows:
+                return 0
+        if self.fmt == "jsonl":
+            line = json.dumps({
+                'ts': ts,
+                'usdt_krw': usdt_krw,
+                'delta': self.changed_only,
+                'tickers': [dict(zip(FIELDS, row)) for row in rows],
+            }, separators=(',', ':'))
+            self.stream.write(line.encode('utf-8') + b"\n")
+        else:
+            self._csv.writerows((ts,) + row for row in rows)
+        self.snapshots += 1
+        self.records += len(rows)
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+        return len(rows)
+
+    def write_snapshot(self, tickers, usdt_krw=None, ts=None):
+        """写入Upbit格式的行情(dict或Ticker记录)"""
+        rows = []
+        for t in tickers:
+            get = t.get
+            price = get('trade_price')
+            rows.append((t['market'], price, price / usdt_krw if price is not None and usdt_krw else None,
+                         get('acc_trade_price_24h'), get('signed_change_rate'), get('timestamp')))
+        return self.write_rows(rows, ts, usdt_krw)
+
+    def write_ccxt(self, tickers, usdt_krw=None, ts=None):
+        """写入CCXT fetch_tickers格式的行情 ({symbol: ticker})"""
+        rows = []
+        for symbol, t in tickers.items():
+            price = t.get('last')
+            change = t.get('percentage')
+            market = (t.get('info') or {}).get('market', symbol)
+            rows.append((market, price, price / usdt_krw if price is not None and usdt_krw else None,
+                         t.get('quoteVolume'), change / 100 if change is not None else None, t.get('timestamp')))
+        return self.write_rows(rows, ts, usdt_krw)
+
+    def on_snapshot(self, engine):
+        """MonitorEngine回调: 输出共享快照中的全部交易对"""
+        self.write_snapshot(list(engine.tickers.values()), engine.usdt_krw_price)
+
+    def flush(self):
+        try:
+            if self._text:
+                self._text.flush()
+            self.stream.flush()
+        except BrokenPipeError:
+            pass
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        try:
+            (self._text or self.stream).close()
+        except OSError:
+            pass
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="无界面运行监控, 输出JSON lines或CSV")
+    parser.add_argument("--monitor", choices=["top100", "top15", "ccxt"], default="top15")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--target", default="-", help="- (stdout)、文件路径 或 unix:/path/to.sock")
+    parser.add_argument("--changed-only", action="store_true", help="只输出有变化的交易对")
+    parser.add_argument("--interval", type=float, default=1.0, help="更新间隔(秒)")
+    parser.add_argument("--rest", action="store_true", help="使用REST轮询代替WebSocket推送")
+    args = parser.parse_args()
+
+    output = HeadlessWriter(args.target, args.format, changed_only=args.changed_only)
+    if args.monitor == "ccxt":
+        from upbit_krw_realtime_vol import UpbitKRWMarketMonitor
+        monitor = UpbitKRWMarketMonitor(diff_render=False, output=output)
+    elif args.monitor == "top100":
+        from upbit_all_krw_realtime_1 import UpbitKRWtoUSDTMonitor
+        monitor = UpbitKRWtoUSDTMonitor(use_stream=not args.rest, diff_render=False, output=output)
+    else:
+        from upbit_all_krw_realtime_2 import UpbitKRWtoUSDTMonitor
+        monitor = UpbitKRWtoUSDTMonitor(use_stream=not args.rest, diff_render=False, output=output)
+    monitor.update_interval = args.interval
+    # 数据独占stdout时, 监控自身的提示信息改写到stderr
+    with contextlib.redirect_stdout(sys.stderr if args.target == "-" else sys.stdout):
+        monitor.run()
+
+
+if __name__ == "__main__":
+    # 安装必要的库: pip install requests numpy websocket-client (CCXT监控另需 ccxt)
+    main()
@@ -0,0 +1,175 @@
+import math
+import time
+
+import numpy as np
+from upbit_snapshot import MarketIndex
+# 自适应轮询调度: 按近期价格/成交额活跃度与显示名次为每个交易对分配轮询频率, 在总请求预算内把到期的交易对拼成10个一批
+
+
+class AdaptivePollScheduler:
+    def __init__(self, markets=(), request_rate=None, base_interval=10.0, batch_size=10, min_interval=1.0,
+                 max_interval=60.0, halflife=30.0, capacity=256):
+        self.index = MarketIndex()
+        self.request_rate = request_rate  # 每秒请求数预算
+        self.base_interval = base_interval  # 未指定预算时, 取全部交易对按该间隔固定轮询的请求量
+        self._auto_rate = request_rate is None
+        self.batch_size = batch_size
+        self.min_interval = min_interval  # 最活跃的交易对约每min_interval秒刷新一次
+        self.max_interval = max_interval  # 再冷门的交易对也至少每max_interval秒刷新一次
+        self.halflife = halflife  # 活跃度的指数衰减半衰期(秒)
+        self._alloc(max(capacity, len(markets)))
+        self._tokens = 0.0
+        self._last_plan = None
+        self.polled = 0  # 累计调度的交易对次数
+        self.requests = 0  # 累计调度的批次(请求)数
+        if markets:
+            self.set_markets(markets)
+
+    def _alloc(self, capacity):
+        self.active = np.zeros(capacity, dtype=bool)
+        self.pinned = np.zeros(capacity, dtype=bool)  # 固定按最短间隔刷新(如KRW-USDT)
+        self.next_due = np.zeros(capacity)  # 下次应刷新的时间(monotonic)
+        self.interval = np.full(capacity, self.max_interval)
+        self.last_seen = np.full(capacity, np.nan)  # 上次观测时间
+        self.last_price = np.full(capacity, np.nan)
+        self.last_acc = np.full(capacity, np.nan)  # 上次观测的24h累计成交额
+        self.move_rate = np.zeros(capacity)  # |对数收益|/秒 的指数加权均值
+        self.value_rate = np.zeros(capacity)  # 成交额(KRW)/秒 的指数加权均值
+        self.rank = np.full(capacity, np.inf)  # 在各视图中的最佳显示名次(0起)
+
+    def _ensure_capacity(self, size):
+        capacity = len(self.active)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        old = {name: value for name, value in self.__dict__.items()
+               if isinstance(value, np.ndarray) and len(value) == len(self.active)}
+        self._alloc(capacity)
+        for name, array in old.items():
+            getattr(self, name)[:len(array)] = array
+
+    def set_markets(self, markets):
+        """设置需要轮询的交易对; 新交易对立即到期"""
+        idx = [self.index.get(m) for m in markets]
+        self._ensure_capacity(len(self.index))
+        self.active[:] = False
+        self.active[idx] = True
+        if self._auto_rate:
+            # 总请求量不超过原来的固定间隔轮询
+            self.request_rate = math.ceil(len(idx) / self.batch_size) / self.base_interval
+
+    def pin(self, market):
+        self.pinned[self.index.get(market)] = True
+
+    def set_ranks(self, *rankings):
+        """传入各视图按显示顺序展示的交易对列表, 每个交易对取最佳名次"""
+        n = len(self.index)
+        self.rank[:n] = np.inf
+        for ranked in rankings:
+            for position, market in enumerate(ranked):
+                i = self.index.find(market)
+                if i is not None and position < self.rank[i]:
+                    self.rank[i] = position
+
+    def observe(self, tickers, now=None):
+        """用刚获取的行情更新活跃度"""
+        now = time.monotonic() if now is None else now
+        for ticker in tickers:
+            i = self.index.find(ticker['market'])
+            if i is None:
+                continue
+            price = ticker.get('trade_price')
+            acc = ticker.get('acc_trade_price_24h')
+            seen = self.last_seen[i]
+            if seen == seen and now > seen:
+                dt = now - seen
+                decay = 0.5 ** (dt / self.halflife)
+                move = abs(math.log(price / self.last_price[i])) if price and self.last_price[i] > 0 else 0.0
+                value = max(0.0, acc - self.last_acc[i]) if acc is not None and self.last_acc[i] == self.last_acc[i] else 0.0
+                self.move_rate[i] = decay * self.move_rate[i] + (1 - decay) * move / dt
+                self.value_rate[i] = decay * self.value_rate[i] + (1 - decay) * value / dt
+            self.last_seen[i] = now
+            if price:
+                self.last_price[i] = price
+            if acc is not None:
+                self.last_acc[i] = acc
+
+    def weights(self):
+        """活跃度权重: 均匀底数 + 成交额占比 + 价格波动占比 + 显示名次加成"""
+        n = len(self.index)
+        active = self.active[:n]
+        count = max(int(active.sum()), 1)
+        weights = np.where(active, 1.0 / count, 0.0)
+        for rate in (self.value_rate[:n], self.move_rate[:n]):
+            total = rate[active].sum()
+            if total > 0:
+                weights += np.where(active, rate / total, 0.0)
+        rank = self.rank[:n]
+        bonus = np.where(active & np.isfinite(rank), 1.0 / (rank + 1), 0.0)
+        if bonus.sum() > 0:
+            weights += bonus / bonus.sum()
+        return weights
+
+    def update_intervals(self):
+        """按权重分配轮询频率: 总频率受请求预算约束, 单个交易对限制在[min_interval, max_interval]内"""
+        n = len(self.index)
+        active = self.active[:n]
+        budget = self.request_rate * self.batch_size  # 每秒可刷新的交易对数
+        low, high = 1.0 / self.max_interval, 1.0 / self.min_interval
+        weights = self.weights()
+        frequency = np.where(active, low, 0.0)
+        fixed = self.pinned[:n] & active
+        frequency[fixed] = high
+        free = active & ~fixed
+        # 注水法: 按权重分配剩余预算, 超过上限的交易对封顶后把多余部分再分给其他交易对
+        for _ in range(10):
+            remaining = budget - frequency[~free].sum()
+            total = weights[free].sum()
+            if remaining <= 0 or total <= 0:
+                frequency[free] = low
+                break
+            frequency[free] = np.clip(remaining * weights[free] / total, low, high)
+            capped = free & (frequency >= high)
+            if not capped.any() or abs(frequency[active].sum() - budget) < 1e-9:
+                break
+            free &= ~capped
+        interval = self.interval[:n]
+        interval[active] = 1.0 / frequency[active]
+        return interval
+
+    def plan(self, now=None):
+        """返回本次应刷新的批次(每批不超过batch_size个交易对)并登记下次到期时间"""
+        now = time.monotonic() if now is None else now
+        if self._last_plan is not None:
+            burst = max(1.0, self.request_rate * self.min_interval)
+            self._tokens = min(burst, self._tokens + (now - self._last_plan) * self.request_rate)
+        else:
+            self._tokens = max(1.0, self.request_rate * self.min_interval)
+        self._last_plan = now
+
+        n = len(self.index)
+        interval = self.update_intervals()
+        active = self.active[:n]
+        next_due = self.next_due[:n]
+        due = np.flatnonzero(active & (next_due <= now))
+        if not len(due) or self._tokens < 1:
+            return []
+        # 逾期越久(相对自身间隔)越优先
+        overdue = (now - next_due[due]) / interval[due]
+        due = due[np.argsort(-overdue, kind='stable')]
+        batches = min(int(self._tokens), math.ceil(len(due) / self.batch_size))
+        selected = list(due[:batches * self.batch_size])
+        free = batches * self.batch_size - len(selected)
+        if free > 0:
+            # 最后一批未满时顺带刷新即将到期的交易对, 不增加请求数
+            upcoming = np.flatnonzero(active & (next_due > now))
+            upcoming = upcoming[np.argsort(next_due[upcoming], kind='stable')][:free]
+            selected += list(upcoming)
+        selected = np.array(selected, dtype=np.intp)
+        self.next_due[selected] = now + interval[selected]
+        self._tokens -= batches
+        self.requests += batches
+        self.polled += len(selected)
+        markets = [self.index.markets[i] for i in selected]
+        return [markets[k:k + self.batch_size] for k in range(0, len(markets), self.batch_size)]
@@ -0,0 +1,87 @@
+from upbit_alerts import build_alert_engine
+from upbit_engine import VIEWS, MonitorEngine, MonitorView, _fmt, _short
+from upbit_forex import ForexRateCache
+# 泡菜溢价: USDT/KRW相对USD/KRW的溢价, 以及按USD/KRW换算的各交易对公允美元价格(汇率走缓存, 每轮不增加HTTP请求)
+
+
+class KimchiPremium:
+    def __init__(self, forex=None):
+        self.forex = forex or ForexRateCache()
+        self.usdt_krw = None
+        self.premium = None  # 溢价(小数, 0.02 = 2%)
+
+    @property
+    def usd_krw(self):
+        return self.forex.rate
+
+    def update(self, usdt_krw):
+        """按最新USDT/KRW重新计算溢价 (汇率缓存未过期时不发请求)"""
+        usd_krw = self.forex.get_rate()
+        self.usdt_krw = usdt_krw
+        self.premium = usdt_krw / usd_krw - 1 if usdt_krw and usd_krw else None
+        return self.premium
+
+    def on_snapshot(self, engine):
+        """MonitorEngine回调: 每轮采集后更新溢价"""
+        self.update(engine.usdt_krw_price)
+
+    def fair_usd(self, krw_prices):
+        """按USD/KRW换算的公允美元价格 (支持标量或NumPy数组)"""
+        if not self.usd_krw:
+            return None
+        return krw_prices / self.usd_krw
+
+    def status_line(self):
+        if self.premium is None:
+            return "🥬 泡菜溢价: 等待汇率"
+        published = f" (汇率发布于{self.forex.published})" if self.forex.published else ""
+        return (f"🥬 泡菜溢价: {self.premium * 100:+.2f}% | 1 USDT = {self.usdt_krw:,.1f} KRW | "
+                f"1 USD = {self.usd_krw:,.2f} KRW{published}")
+
+
+def premium_view(premium, limit=None):
+    """按24h交易额排序的全部KRW交易对(limit限制显示数量), 同时显示USDT价格与公允USD价格"""
+
+    def row(item, ticker):
+        fair = premium.fair_usd(item['krw_price']) if item['krw_price'] is not None else None
+        return [_short(item), _fmt(item['krw_price'], ',.0f'), _fmt(item['usdt_price'], ',.4f'),
+                _fmt(fair, ',.4f'), _fmt(item['change'], '+.2f') + ('%' if item['change'] is not None else '')]
+
+    return MonitorView(
+        "premium", lambda engine: premium.status_line(),
+        ["交易对", "KRW价格", "USDT价格", "公允USD价格", "24h涨跌"], [10, 15, 15, 15, 10],
+        row, sort="volume", limit=limit,
+    )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Upbit泡菜溢价监控")
+    parser.add_argument("--limit", type=int, help="只显示交易量前N个交易对(默认全部)")
+    parser.add_argument("--views", default="", help=f"同时显示的其他视图, 可选: {','.join(VIEWS)}")
+    parser.add_argument("--interval", type=float, default=5, help="采集与刷新间隔(秒)")
+    parser.add_argument("--rest", action="store_true", help="使用REST轮询代替WebSocket推送")
+    parser.add_argument("--alerts", help="按默认规则(含溢价区间)告警, 追加写入该JSON lines文件")
+    parser.add_argument("--webhook", help="告警同时POST到该地址")
+    args = parser.parse_args()
+
+    premium = KimchiPremium()
+    engine = MonitorEngine(update_interval=args.interval, use_stream=not args.rest)
+    engine.add_listener(premium.on_snapshot)
+    alerts = build_alert_engine(args.alerts, args.webhook, interval=args.interval)
+    if alerts:
+        # 在溢价更新之后求值
+        engine.add_listener(lambda e: alerts.on_snapshot(e, premium))
+    engine.add_view(premium_view(premium, args.limit))
+    for name in filter(None, args.views.split(",")):
+        engine.add_view(VIEWS[name.strip()]())
+    try:
+        engine.run()
+    finally:
+        premium.forex.close()
+
+
+if __name__ == "__main__":
+    # 安装必要的库: pip install requests numpy websocket-client
+    main()
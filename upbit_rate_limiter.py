@@ -0,0 +1,146 @@
+import threading
+import time
+# Upbit自适应限速: 按接口组令牌桶限速, 并根据Remaining-Req响应头与429自动调整
+
+# Quotation API各接口组默认每秒10次
+DEFAULT_RATES = {
+    'market': 10,
+    'ticker': 10,
+    'orderbook': 10,
+    'candle': 10,
+    'trades': 10,
+    'default': 10,
+}
+
+GROUP_BY_PATH = {
+    '/v1/market/all': 'market',
+    '/v1/ticker': 'ticker',
+    '/v1/orderbook': 'orderbook',
+    '/v1/trades/ticks': 'trades',
+}
+
+
+def parse_remaining_req(value):
+    """解析 Remaining-Req: group=ticker; min=1800; sec=29 → ('ticker', 29, 1800)"""
+    fields = {}
+    for part in value.split(';'):
+        key, _, val = part.strip().partition('=')
+        if key:
+            fields[key.strip()] = val.strip()
+    sec = int(fields['sec']) if fields.get('sec', '').isdigit() else None
+    minute = int(fields['min']) if fields.get('min', '').isdigit() else None
+    return fields.get('group'), sec, minute
+
+
+def group_for_path(path):
+    """根据请求路径推断接口组"""
+    if path in GROUP_BY_PATH:
+        return GROUP_BY_PATH[path]
+    if path.startswith('/v1/candles'):
+        return 'candle'
+    return 'default'
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # 429退避期间不发放令牌
+        self.server_remaining_sec = None
+        self.server_remaining_min = None
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """阻塞直到取得一个令牌, 返回等待时间(秒)"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def observe(self, remaining_sec, remaining_min=None):
+        """用服务端返回的剩余次数校正本地令牌"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if remaining_sec is not None:
+                self.server_remaining_sec = remaining_sec
+                self.tokens = min(self.tokens, remaining_sec)
+            if remaining_min is not None:
+                self.server_remaining_min = remaining_min
+                if remaining_min == 0:
+                    # 分钟额度用尽时暂停到下一分钟
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + 60 - time.time() % 60)
+
+    def block(self, seconds):
+        """暂停发放令牌"""
+        with self._lock:
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class UpbitRateLimiter:
+    def __init__(self, rates=None, backoff_base=0.5, max_backoff=30):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.throttled = 0  # 累计收到的429次数
+        self._buckets = {}
+        self._backoff = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, group):
+        with self._lock:
+            if group not in self._buckets:
+                self._buckets[group] = TokenBucket(self.rates.get(group, self.rates['default']))
+            return self._buckets[group]
+
+    def acquire(self, group):
+        """请求前调用, 按接口组限速"""
+        return self.bucket(group).acquire()
+
+    def update(self, group, response):
+        """请求后调用, 根据响应头与状态码调整速率, 返回建议的重试等待时间(无需重试返回None)"""
+        header = response.headers.get('Remaining-Req')
+        if header:
+            header_group, sec, minute = parse_remaining_req(header)
+            # 以服务端实际的接口组为准
+            self.bucket(header_group or group).observe(sec, minute)
+
+        if response.status_code in (429, 418):
+            self.throttled += 1
+            with self._lock:
+                backoff = min(self._backoff.get(group, self.backoff_base / 2) * 2, self.max_backoff)
+                self._backoff[group] = backoff
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                backoff = max(backoff, int(retry_after))
+            self.bucket(group).block(backoff)
+            return backoff
+
+        with self._lock:
+            self._backoff.pop(group, None)
+        return None
+
+    def remaining(self, group):
+        """当前剩余额度: 本地令牌数与服务端返回的秒/分钟剩余次数"""
+        bucket = self.bucket(group)
+        with bucket._lock:
+            bucket._refill(time.monotonic())
+            return {
+                'tokens': bucket.tokens,
+                'sec': bucket.server_remaining_sec,
+                'min': bucket.server_remaining_min,
+                'blocked': max(0.0, bucket.blocked_until - time.monotonic()),
+            }
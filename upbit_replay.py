@@ -0,0 +1,203 @@
+import json
+import os
+import time
+# 离线回放: 用记录的行情驱动监控的 fetch → process → display 流程, 支持实时速度或尽可能快
+
+
+def iter_jsonl_events(path):
+    """读取JSON lines记录: 每行为 {"ts": 毫秒, "tickers": [...]} 快照, 或单条ticker"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if 'tickers' in item:
+                yield item.get('ts', 0), item['tickers'], True
+            else:
+                if 'market' not in item and 'code' in item:
+                    item['market'] = item['code']
+                yield item.get('timestamp', 0), [item], False
+
+
+def iter_binary_events(directory):
+    """读取TickRecorder的二进制分段"""
+    from upbit_tick_recorder import TickReader
+
+    reader = TickReader(directory)
+    try:
+        for name in reader.segment_names():
+            records = reader.segment(name)
+            # 分块转换, 避免一次把整个分段展开为Python对象
+            for start in range(0, len(records), 4096):
+                for market_id, ts, price, acc, change in records[start:start + 4096].tolist():
+                    yield ts, [{
+                        'market': reader.markets[market_id],
+                        'timestamp': ts,
+                        'trade_price': price,
+                        'acc_trade_price_24h': acc,
+                        'signed_change_rate': change,
+                    }], False
+            del records
+    finally:
+        reader.close()
+
+
+def scan_markets(path):
+    """预扫描记录中出现过的交易对(按首次出现顺序)"""
+    if os.path.isdir(path):
+        with open(os.path.join(path, "markets.json"), encoding='utf-8') as f:
+            return json.load(f)
+    seen = {}
+    for _, tickers, _ in iter_jsonl_events(path):
+        for ticker in tickers:
+            seen.setdefault(ticker['market'], None)
+    return list(seen)
+
+
+class ReplaySource:
+    """与行情流相同的 fetch_tickers 接口: 每调用一次推进一个回放步长
+
+    快照记录每步消费一条快照; 逐条记录每步推进step秒(记录时间)
+    speed=None表示尽可能快, 否则按记录时间的speed倍速回放
+    """
+
+    def __init__(self, path, speed=None, step=1.0):
+        self.path = path
+        self.speed = speed
+        self.step_ms = int(step * 1000)
+        self.markets = scan_markets(path)
+        self.tickers = {}
+        self.exhausted = False
+        self.cycles = 0
+        self.events = 0
+
+        self._events = iter_binary_events(path) if os.path.isdir(path) else iter_jsonl_events(path)
+        self._next = next(self._events, None)
+        self._clock = None  # 当前回放到的记录时间(毫秒)
+        self._wall_start = None
+        self._rec_start = None
+
+    def _apply(self, tickers):
+        for ticker in tickers:
+            self.tickers[ticker['market']] = ticker
+            self.events += 1
+
+    def advance(self):
+        """推进一个步长, 返回是否还有数据"""
+        if self._next is None:
+            self.exhausted = True
+            return False
+        ts, tickers, is_snapshot = self._next
+        if self._clock is None:
+            self._clock = ts
+            self._rec_start = ts
+            self._wall_start = time.monotonic()
+
+        if is_snapshot:
+            self._apply(tickers)
+            self._clock = ts
+            self._next = next(self._events, None)
+        else:
+            self._clock += self.step_ms
+            while self._next is not None and self._next[0] <= self._clock:
+                self._apply(self._next[1])
+                self._next = next(self._events, None)
+
+        if self.speed:
+            # 按记录时间的间隔等待
+            due = self._wall_start + (self._clock - self._rec_start) / 1000 / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.cycles += 1
+        return True
+
+    def fetch_tickers(self, markets):
+        """推进一步并按给定顺序返回最新行情"""
+        if not self.advance():
+            return []
+        return [self.tickers[m] for m in markets if m in self.tickers]
+
+
+class ReplayExchange:
+    """模拟CCXT交易所接口, 供基于CCXT的监控回放"""
+
+    def __init__(self, source):
+        self.source = source
+        self.markets = {}
+
+    @staticmethod
+    def to_symbol(market_id):
+        quote, base = market_id.split('-', 1)
+        return f"{base}/{quote}"
+
+    def load_markets(self, reload=False):
+        self.markets = {
+            self.to_symbol(m): {'id': m, 'symbol': self.to_symbol(m), 'quote': m.split('-', 1)[0]}
+            for m in self.source.markets
+        }
+        return self.markets
+
+    @property
+    def exhausted(self):
+        return self.source.exhausted
+
+    @property
+    def symbols(self):
+        return list(self.markets)
+
+    def _to_ccxt(self, ticker):
+        return {
+            'symbol': self.to_symbol(ticker['market']),
+            'timestamp': ticker.get('timestamp'),
+            'last': ticker.get('trade_price'),
+            'quoteVolume': ticker.get('acc_trade_price_24h'),
+            'percentage': (ticker.get('signed_change_rate') or 0) * 100,
+            'info': ticker,
+        }
+
+    def fetch_tickers(self, symbols=None):
+        ids = [self.markets[s]['id'] for s in symbols if s in self.markets] if symbols else self.source.markets
+        return {self.to_symbol(t['market']): self._to_ccxt(t) for t in self.source.fetch_tickers(ids)}
+
+    def fetch_ticker(self, symbol):
+        ticker = self.source.tickers.get(self.markets[symbol]['id'])
+        return self._to_ccxt(ticker) if ticker else {'symbol': symbol, 'last': None}
+
+    def close(self):
+        pass
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="用记录的行情离线回放监控")
+    parser.add_argument("path", help="JSON lines文件或TickRecorder目录")
+    parser.add_argument("--monitor", choices=["top100", "top15", "ccxt"], default="top15")
+    parser.add_argument("--speed", default="max", help="max 或 回放倍速(1为实时)")
+    parser.add_argument("--step", type=float, default=1.0, help="逐条记录每个周期推进的记录时间(秒)")
+    args = parser.parse_args()
+
+    speed = None if args.speed == "max" else float(args.speed)
+    source = ReplaySource(args.path, speed=speed, step=args.step)
+    if args.monitor == "ccxt":
+        from upbit_krw_realtime_vol import UpbitKRWMarketMonitor
+        monitor = UpbitKRWMarketMonitor(exchange=ReplayExchange(source))
+    elif args.monitor == "top100":
+        from upbit_all_krw_realtime_1 import UpbitKRWtoUSDTMonitor
+        monitor = UpbitKRWtoUSDTMonitor(replay=source)
+    else:
+        from upbit_all_krw_realtime_2 import UpbitKRWtoUSDTMonitor
+        monitor = UpbitKRWtoUSDTMonitor(replay=source)
+    monitor.update_interval = 0  # 节奏由回放源控制
+
+    start_time = time.time()
+    monitor.run()
+    elapsed = time.time() - start_time
+    print(f"\n📼 回放完成: {source.cycles}个周期, {source.events}条行情, 用时{elapsed:.2f}秒")
+    if elapsed > 0:
+        print(f"⚡ 吞吐: {source.cycles / elapsed:,.1f} 周期/秒, {source.events / elapsed:,.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import random
+import time
+
+from upbit_fetcher import UpbitTickerFetcher
+from upbit_metrics import FETCH_CYCLE
+# 容错行情获取: 逐批保留结果, 只重试失败的批次(带抖动的指数退避), 按交易对熔断, 失败的交易对以上次成功的行情代替并标记过期
+
+
+class CircuitBreaker:
+    """单个交易对的熔断器: 连续失败failure_threshold次后打开, 冷却reset_timeout秒后放行一次探测请求"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=30, max_reset_timeout=600):
+        self.failure_threshold = failure_threshold
+        self.base_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout  # 探测仍失败时加倍
+        self.failures = 0
+        self.opened_at = None
+
+    def state(self, now=None):
+        if self.opened_at is None:
+            return "closed"
+        now = time.monotonic() if now is None else now
+        return "open" if now - self.opened_at < self.reset_timeout else "half_open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.reset_timeout = self.base_timeout
+
+    def record_failure(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        if self.opened_at is not None:
+            # 半开状态下的探测失败: 重新打开, 冷却时间加倍
+            self.opened_at = now
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+        elif self.failures >= self.failure_threshold:
+            self.opened_at = now
+
+
+def _is_client_error(error):
+    """4xx(如批次中含已下架的交易对)重试无效, 应拆分批次定位问题交易对"""
+    response = getattr(error, 'response', None)
+    return response is not None and 400 <= response.status_code < 500
+
+
+class ResilientTickerFetcher(UpbitTickerFetcher):
+    def __init__(self, *args, batch_retries=2, retry_base=0.2, retry_budget=2.0,
+                 failure_threshold=3, reset_timeout=30, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_retries = batch_retries  # 失败批次的最多重试次数
+        self.retry_base = retry_base  # 退避基数(秒), 第k次重试等待 uniform(0, retry_base * 2^k)
+        self.retry_budget = retry_budget  # 每轮用于重试的总时间上限(秒), 超出后改用过期数据
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}  # market -> CircuitBreaker
+        self.last_good = {}  # market -> (ticker, 获取时间)
+        self.stale = {}  # 本轮以过期数据代替的交易对 -> 数据年龄(秒)
+        self.failed_batches = 0  # 累计失败的批次请求数
+
+    def breaker(self, market):
+        breaker = self.breakers.get(market)
+        if breaker is None:
+            breaker = self.breakers[market] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def open_markets(self):
+        """当前处于熔断状态的交易对"""
+        now = time.monotonic()
+        return [m for m, b in self.breakers.items() if b.state(now) != "closed"]
+
+    def _try_batch(self, batch):
+        try:
+            return self.fetch_batch(batch)
+        except Exception as e:
+            return e
+
+    def fetch_tickers(self, markets):
+        """获取全部交易对的ticker, 单个批次失败不影响其他批次
+
+        熔断中的交易对不参与请求, 冷却后单独探测, 以免拖累同批的正常交易对;
+        所有交易对都没有任何可用数据时才抛出异常
+        """
+        start_time = time.time()
+        now = time.monotonic()
+        healthy, probes = [], []
+        for market in markets:
+            state = self.breaker(market).state(now)
+            if state == "closed":
+                healthy.append(market)
+            elif state == "half_open":
+                probes.append(market)
+
+        results = {}
+        last_error = None
+        pending = self.make_batches(healthy) + [[m] for m in probes]
+        attempt = 0
+        deadline = start_time + self.retry_budget
+        while pending:
+            outcomes = list(self.executor.map(self._try_batch, pending)) if len(pending) > 1 \
+                else [self._try_batch(pending[0])]
+            retry = []
+            backoff = False
+            for batch, outcome in zip(pending, outcomes):
+                if not isinstance(outcome, Exception):
+                    for item in outcome:
+                        results[item['market']] = item
+                    continue
+                self.failed_batches += 1
+                last_error = outcome
+                if _is_client_error(outcome):
+                    if len(batch) > 1:
+                        # 二分拆批, 把问题交易对隔离到单独的请求中
+                        half = len(batch) // 2
+                        retry += [batch[:half], batch[half:]]
+                elif attempt < self.batch_retries:
+                    retry.append(batch)
+                    backoff = True
+            remaining = deadline - time.time()
+            if not retry or remaining <= 0:
+                break
+            if backoff:
+                time.sleep(min(random.uniform(0, self.retry_base * 2 ** attempt), remaining))
+                attempt += 1
+            pending = retry
+
+        fetched_at = time.time()
+        requested = set(healthy).union(probes)
+        self.stale = {}
+        data = []
+        for market in markets:
+            ticker = results.get(market)
+            if ticker is not None:
+                self.breaker(market).record_success()
+                self.last_good[market] = (ticker, fetched_at)
+                data.append(ticker)
+                continue
+            if market in requested:
+                self.breaker(market).record_failure(now)
+            cached = self.last_good.get(market)
+            if cached:
+                self.stale[market] = fetched_at - cached[1]
+                data.append(cached[0])
+
+        self.last_cycle_time = time.time() - start_time
+        FETCH_CYCLE.observe(self.last_cycle_time)
+        if not data and last_error is not None:
+            raise last_error
+        return data
+
+    def forget(self, markets):
+        """移除已下架交易对的熔断与缓存状态"""
+        for market in markets:
+            self.breakers.pop(market, None)
+            self.last_good.pop(market, None)
@@ -0,0 +1,377 @@
+import os
+import tempfile
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+# 共享内存快照: 一个发布进程把全部KRW行情写入固定布局的共享内存块(顺序锁头), 本机任意多个读进程无网络请求、无拷贝地读取一致快照
+
+DEFAULT_NAME = "upbit_krw_snapshot"
+MAGIC = 0x55504254  # "UPBT"
+VERSION = 2
+NAME_SIZE = 24  # 交易对代码的定长字节数
+
+HEADER = np.dtype([
+    ('magic', '<u4'),
+    ('version', '<u4'),
+    ('seq', '<u8'),  # 顺序锁: 奇数表示正在写入
+    ('capacity', '<u4'),
+    ('count', '<u4'),  # 已登记的交易对数
+    ('generation', '<u8'),  # 交易对列表变化时递增, 读端据此刷新缓存的代码表
+    ('updated', '<i8'),  # 发布时间(毫秒); 发布端启动时即写入, 表示已有进程负责采集
+    ('usdt_krw', '<f8'),
+    ('owner', '<i8'),  # 发布进程的PID, 只有它可以删除内存块
+])
+
+# 固定布局: 头部之后依次为代码表与各列(MarketSnapshot的列, 以及取自原始行情的高低价与成交量, 按交易对下标对齐)
+COLUMNS = (
+    ('price', '<f8'),
+    ('volume', '<f8'),
+    ('change', '<f8'),
+    ('timestamp', '<i8'),
+    ('valid', '?'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('acc_volume', '<f8'),
+)
+
+# 只来自原始行情的列: 列名 -> Upbit字段
+TICKER_COLUMNS = (
+    ('high', 'high_price'),
+    ('low', 'low_price'),
+    ('acc_volume', 'acc_trade_volume_24h'),
+)
+
+
+def _layout(capacity):
+    """返回各段的 (名称, dtype, 偏移, 元素数) 与总大小"""
+    fields = [('header', HEADER, 0, 1), ('names', np.dtype(f'S{NAME_SIZE}'), HEADER.itemsize, capacity)]
+    offset = HEADER.itemsize + NAME_SIZE * capacity
+    for name, dtype in COLUMNS:
+        dtype = np.dtype(dtype)
+        offset += -offset % 8
+        fields.append((name, dtype, offset, capacity))
+        offset += dtype.itemsize * capacity
+    return fields, offset
+
+
+def _map(buf, capacity):
+    """在共享内存上建立各段的NumPy视图(不拷贝)"""
+    fields, _ = _layout(capacity)
+    return {name: np.ndarray((count,), dtype=dtype, buffer=buf, offset=offset)
+            for name, dtype, offset, count in fields}
+
+
+def _lock_path(name):
+    return os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+
+def _try_lock(name):
+    """非阻塞地独占发布锁, 返回持有锁的文件; 锁已被其他存活进程持有时返回None
+
+    锁随进程退出由系统释放, 因此持锁即说明发布进程存活(与内存块是否遗留无关)
+    """
+    f = open(_lock_path(name), 'a+b')
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def publisher_alive(name=DEFAULT_NAME):
+    """是否有存活的进程持有name的发布锁"""
+    lock = _try_lock(name)
+    if lock is None:
+        return True
+    lock.close()
+    return False
+
+
+class SharedSnapshotPublisher:
+    def __init__(self, name=DEFAULT_NAME, capacity=1024):
+        # 先取得发布锁: 同一名称只能有一个发布进程, 遗留的内存块只在原发布进程已退出时复用
+        self._lock = _try_lock(name)
+        if self._lock is None:
+            raise FileExistsError(f"共享快照 {name} 已有存活的发布进程")
+        _, size = _layout(capacity)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 上一个发布进程异常退出后遗留的内存块: 布局足够则直接复用, 否则删除后重建(已附加的读端仍持有旧映射)
+            self.shm = shared_memory.SharedMemory(name=name)
+            if self.shm.size < size:
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = name
+        self.capacity = capacity
+        self.views = _map(self.shm.buf, capacity)
+        header = self.views['header']
+        header['seq'] = header['seq'][0] + (header['seq'][0] & 1) + 1  # 复用时清除未完成的写入标记, 并进入写入
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['capacity'] = capacity
+        header['count'] = 0
+        header['generation'] += 1  # 复用时交易对下标可能不同, 读端需重读代码表
+        header['owner'] = os.getpid()
+        header['updated'] = int(time.time() * 1000)  # 开始采集前即标记存活, 启动中的发布端不会被当作已退出
+        header['usdt_krw'] = np.nan
+        header['seq'] += 1
+        self.published = 0
+        self._warned = False
+
+    def publish(self, snapshot, usdt_krw=None, now_ms=None, tickers=None):
+        """写入一个MarketSnapshot (只追加新的交易对代码, 各列整段覆盖)
+
+        tickers为 market -> 原始行情, 用于填充快照中没有的高低价与成交量列; 缺省时这些列为NaN
+        """
+        v = self.views
+        header = v['header']
+        n = len(snapshot.index)
+        if n > self.capacity:
+            if not self._warned:
+                print(f"⚠️ 共享内存容量不足({self.capacity}), 超出的{n - self.capacity}个交易对不发布")
+                self._warned = True
+            n = self.capacity
+        count = int(header['count'][0])
+
+        header['seq'] += 1  # 进入写入(奇数)
+        if n > count:
+            v['names'][count:n] = [m.encode()[:NAME_SIZE] for m in snapshot.index.markets[count:n]]
+            header['count'] = n
+            header['generation'] += 1
+        v['price'][:n] = snapshot.price[:n]
+        v['volume'][:n] = snapshot.volume[:n]
+        v['change'][:n] = snapshot.change[:n]
+        v['timestamp'][:n] = snapshot.timestamp[:n]
+        v['valid'][:n] = snapshot.valid[:n]
+        for column, field in TICKER_COLUMNS:
+            values = v[column]
+            values[:n] = np.nan
+            if tickers:
+                for i, market in enumerate(snapshot.index.markets[:n]):
+                    value = (tickers.get(market) or {}).get(field)
+                    if value is not None:
+                        values[i] = value
+        header['updated'] = now_ms or int(time.time() * 1000)
+        header['usdt_krw'] = usdt_krw or np.nan
+        header['seq'] += 1  # 写入完成(偶数)
+        self.published += 1
+
+    def on_snapshot(self, engine):
+        """MonitorEngine回调: 每轮采集后发布共享快照"""
+        self.publish(engine.snapshot, engine.usdt_krw_price, tickers=engine.tickers)
+
+    def close(self, unlink=True):
+        if self.views is None:
+            return
+        owner = int(self.views['header']['owner'][0]) == os.getpid()
+        self.views = None
+        self.shm.close()
+        if unlink and owner:  # 只有发布进程本身可以删除内存块
+            self.shm.unlink()
+        self._lock.close()
+
+
+def _attach(name):
+    """只读端附加共享内存, 不登记到resource_tracker (否则读进程退出时会删除发布者的内存块)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedSnapshotReader:
+    """与ReplaySource相同的 markets / fetch_tickers 接口, 可直接驱动现有监控
+
+    读取基于顺序锁: 先读seq(奇数则等待), 读数据, 再读seq, 两次相同才说明读到的是一致快照
+    """
+
+    def __init__(self, name=DEFAULT_NAME, max_spins=10000, max_age=None):
+        self.shm = _attach(name)
+        header = np.ndarray((1,), dtype=HEADER, buffer=self.shm.buf)
+        if header['magic'][0] != MAGIC or header['version'][0] != VERSION:
+            self.shm.close()
+            raise ValueError(f"共享内存 {name} 不是行情快照")
+        self.name = name
+        self.views = _map(self.shm.buf, int(header['capacity'][0]))
+        self.max_spins = max_spins
+        self.max_age = max_age  # 设置后, 超过max_age秒未更新且发布进程已退出时视为结束(exhausted), 由调用方接管采集
+        self.exhausted = False  # 与回放源接口一致
+        self.retries = 0  # 因并发写入而重读的次数
+        self._generation = None
+        self._markets = []
+
+    def consistent(self, read):
+        """以各段视图调用read(views), 直到期间没有发生写入, 返回其结果
+
+        read应只读取并返回需要的值(如np.take或计算结果); 视图本身会被后续写入修改
+        """
+        header = self.views['header']
+        for _ in range(self.max_spins):
+            seq = header['seq'][0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            result = read(self.views)
+            if header['seq'][0] == seq:
+                return result
+            self.retries += 1
+        raise TimeoutError("共享快照持续写入中, 读取超时")
+
+    @property
+    def age(self):
+        """距发布端最近一次写入的秒数(从未写入为inf)"""
+        updated = int(self.views['header']['updated'][0])
+        return time.time() - updated / 1000 if updated else float('inf')
+
+    def check_publisher(self):
+        """发布端停止更新且已退出时标记exhausted, 返回是否仍可读取"""
+        if self.max_age is not None and self.age > self.max_age and not publisher_alive(self.name):
+            self.exhausted = True
+        return not self.exhausted
+
+    @property
+    def seq(self):
+        return int(self.views['header']['seq'][0])
+
+    @property
+    def markets(self):
+        """已发布的交易对代码(按发布端的下标顺序)"""
+        generation = self.consistent(lambda v: int(v['header']['generation'][0]))
+        if generation != self._generation:
+            generation, names = self.consistent(
+                lambda v: (int(v['header']['generation'][0]), v['names'][:int(v['header']['count'][0])].copy()))
+            self._markets = [n.decode() for n in names]
+            self._generation = generation
+        return self._markets
+
+    def read(self):
+        """读取一份一致的快照, 返回 (usdt_krw, 各列数组)"""
+        def copy(v):
+            n = int(v['header']['count'][0])
+            return float(v['header']['usdt_krw'][0]), {name: v[name][:n].copy() for name, _ in COLUMNS}
+
+        return self.consistent(copy)
+
+    @property
+    def usdt_krw(self):
+        value = self.consistent(lambda v: float(v['header']['usdt_krw'][0]))
+        return None if value != value else value
+
+    @property
+    def tickers(self):
+        markets = self.markets
+        return {t['market']: t for t in self._to_tickers(markets, *self.read())}
+
+    @staticmethod
+    def _to_tickers(markets, usdt_krw, columns):
+        tickers = []
+        for i, market in enumerate(markets[:len(columns['price'])]):
+            if not columns['valid'][i]:
+                continue
+            ticker = {
+                'market': market,
+                'trade_price': float(columns['price'][i]),
+                'acc_trade_price_24h': float(columns['volume'][i]),
+                'signed_change_rate': float(columns['change'][i]),
+                'timestamp': int(columns['timestamp'][i]),
+            }
+            for column, field in TICKER_COLUMNS:
+                value = float(columns[column][i])
+                ticker[field] = None if value != value else value
+            tickers.append(ticker)
+        return tickers
+
+    def fetch_tickers(self, markets):
+        """按给定顺序返回最新行情(Upbit格式), 不发起任何网络请求; 发布端已退出时返回空列表并标记exhausted"""
+        if not self.check_publisher():
+            return []
+        by_market = {t['market']: t for t in self._to_tickers(self.markets, *self.read())}
+        return [by_market[m] for m in markets if m in by_market]
+
+    def close(self):
+        self.views = None
+        self.shm.close()
+
+
+def attach_live(name=DEFAULT_NAME, max_age=30.0):
+    """附加到仍在发布的共享快照; 不存在或发布端已退出时返回None
+
+    返回的读端在运行中发现发布端超过max_age秒未更新且已退出时标记exhausted, 调用方应改为自己采集
+    """
+    try:
+        reader = SharedSnapshotReader(name, max_age=max_age)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not reader.check_publisher():
+        reader.close()
+        return None
+    return reader
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="共享内存行情快照: 发布端采集一次, 本机多个监控进程读取")
+    parser.add_argument("mode", choices=["publish", "read"])
+    parser.add_argument("--name", default=DEFAULT_NAME, help="共享内存块名称")
+    parser.add_argument("--monitor", choices=["top100", "top15", "ccxt"], default="top15", help="read模式下运行的监控")
+    parser.add_argument("--interval", type=float, default=1, help="采集(发布端)或刷新(读端)间隔(秒)")
+    parser.add_argument("--rest", action="store_true", help="发布端使用REST轮询代替WebSocket推送")
+    args = parser.parse_args()
+
+    if args.mode == "publish":
+        from upbit_engine import MonitorEngine
+
+        try:
+            publisher = SharedSnapshotPublisher(args.name)
+        except FileExistsError as e:
+            print(f"⚠️ 无法发布共享快照: {e}")
+            return
+        engine = MonitorEngine(update_interval=args.interval, use_stream=not args.rest, diff_render=False)
+        engine.add_listener(publisher.on_snapshot)
+        print(f"📡 共享快照发布到: {args.name}")
+        try:
+            engine.run()
+        finally:
+            publisher.close()
+        return
+
+    reader = SharedSnapshotReader(args.name)
+    if args.monitor == "ccxt":
+        from upbit_krw_realtime_vol import UpbitKRWMarketMonitor
+        from upbit_replay import ReplayExchange
+        monitor = UpbitKRWMarketMonitor(exchange=ReplayExchange(reader))
+    elif args.monitor == "top100":
+        from upbit_all_krw_realtime_1 import UpbitKRWtoUSDTMonitor
+        monitor = UpbitKRWtoUSDTMonitor(replay=reader)
+    else:
+        from upbit_all_krw_realtime_2 import UpbitKRWtoUSDTMonitor
+        monitor = UpbitKRWtoUSDTMonitor(replay=reader)
+    monitor.update_interval = args.interval
+    try:
+        monitor.run()
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    # 安装必要的库: pip install requests numpy websocket-client texttable (Python 3.8+)
+    main()
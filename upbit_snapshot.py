@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+# 列式行情快照: 按稳定下标存放价格/24h交易额/涨跌幅, 批量换算计价货币并用argpartition取前N
+
+
+class MarketIndex:
+    """交易对 -> 稳定下标 (只增不减, 下架的交易对保留下标但不再有效)"""
+
+    def __init__(self, markets=()):
+        self.markets = []
+        self._index = {}
+        for market in markets:
+            self.get(market)
+
+    def get(self, market):
+        idx = self._index.get(market)
+        if idx is None:
+            idx = len(self.markets)
+            self._index[market] = idx
+            self.markets.append(market)
+        return idx
+
+    def find(self, market):
+        """查询下标, 不存在返回None"""
+        return self._index.get(market)
+
+    def __len__(self):
+        return len(self.markets)
+
+    def __contains__(self, market):
+        return market in self._index
+
+
+class MarketSnapshot:
+    def __init__(self, index=None, capacity=256):
+        self.index = index if index is not None else MarketIndex()  # 空的共享下标也是假值, 不能用or
+        capacity = max(capacity, len(self.index))
+        self.price = np.full(capacity, np.nan)  # 最新成交价(KRW)
+        self.volume = np.zeros(capacity)  # 24h交易额(KRW)
+        self.change = np.full(capacity, np.nan)  # 24h涨跌幅(小数, 0.01 = 1%)
+        self.timestamp = np.zeros(capacity, dtype=np.int64)  # 行情时间戳(毫秒)
+        self.valid = np.zeros(capacity, dtype=bool)
+
+    def _ensure_capacity(self, size):
+        capacity = len(self.price)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        extra = capacity - len(self.price)
+        self.price = np.concatenate([self.price, np.full(extra, np.nan)])
+        self.volume = np.concatenate([self.volume, np.zeros(extra)])
+        self.change = np.concatenate([self.change, np.full(extra, np.nan)])
+        self.timestamp = np.concatenate([self.timestamp, np.zeros(extra, dtype=np.int64)])
+        self.valid = np.concatenate([self.valid, np.zeros(extra, dtype=bool)])
+
+    def update(self, markets, prices, volumes, changes, timestamps=None, reset=False):
+        """批量写入一组行情; reset=True表示这是一轮完整快照, 未出现的交易对标记为无效"""
+        idx = np.fromiter((self.index.get(m) for m in markets), dtype=np.intp, count=len(markets))
+        self._ensure_capacity(len(self.index))
+        if reset:
+            self.valid[:] = False
+        self.price[idx] = prices
+        self.volume[idx] = volumes
+        self.change[idx] = changes
+        if timestamps is not None:
+            self.timestamp[idx] = timestamps
+        self.valid[idx] = True
+        return idx
+
+    def update_upbit(self, tickers, reset=True):
+        """写入Upbit /v1/ticker 格式的行情"""
+        tickers = [t for t in tickers if t and 'market' in t]
+        return self.update(
+            [t['market'] for t in tickers],
+            [_num(t.get('trade_price')) for t in tickers],
+            [_num(t.get('acc_trade_price_24h'), 0.0) for t in tickers],
+            [_num(t.get('signed_change_rate')) for t in tickers],
+            [t.get('timestamp') or 0 for t in tickers],
+            reset=reset,
+        )
+
+    def update_ccxt(self, tickers, reset=True):
+        """写入CCXT fetch_tickers 格式的行情 (percentage为百分数)"""
+        symbols = list(tickers)
+        return self.update(
+            symbols,
+            [_num(tickers[s].get('last')) for s in symbols],
+            [_num(tickers[s].get('quoteVolume'), 0.0) for s in symbols],
+            [_num(tickers[s].get('percentage')) / 100 for s in symbols],
+            [tickers[s].get('timestamp') or 0 for s in symbols],
+            reset=reset,
+        )
+
+    def convert(self, rate):
+        """按汇率批量换算价格与交易额, 返回 (prices, volumes); 汇率缺失时返回全0"""
+        n = len(self.index)
+        if not rate:
+            return np.zeros(n), np.zeros(n)
+        return self.price[:n] / rate, self.volume[:n] / rate
+
+    def convert_many(self, rates):
+        """同时换算多种计价货币: {'USDT': 1400.0, 'USD': 1380.0} -> {name: (prices, volumes)}"""
+        n = len(self.index)
+        names = list(rates)
+        inv = np.array([1.0 / rates[k] if rates[k] else 0.0 for k in names])[:, None]
+        prices = self.price[:n][None, :] * inv
+        volumes = self.volume[:n][None, :] * inv
+        return {name: (prices[i], volumes[i]) for i, name in enumerate(names)}
+
+    def top_n(self, values, n, descending=True):
+        """返回values最大(或最小)的前n个有效下标, 已按顺序排列"""
+        size = len(self.index)
+        valid = np.flatnonzero(self.valid[:size])
+        if n <= 0 or len(valid) == 0:
+            return valid[:0]
+        keys = np.asarray(values)[valid]
+        keys = np.where(np.isnan(keys), -np.inf if descending else np.inf, keys)
+        if descending:
+            keys = -keys
+        if n < len(valid):
+            part = np.argpartition(keys, n - 1)[:n]
+        else:
+            part = np.arange(len(valid))
+        return valid[part[np.argsort(keys[part], kind='stable')]]
+
+    def to_rows(self, indices, prices, volumes, label=None, missing=None):
+        """把选中的下标转换为显示用的行(dict), 缺失值以missing代替"""
+        rows = []
+        for i in indices:
+            market = self.index.markets[i]
+            rows.append({
+                'market': label(market) if label else market,
+                'krw_price': _opt(self.price[i], missing),
+                'usdt_price': _opt(prices[i], missing),
+                'volume_usdt': _opt(volumes[i], missing),
+                'change': _opt(self.change[i] * 100, missing),
+            })
+        return rows
+
+
+def _num(value, default=math.nan):
+    return default if value is None else float(value)
+
+
+def _opt(value, missing=None):
+    value = float(value)
+    return missing if math.isnan(value) else value
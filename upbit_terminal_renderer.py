@@ -0,0 +1,149 @@
+import sys
+import threading
+import time
+import unicodedata
+
+from upbit_metrics import RENDER_TIME
+# 差分终端渲染: 保留上一帧, 只用光标定位重写变化的单元格, 在独立线程中限帧输出
+
+
+def display_width(text):
+    """终端显示宽度(中日韩全角字符占2列)"""
+    width = 0
+    for ch in text:
+        if unicodedata.combining(ch) or ch == '\ufe0f':
+            continue
+        width += 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+    return width
+
+
+def fit(text, width, align='l'):
+    """按显示宽度截断并填充到固定宽度"""
+    text = str(text)
+    while display_width(text) > width:
+        text = text[:-1]
+    pad = " " * (width - display_width(text))
+    return pad + text if align == 'r' else text + pad
+
+
+class DiffRenderer:
+    """帧为行的列表: 字符串表示整行文本, list/tuple表示按列宽排列的单元格"""
+
+    def __init__(self, widths, aligns=None, max_fps=4, out=None, sep="  "):
+        self.widths = list(widths)
+        self.aligns = list(aligns or ['l'] * len(self.widths))
+        self.min_interval = 1.0 / max_fps  # 两帧之间的最小间隔
+        self.out = out or sys.stdout
+        self.sep = sep
+
+        self.offsets = []  # 每列的起始列号(从0开始)
+        col = 0
+        for width in self.widths:
+            self.offsets.append(col)
+            col += width + len(sep)
+
+        self.frames_rendered = 0
+        self.frames_dropped = 0  # 被更新帧覆盖而未输出的帧
+        self._prev = None
+        self._pending = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def rule(self, char="="):
+        """与表格等宽的分隔线"""
+        return char * (sum(self.widths) + len(self.sep) * (len(self.widths) - 1))
+
+    def format_row(self, cells):
+        return self.sep.join(fit(c, w, a) for c, w, a in zip(cells, self.widths, self.aligns))
+
+    def submit(self, frame):
+        """提交新帧(不阻塞), 渲染线程只输出最新的一帧"""
+        frame = [line if isinstance(line, str) else tuple(str(c) for c in line) for line in frame]
+        with self._cond:
+            if self._pending is not None:
+                self.frames_dropped += 1
+            self._pending = frame
+            self._cond.notify()
+
+    def start(self):
+        self._running = True
+        self.out.write("\033[?25l")  # 隐藏光标
+        self._thread = threading.Thread(target=self._render_loop, name="diff-renderer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止渲染线程, 输出最后一帧并恢复光标"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=2)
+        with self._cond:
+            frame, self._pending = self._pending, None
+        if frame is not None:
+            self.render(frame)
+        self.out.write("\033[?25h")
+        self.out.flush()
+
+    def _render_loop(self):
+        last = 0.0
+        while True:
+            with self._cond:
+                while self._pending is None and self._running:
+                    self._cond.wait()
+                if not self._running:
+                    return
+            # 限制帧率: 等待期间到达的新帧会覆盖旧帧
+            delay = last + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with self._cond:
+                frame, self._pending = self._pending, None
+            if frame is None:
+                continue
+            try:
+                self.render(frame)
+            except OSError:
+                pass
+            last = time.monotonic()
+
+    def render(self, frame):
+        """计算与上一帧的差异并一次性写出"""
+        with RENDER_TIME.time("diff"):
+            self.out.write(self.diff(frame))
+            self.out.flush()
+        self.frames_rendered += 1
+
+    def diff(self, frame):
+        """生成从上一帧变为当前帧所需的终端控制序列"""
+        buf = []
+        prev = self._prev
+        if prev is None:
+            buf.append("\033[H\033[2J")
+            prev = []
+
+        for row, line in enumerate(frame):
+            old = prev[row] if row < len(prev) else None
+            if line == old:
+                continue
+            if isinstance(line, str):
+                buf.append(f"\033[{row + 1};1H{line}\033[K")
+            elif isinstance(old, tuple) and len(old) == len(line):
+                # 只重写变化的单元格
+                for i, (cell, old_cell) in enumerate(zip(line, old)):
+                    if cell != old_cell:
+                        buf.append(f"\033[{row + 1};{self.offsets[i] + 1}H{fit(cell, self.widths[i], self.aligns[i])}")
+            else:
+                buf.append(f"\033[{row + 1};1H{self.format_row(line)}\033[K")
+
+        if len(prev) > len(frame):
+            buf.append(f"\033[{len(frame) + 1};1H\033[J")
+        buf.append(f"\033[{len(frame) + 1};1H")
+        self._prev = frame
+        return "".join(buf)
+
+    def reset(self):
+        """下一帧完整重绘(如终端尺寸变化后)"""
+        self._prev = None
@@ -0,0 +1,266 @@
+import json
+import mmap
+import os
+import threading
+import time
+
+import numpy as np
+from upbit_snapshot import MarketIndex
+# 行情记录器: 把每条ticker追加为定长二进制记录, 按大小滚动分段文件, 读取时内存映射并借助时间索引定位
+
+# 定长记录(36字节, 小端, 无填充)
+RECORD_DTYPE = np.dtype([
+    ('market_id', '<u4'),
+    ('timestamp', '<i8'),  # 行情时间戳(毫秒)
+    ('trade_price', '<f8'),
+    ('acc_trade_price_24h', '<f8'),
+    ('change_rate', '<f8'),
+])
+
+# 时间索引: 每次落盘的一段记录对应一项 (起始记录号, 记录数, 最小时间戳, 最大时间戳)
+INDEX_DTYPE = np.dtype([
+    ('first', '<u8'),
+    ('count', '<u4'),
+    ('min_ts', '<i8'),
+    ('max_ts', '<i8'),
+])
+
+# 交易对倒排: 与记录一一对应, 每个落盘块内按交易对排序, 单交易对查询只读取命中的记录
+POSTING_DTYPE = np.dtype([
+    ('market_id', '<u4'),
+    ('record', '<u4'),  # 分段内的记录号
+])
+
+MARKETS_FILE = "markets.json"
+
+
+def segment_name(seq):
+    return f"seg-{seq:06d}"
+
+
+class TickRecorder:
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, buffer_records=4096):
+        self.directory = directory
+        self.segment_bytes = segment_bytes  # 单个分段文件的大小上限
+        os.makedirs(directory, exist_ok=True)
+
+        self.index = MarketIndex(self._load_markets())
+        self._markets_saved = len(self.index)
+        self._buffer = np.zeros(buffer_records, dtype=RECORD_DTYPE)  # 固定大小的写缓冲, 内存占用有上限
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+        existing = sorted(f for f in os.listdir(directory) if f.startswith("seg-") and f.endswith(".bin"))
+        self._seq = int(existing[-1][4:10]) if existing else 1
+        if existing and not self._recover_segment():
+            self._seq += 1  # 无法续写(如旧格式没有倒排文件)的分段保持原样, 从新分段开始
+        self._open_segment()
+        self.records_written = 0
+
+    def _load_markets(self):
+        try:
+            with open(os.path.join(self.directory, MARKETS_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_markets(self):
+        path = os.path.join(self.directory, MARKETS_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.index.markets, f)
+        os.replace(f"{path}.tmp", path)
+        self._markets_saved = len(self.index)
+
+    def _recover_segment(self):
+        """异常退出后把最后一个分段截断到时间索引覆盖的完整块, 返回能否在其后续写"""
+        base = os.path.join(self.directory, segment_name(self._seq))
+        index_bytes = os.path.getsize(f"{base}.idx") if os.path.exists(f"{base}.idx") else 0
+        index = np.fromfile(f"{base}.idx", dtype=INDEX_DTYPE, count=index_bytes // INDEX_DTYPE.itemsize) \
+            if index_bytes else np.zeros(0, INDEX_DTYPE)
+        covered = int(index['first'][-1] + index['count'][-1]) if len(index) else 0
+        postings = os.path.getsize(f"{base}.pos") // POSTING_DTYPE.itemsize if os.path.exists(f"{base}.pos") else 0
+        if os.path.getsize(f"{base}.bin") < covered * RECORD_DTYPE.itemsize or postings < covered:
+            return False
+        for suffix, size in (('.idx', len(index) * INDEX_DTYPE.itemsize), ('.bin', covered * RECORD_DTYPE.itemsize),
+                             ('.pos', covered * POSTING_DTYPE.itemsize)):
+            with open(f"{base}{suffix}", 'ab') as f:
+                f.truncate(size)
+        return True
+
+    def _open_segment(self):
+        base = os.path.join(self.directory, segment_name(self._seq))
+        self._data_file = open(f"{base}.bin", 'ab')
+        self._posting_file = open(f"{base}.pos", 'ab')
+        self._index_file = open(f"{base}.idx", 'ab')
+        self._segment_records = self._data_file.tell() // RECORD_DTYPE.itemsize
+
+    def _rotate(self):
+        self._data_file.close()
+        self._posting_file.close()
+        self._index_file.close()
+        self._seq += 1
+        self._open_segment()
+
+    def append(self, market, timestamp, trade_price, acc_trade_price_24h, change_rate):
+        """追加一条记录"""
+        with self._lock:
+            self._buffer[self._buffered] = (self.index.get(market), timestamp, trade_price,
+                                            acc_trade_price_24h, change_rate)
+            self._buffered += 1
+            if self._buffered == len(self._buffer):
+                self._flush_locked()
+
+    def append_ticker(self, ticker):
+        """追加一条Upbit格式的ticker(可直接注册为行情流的回调)"""
+        self.append(
+            ticker['market'],
+            ticker.get('timestamp') or int(time.time() * 1000),
+            ticker.get('trade_price') or 0.0,
+            ticker.get('acc_trade_price_24h') or 0.0,
+            ticker.get('signed_change_rate') or 0.0,
+        )
+
+    def append_tickers(self, tickers):
+        for ticker in tickers:
+            if ticker and 'market' in ticker:
+                self.append_ticker(ticker)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffered:
+            return
+        chunk = self._buffer[:self._buffered]
+        if self._segment_records and (self._segment_records + len(chunk)) * RECORD_DTYPE.itemsize > self.segment_bytes:
+            self._rotate()
+
+        entry = np.zeros(1, dtype=INDEX_DTYPE)
+        entry['first'] = self._segment_records
+        entry['count'] = len(chunk)
+        entry['min_ts'] = chunk['timestamp'].min()
+        entry['max_ts'] = chunk['timestamp'].max()
+
+        order = np.argsort(chunk['market_id'], kind='stable')  # 块内按交易对分组, 同一交易对保持写入顺序
+        postings = np.zeros(len(chunk), dtype=POSTING_DTYPE)
+        postings['market_id'] = chunk['market_id'][order]
+        postings['record'] = self._segment_records + order
+
+        # 索引最后写入: 索引项引用的记录与倒排一定已经落盘
+        self._data_file.write(chunk.tobytes())
+        self._data_file.flush()
+        self._posting_file.write(postings.tobytes())
+        self._posting_file.flush()
+        self._index_file.write(entry.tobytes())
+        self._index_file.flush()
+        if len(self.index) != self._markets_saved:
+            self._save_markets()
+
+        self._segment_records += len(chunk)
+        self.records_written += len(chunk)
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        self._data_file.close()
+        self._posting_file.close()
+        self._index_file.close()
+
+
+class TickReader:
+    """只读访问: 分段文件内存映射为结构化数组(零拷贝), 范围查询只读取时间索引命中的块中该交易对的记录"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.markets = []
+        self._segments = []  # [(name, records, index, postings, [mmap])]
+        self.refresh()
+
+    def refresh(self):
+        """重新加载分段(读取记录器新写入的数据)"""
+        self.close()
+        with open(os.path.join(self.directory, MARKETS_FILE), encoding='utf-8') as f:
+            self.markets = json.load(f)
+        self._market_ids = {m: i for i, m in enumerate(self.markets)}
+
+        for name in sorted(f[:-4] for f in os.listdir(self.directory) if f.startswith("seg-") and f.endswith(".bin")):
+            base = os.path.join(self.directory, name)
+            index = self._load_index(f"{base}.idx")
+            # 异常退出时数据文件可能短于索引: 只保留磁盘上完整存在的块
+            index = index[index['first'] + index['count'] <= os.path.getsize(f"{base}.bin") // RECORD_DTYPE.itemsize]
+            if not len(index):
+                continue
+            covered = int(index['first'][-1] + index['count'][-1])
+            mapped = [self._map(f"{base}.bin", covered * RECORD_DTYPE.itemsize)]
+            records = np.frombuffer(mapped[0], dtype=RECORD_DTYPE)
+            postings = None
+            available = os.path.getsize(f"{base}.pos") // POSTING_DTYPE.itemsize if os.path.exists(f"{base}.pos") else 0
+            if available:
+                # 倒排不完整的块(旧格式或异常退出)查询时退回逐条筛选
+                mapped.append(self._map(f"{base}.pos", min(available, covered) * POSTING_DTYPE.itemsize))
+                postings = np.frombuffer(mapped[1], dtype=POSTING_DTYPE)
+            self._segments.append((name, records, index, postings, mapped))
+
+    @staticmethod
+    def _load_index(path):
+        if not os.path.exists(path):
+            return np.zeros(0, INDEX_DTYPE)
+        return np.fromfile(path, dtype=INDEX_DTYPE, count=os.path.getsize(path) // INDEX_DTYPE.itemsize)
+
+    @staticmethod
+    def _map(path, size):
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+    def segment_names(self):
+        return [seg[0] for seg in self._segments]
+
+    def segment(self, name):
+        """返回整个分段的记录视图(不复制)"""
+        for seg_name, records, _, _, _ in self._segments:
+            if seg_name == name:
+                return records
+        raise KeyError(name)
+
+    def query(self, market, start_ts=None, end_ts=None):
+        """查询单个交易对在[start_ts, end_ts]内的记录(毫秒时间戳)"""
+        market_id = self._market_ids.get(market)
+        if market_id is None:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        start_ts = np.iinfo(np.int64).min if start_ts is None else start_ts
+        end_ts = np.iinfo(np.int64).max if end_ts is None else end_ts
+
+        parts = []
+        for _, records, index, postings, _ in self._segments:
+            hits = index[(index['max_ts'] >= start_ts) & (index['min_ts'] <= end_ts)]
+            for entry in hits:
+                first, end = int(entry['first']), int(entry['first']) + int(entry['count'])
+                if postings is not None and end <= len(postings):
+                    # 块内倒排按交易对排序: 二分定位后只读取该交易对的记录
+                    block_postings = postings[first:end]
+                    lo, hi = np.searchsorted(block_postings['market_id'], [market_id, market_id + 1])
+                    if lo == hi:
+                        continue
+                    block = records[block_postings['record'][lo:hi]]
+                    ts = block['timestamp']
+                    mask = (ts >= start_ts) & (ts <= end_ts)
+                else:
+                    block = records[first:end]
+                    ts = block['timestamp']
+                    mask = (block['market_id'] == market_id) & (ts >= start_ts) & (ts <= end_ts)
+                if mask.any():
+                    parts.append(block[mask])
+        if not parts:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.concatenate(parts)
+
+    def close(self):
+        mapped_files = [m for seg in self._segments for m in seg[4]]
+        self._segments = []
+        for mapped in mapped_files:
+            try:
+                mapped.close()
+            except BufferError:
+                # 调用方仍持有视图时由GC在视图释放后回收
+                pass
@@ -0,0 +1,107 @@
+import json
+from typing import Optional
+
+try:
+    import msgspec  # 可选: pip install msgspec, 解析时直接跳过不需要的字段
+except ImportError:
+    msgspec = None
+# 紧凑行情记录: /v1/ticker响应直接解析为__slots__记录, 只保留用到的字段; 兼容 ticker['market'] / ticker.get() 的字典式访问
+
+# 监控实际用到的字段 (接口返回约26个)
+TICKER_FIELDS = (
+    'market',
+    'trade_price',
+    'signed_change_rate',
+    'acc_trade_price_24h',
+    'acc_trade_volume_24h',
+    'high_price',
+    'low_price',
+    'prev_closing_price',
+    'timestamp',
+)
+
+
+class _TickerAccess:
+    """字典式访问, 现有 item['market'] / item.get('trade_price') 的代码无需修改"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in TICKER_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in TICKER_FIELDS
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def keys(self):
+        return TICKER_FIELDS
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in TICKER_FIELDS}
+
+
+if msgspec is not None:
+    class Ticker(_TickerAccess, msgspec.Struct, gc=False):
+        market: str
+        trade_price: Optional[float] = None
+        signed_change_rate: Optional[float] = None
+        acc_trade_price_24h: Optional[float] = None
+        acc_trade_volume_24h: Optional[float] = None
+        high_price: Optional[float] = None
+        low_price: Optional[float] = None
+        prev_closing_price: Optional[float] = None
+        timestamp: Optional[int] = None
+
+        @classmethod
+        def from_dict(cls, data):
+            return cls(**{name: data.get(name) for name in TICKER_FIELDS})
+
+    _decoder = msgspec.json.Decoder(list[Ticker])
+
+    def decode_tickers(content):
+        """解析/v1/ticker响应, 未声明的字段在解析时直接跳过"""
+        return _decoder.decode(content)
+else:
+    class Ticker(_TickerAccess):
+        __slots__ = TICKER_FIELDS
+
+        def __init__(self, market, trade_price=None, signed_change_rate=None, acc_trade_price_24h=None,
+                     acc_trade_volume_24h=None, high_price=None, low_price=None, prev_closing_price=None,
+                     timestamp=None):
+            self.market = market
+            self.trade_price = trade_price
+            self.signed_change_rate = signed_change_rate
+            self.acc_trade_price_24h = acc_trade_price_24h
+            self.acc_trade_volume_24h = acc_trade_volume_24h
+            self.high_price = high_price
+            self.low_price = low_price
+            self.prev_closing_price = prev_closing_price
+            self.timestamp = timestamp
+
+        def __repr__(self):
+            return f"Ticker({self.market}, {self.trade_price})"
+
+        @classmethod
+        def from_dict(cls, data):
+            get = data.get
+            return cls(get('market'), get('trade_price'), get('signed_change_rate'), get('acc_trade_price_24h'),
+                       get('acc_trade_volume_24h'), get('high_price'), get('low_price'),
+                       get('prev_closing_price'), get('timestamp'))
+
+    def decode_tickers(content):
+        """解析/v1/ticker响应为紧凑记录(未安装msgspec时先解析为dict再转换)"""
+        return [Ticker.from_dict(item) for item in json.loads(content)]
+
+
+DECODER_NAME = "msgspec" if msgspec is not None else "json+slots"
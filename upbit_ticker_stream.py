@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+import uuid
+
+import websocket  # pip install websocket-client
+# Upbit WebSocket行情流: 一次订阅全部交易对, 在内存中维护最新行情表
+
+
+class UpbitTickerStream:
+    def __init__(self, markets, url="wss://api.upbit.com/websocket/v1",
+                 reconnect_delay=1, max_reconnect_delay=30, recv_timeout=30):
+        self.url = url
+        self.markets = list(markets)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.recv_timeout = recv_timeout  # 超时无数据先发ping, 再次超时则重连
+
+        self.tickers = {}  # market -> 最新ticker(与REST /v1/ticker字段一致)
+        self.last_update = None
+        self.reconnects = 0
+        self.ready = threading.Event()  # 收到第一条行情后置位
+        self._listeners = []
+
+        self._lock = threading.Lock()
+        self._ws = None
+        self._thread = None
+        self._running = False
+        self._resubscribe = False
+
+    def add_listener(self, callback):
+        """注册逐条行情回调: callback(ticker), 在接收线程中调用"""
+        self._listeners.append(callback)
+
+    def subscribe_message(self):
+        """构造订阅消息"""
+        return json.dumps([
+            {"ticket": str(uuid.uuid4())},
+            {"type": "ticker", "codes": self.markets},
+            {"format": "DEFAULT"},
+        ])
+
+    def start(self):
+        """在后台线程中启动行情流"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run_forever, name="upbit-ticker-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止行情流"""
+        self._running = False
+        ws = self._ws
+        if ws:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def wait_ready(self, timeout=10):
+        """等待首条行情到达"""
+        return self.ready.wait(timeout)
+
+    def set_markets(self, markets):
+        """更新订阅列表, 在当前连接上重新订阅"""
+        markets = list(markets)
+        if markets == self.markets:
+            return
+        self.markets = markets
+        with self._lock:
+            keep = set(markets)
+            for market in [m for m in self.tickers if m not in keep]:
+                del self.tickers[market]
+        self._resubscribe = True
+
+    def _run_forever(self):
+        delay = self.reconnect_delay
+        while self._running:
+            try:
+                self._ws = websocket.create_connection(self.url, timeout=self.recv_timeout)
+                self._ws.send(self.subscribe_message())
+                delay = self.reconnect_delay
+                self._receive_loop(self._ws)
+            except Exception as e:
+                if self._running:
+                    print(f"⚠️ 行情流连接中断: {e}, {delay}秒后重连")
+            finally:
+                if self._ws:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+
+            if not self._running:
+                break
+            self.reconnects += 1
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _receive_loop(self, ws):
+        idle = False
+        while self._running:
+            if self._resubscribe:
+                self._resubscribe = False
+                ws.send(self.subscribe_message())
+            try:
+                opcode, raw = ws.recv_data(control_frame=True)
+            except websocket.WebSocketTimeoutException:
+                if idle:
+                    raise
+                idle = True
+                ws.ping()
+                continue
+            idle = False
+            if opcode == websocket.ABNF.OPCODE_CLOSE:
+                raise websocket.WebSocketConnectionClosedException("服务端关闭连接")
+            if opcode in (websocket.ABNF.OPCODE_TEXT, websocket.ABNF.OPCODE_BINARY):
+                self.handle_message(raw)
+
+    def handle_message(self, raw):
+        """解析推送消息并更新行情表"""
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        data = json.loads(raw)
+        if data.get('type') != 'ticker':
+            return
+        market = data.get('code')
+        if not market:
+            return
+        # DEFAULT格式以code表示交易对, 转为REST接口的market字段以便复用现有处理逻辑
+        data['market'] = market
+        with self._lock:
+            self.tickers[market] = data
+            self.last_update = time.time()
+        self.ready.set()
+        for callback in self._listeners:
+            callback(data)
+
+    def get_ticker(self, market):
+        """获取单个交易对的最新行情"""
+        with self._lock:
+            return self.tickers.get(market)
+
+    def fetch_tickers(self, markets):
+        """按给定顺序返回已收到的最新行情(尚未推送的交易对被跳过)"""
+        with self._lock:
+            return [self.tickers[m] for m in markets if m in self.tickers]
+
+
+if __name__ == "__main__":
+    # 安装依赖: pip install websocket-client
+    stream = UpbitTickerStream(["KRW-USDT", "KRW-BTC", "KRW-ETH"]).start()
+    try:
+        while True:
+            time.sleep(1)
+            for ticker in stream.fetch_tickers(stream.markets):
+                print(f"{ticker['market']:<10}{ticker['trade_price']:>15,.1f}")
+    except KeyboardInterrupt:
+        stream.stop()
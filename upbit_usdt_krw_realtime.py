@@ -1,16 +1,13 @@
 import requests
 import time
 from datetime import datetime
+from upbit_fetcher import UpbitTickerFetcher
+# Upbit USDT-KRW行情: 默认作为多视图引擎的USDT视图运行, 与其他监控脚本共用一份采集(共享快照); --standalone独立轮询
 
 
-def get_upbit_price():
-    url = "https://api.upbit.com/v1/ticker"
-    params = {"markets": "KRW-USDT"}
-
+def get_upbit_price(fetcher):
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = fetcher.fetch_tickers(["KRW-USDT"])
 
         if data and isinstance(data, list):
             return data[0]
@@ -48,18 +45,28 @@ def display_price_data(data):
     print(f"24小时交易量: {float(volume):,.1f} USDT")  # 修改为保留1位小数
 
 
-def main():
-    print("启动 Upbit USDT-KRW 价格监控 (每5秒更新)...")
+def run_standalone(args):
+    """独立轮询KRW-USDT并逐次打印(不使用共享快照)"""
+    fetcher = UpbitTickerFetcher(max_workers=1)  # 复用keep-alive连接
+    print(f"启动 Upbit USDT-KRW 价格监控 (每{args.interval:g}秒更新)...")
     print("按 Ctrl+C 停止程序")
 
     try:
         while True:
-            data = get_upbit_price()
+            data = get_upbit_price(fetcher)
             display_price_data(data)
-            time.sleep(5)
+            time.sleep(args.interval)
     except KeyboardInterrupt:
         print("\n程序已停止")
+    finally:
+        fetcher.close()
+
+
+def main():
+    from upbit_engine import run_view
+    run_view("usdt", 5, "Upbit USDT-KRW价格监控", standalone=run_standalone)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 安装必要的库: pip install requests numpy websocket-client
+    main()
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+from upbit_snapshot import MarketIndex
+# 成交额突增检测: 由相邻快照24h累计成交额之差得到每个间隔的成交额, 按交易对以指数加权Welford递推均值/方差, 输出z值
+
+
+class VolumeSurgeDetector:
+    def __init__(self, index=None, window=30, min_samples=5, min_rate=0.0, capacity=256):
+        self.index = index if index is not None else MarketIndex()  # 与MarketSnapshot共用下标, z值数组与快照对齐
+        self.alpha = 2.0 / (window + 1)  # 约等于最近window个间隔的加权窗口
+        self.min_samples = min_samples  # 样本不足时不输出z值
+        self.min_rate = min_rate  # 基准成交额(KRW/分钟)低于该值时不输出z值, 过滤冷门交易对
+        self._alloc(max(capacity, len(self.index)))
+        self._last_time = None
+        self.updates = 0
+
+    def _alloc(self, capacity):
+        # 每个交易对固定几个数值, 内存不随运行时间增长
+        self.last_acc = np.full(capacity, np.nan)  # 上一快照的24h累计成交额
+        self.mean = np.zeros(capacity)  # 每分钟成交额的加权均值
+        self.var = np.zeros(capacity)  # 加权方差
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.rate = np.full(capacity, np.nan)  # 最近一个间隔的每分钟成交额
+        self.zscore = np.full(capacity, np.nan)
+
+    def _ensure_capacity(self, size):
+        capacity = len(self.mean)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        old = {name: getattr(self, name) for name in ('last_acc', 'mean', 'var', 'count', 'rate', 'zscore')}
+        self._alloc(capacity)
+        for name, array in old.items():
+            getattr(self, name)[:len(array)] = array
+
+    @property
+    def ready(self):
+        """是否已有交易对积累到足够样本"""
+        n = len(self.index)
+        return bool(np.any(np.isfinite(self.zscore[:n])))
+
+    def update(self, snapshot, now=None):
+        """用一轮完整快照更新统计量, 返回与快照下标对齐的z值数组"""
+        now = time.time() if now is None else now
+        n = len(self.index)
+        self._ensure_capacity(n)
+        acc = np.where(snapshot.valid[:n], snapshot.volume[:n], np.nan)
+        last_time, self._last_time = self._last_time, now
+        if last_time is None or now <= last_time:
+            self.last_acc[:n] = np.where(np.isfinite(acc), acc, self.last_acc[:n])
+            return self.zscore[:n]
+
+        with np.errstate(invalid='ignore'):
+            delta = acc - self.last_acc[:n]
+            # 24h窗口滚动会使累计值下降, 该间隔的成交额无法得知, 跳过这个样本
+            ok = np.isfinite(delta) & (delta >= 0)
+        rate = np.where(ok, delta, np.nan) / ((now - last_time) / 60)  # 按实际间隔折算为每分钟, 间隔不齐时可比
+
+        mean, var, count = self.mean[:n], self.var[:n], self.count[:n]
+        # 先与已有基准比较, 再并入, 突增不会稀释自身的基准
+        std = np.sqrt(var)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (rate - mean) / std
+        scored = ok & (count >= self.min_samples) & (std > 0) & (mean >= self.min_rate)
+        self.zscore[:n] = np.where(scored, z, np.nan)
+
+        # 指数加权的Welford递推
+        diff = np.where(ok, rate - mean, 0.0)
+        first = ok & (count == 0)
+        self.mean[:n] = np.where(first, rate, mean + self.alpha * diff)
+        self.var[:n] = np.where(first, 0.0, np.where(ok, (1 - self.alpha) * (var + self.alpha * diff * diff), var))
+        self.count[:n] += ok
+        self.rate[:n] = rate
+        self.last_acc[:n] = np.where(np.isfinite(acc), acc, self.last_acc[:n])
+        self.updates += 1
+        return self.zscore[:n]
@@ -0,0 +1,279 @@
+import base64
+import hashlib
+import json
+import socketserver
+import struct
+import threading
+import time
+# 本地WebSocket替身服务器: 回放预制的ticker/orderbook帧, 用于在无网络环境下测试流式行情
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+STREAM_TYPES = ('ticker', 'orderbook')  # 可订阅的推送类型, 按codes筛选回放帧
+
+
+def read_http_request(rfile):
+    """读取HTTP请求行与请求头, 返回 (method, path, headers); 连接关闭返回None"""
+    request_line = rfile.readline().decode('latin-1').strip()
+    if not request_line:
+        return None
+    headers = {}
+    while True:
+        line = rfile.readline().decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    parts = request_line.split()
+    return parts[0], parts[1] if len(parts) > 1 else "/", headers
+
+
+def websocket_accept(wfile, headers):
+    """对已读取的请求头回复101升级, 返回是否成功"""
+    key = headers.get('sec-websocket-key')
+    if not key:
+        return False
+    accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+    wfile.write((
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+    ).encode())
+    wfile.flush()
+    return True
+
+
+def websocket_handshake(rfile, wfile):
+    """完成服务端握手, 返回请求路径 (握手失败返回None)"""
+    request = read_http_request(rfile)
+    if request is None:
+        return None
+    _, path, headers = request
+    return path if websocket_accept(wfile, headers) else None
+
+
+def read_frame(rfile):
+    """读取一个客户端帧, 返回 (opcode, payload); 连接关闭返回 (None, b'')"""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None, b''
+    opcode = head[0] & 0x0F
+    masked = head[1] & 0x80
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if masked else None
+    payload = rfile.read(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def parse_frame(buf):
+    """从缓冲区开头解析一个完整的客户端帧, 返回 (opcode, payload, 消耗的字节数); 数据不完整返回None"""
+    if len(buf) < 2:
+        return None
+    opcode = buf[0] & 0x0F
+    masked = buf[1] & 0x80
+    length = buf[1] & 0x7F
+    offset = 2
+    if length == 126:
+        if len(buf) < 4:
+            return None
+        length = struct.unpack_from("!H", buf, 2)[0]
+        offset = 4
+    elif length == 127:
+        if len(buf) < 10:
+            return None
+        length = struct.unpack_from("!Q", buf, 2)[0]
+        offset = 10
+    mask = None
+    if masked:
+        mask = bytes(buf[offset:offset + 4])
+        offset += 4
+    end = offset + length
+    if len(buf) < end:
+        return None
+    payload = bytes(buf[offset:end])
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload, end
+
+
+def encode_frame(payload, opcode=OP_BINARY):
+    """编码一个服务端帧(服务端帧不加掩码)"""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def send_frame(wfile, payload, opcode=OP_BINARY):
+    """发送一个服务端帧"""
+    wfile.write(encode_frame(payload, opcode))
+    wfile.flush()
+
+
+def sample_ticker_frames(markets, rounds=3, base_price=1000.0):
+    """生成预制的ticker帧(Upbit DEFAULT格式, 使用code字段)"""
+    frames = []
+    now_ms = int(time.time() * 1000)
+    for r in range(rounds):
+        for i, market in enumerate(markets):
+            price = base_price * (i + 1) * (1 + 0.001 * r)
+            frames.append({
+                'type': 'ticker',
+                'code': market,
+                'trade_price': price,
+                'signed_change_rate': 0.001 * r,
+                'acc_trade_price_24h': price * 1000 * (r + 1),
+                'acc_trade_volume_24h': 1000.0 * (r + 1),
+                'timestamp': now_ms + r * 1000 + i,
+                'stream_type': 'REALTIME',
+            })
+    return frames
+
+
+def sample_orderbook_frames(markets, rounds=3, base_price=1000.0, levels=15):
+    """生成预制的orderbook帧: 每档数量随深度增加, 价格步长为0.1%"""
+    frames = []
+    now_ms = int(time.time() * 1000)
+    for r in range(rounds):
+        for i, market in enumerate(markets):
+            mid = base_price * (i + 1) * (1 + 0.001 * r)
+            units = [{
+                'ask_price': round(mid * (1 + 0.001 * (k + 1)), 4),
+                'bid_price': round(mid * (1 - 0.001 * (k + 1)), 4),
+                'ask_size': 10.0 * (k + 1),
+                'bid_size': 10.0 * (k + 1),
+            } for k in range(levels)]
+            frames.append({
+                'type': 'orderbook',
+                'code': market,
+                'timestamp': now_ms + r * 1000 + i,
+                'total_ask_size': sum(u['ask_size'] for u in units),
+                'total_bid_size': sum(u['bid_size'] for u in units),
+                'orderbook_units': units,
+                'stream_type': 'REALTIME',
+            })
+    return frames
+
+
+def load_frames(path):
+    """从JSON lines文件读取预制帧"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _ReplayHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        server = self.server
+        if websocket_handshake(self.rfile, self.wfile) is None:
+            return
+        server.connections += 1
+
+        # Upbit协议: 客户端先发送订阅消息 [{"ticket":...}, {"type":"ticker","codes":[...]}, ...]
+        opcode, payload = read_frame(self.rfile)
+        if opcode not in (OP_TEXT, OP_BINARY):
+            return
+        codes = set()
+        for item in json.loads(payload):
+            if item.get('type') in STREAM_TYPES:
+                codes.update(item.get('codes', []))
+        server.subscriptions.append(sorted(codes))
+
+        sent = 0
+        try:
+            for frame in server.frames:
+                if codes and frame.get('code') not in codes:
+                    continue
+                send_frame(self.wfile, json.dumps(frame))
+                sent += 1
+                if server.drop_after and sent >= server.drop_after and server.connections <= server.drops:
+                    # 模拟服务端断线, 用于测试自动重连与重新订阅
+                    return
+                if server.frame_interval:
+                    time.sleep(server.frame_interval)
+            # 回放完毕后保持连接, 直到客户端关闭
+            while not server.stopped.is_set():
+                opcode, payload = read_frame(self.rfile)
+                if opcode is None or opcode == OP_CLOSE:
+                    break
+                if opcode == OP_PING:
+                    send_frame(self.wfile, payload, OP_PONG)
+                elif opcode in (OP_TEXT, OP_BINARY):
+                    # 记录同一连接上的重新订阅
+                    server.subscriptions.append(sorted(
+                        code for item in json.loads(payload) if item.get('type') in STREAM_TYPES
+                        for code in item.get('codes', [])))
+        except (ConnectionError, OSError):
+            pass
+
+
+class ReplayWebSocketServer(socketserver.ThreadingTCPServer):
+    """回放预制ticker/orderbook帧的本地WebSocket服务器
+
+    drop_after/drops: 前drops个连接在发送drop_after帧后主动断开, 用于测试重连
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, frames, host="127.0.0.1", port=0, frame_interval=0.0, drop_after=0, drops=1):
+        super().__init__((host, port), _ReplayHandler)
+        self.frames = list(frames)
+        self.frame_interval = frame_interval
+        self.drop_after = drop_after
+        self.drops = drops
+        self.connections = 0
+        self.subscriptions = []
+        self.stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}/websocket/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        canned = load_frames(sys.argv[1])
+    else:
+        canned = sample_ticker_frames(["KRW-USDT", "KRW-BTC", "KRW-ETH", "KRW-XRP"], rounds=100)
+    server = ReplayWebSocketServer(canned, port=8765, frame_interval=0.05)
+    print(f"🚀 本地WebSocket替身服务器已启动: {server.url}")
+    print("🛑 按 Ctrl+C 停止")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 服务器已停止")
+    finally:
+        server.server_close()